@@ -1,5 +1,4 @@
 import streamlit as st
-import subprocess
 import os
 import sys
 import json
@@ -10,12 +9,14 @@ import time
 import shutil
 import hashlib
 from datetime import datetime
-import zipfile
 
 # --- IMPORTACIÓN DEL CEREBRO (NUEVO) ---
 # Importamos el módulo cognitivo para usar la nueva búsqueda vectorial
 try:
     import modules.gices_brain as gices_brain
+    import modules.pipeline_stages as pipeline_stages
+    import modules.file_hashing as file_hashing
+    import modules.release_packager as release_packager
 except ImportError:
     st.error("❌ Error: No se encuentra el módulo 'modules.gices_brain'. Verifica la estructura de carpetas.")
 
@@ -58,12 +59,8 @@ MOCK_DATA = {
 # --- MOTOR DE AUDITORÍA FORENSE (STEELTRACE CORE) ---
 
 def calculate_file_hash(filepath):
-    """Calcula SHA-256 de un archivo físico."""
-    hasher = hashlib.sha256()
-    with open(filepath, 'rb') as f:
-        buf = f.read()
-        hasher.update(buf)
-    return hasher.hexdigest()
+    """Calcula SHA-256 de un archivo físico (en streaming y con caché por tamaño/mtime/inodo)."""
+    return file_hashing.sha256_file(filepath)
 
 def generate_secure_package():
     """Genera el paquete de auditoría con integridad criptográfica."""
@@ -97,9 +94,14 @@ def generate_secure_package():
     manifest_entries = []
     hash_list = []
     
+    # Todos los artefactos (y la normativa base) se hashean de una vez, en paralelo
+    pdf_evidence = KB_PATH / "2025_7_7_EC_NATURE CREDITS_SPA.pdf"
+    to_hash = [p for p in artifacts.values() if p.exists()] + ([pdf_evidence] if pdf_evidence.exists() else [])
+    digests = dict(zip(to_hash, file_hashing.sha256_files(to_hash)))
+
     for name, path in artifacts.items():
         if path.exists():
-            f_hash = calculate_file_hash(path)
+            f_hash = digests[path]
             hash_list.append(f_hash)
             manifest_entries.append({
                 "file": name,
@@ -109,9 +111,8 @@ def generate_secure_package():
     
     # MEJORA: Calcular Hash de la evidencia PDF principal si existe
     # Esto asegura la trazabilidad forense solicitada en el paso 4
-    pdf_evidence = KB_PATH / "2025_7_7_EC_NATURE CREDITS_SPA.pdf"
     if pdf_evidence.exists():
-         pdf_hash = calculate_file_hash(pdf_evidence)
+         pdf_hash = digests[pdf_evidence]
          manifest_entries.append({
              "file": pdf_evidence.name,
              "sha256": pdf_hash,
@@ -138,11 +139,9 @@ def generate_secure_package():
     zip_name = f"GICES_AUDIT_{manifest_data['run_id']}.zip"
     zip_path = audit_dir / zip_name
     
-    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        for name, path in artifacts.items():
-            if path.exists():
-                zipf.write(path, arcname=name)
-        zipf.write(manifest_path, arcname="evidence_manifest.json")
+    entries = [(path, name) for name, path in artifacts.items() if path.exists()]
+    entries.append((manifest_path, "evidence_manifest.json"))
+    release_packager.build_package(zip_path, entries, report_path=zip_path.with_suffix(".report.json"))
         
     return zip_path
 
@@ -181,19 +180,31 @@ def render_inquiry_tree(steps):
         last = node_id
     return dot
 
+@st.cache_resource
+def load_pipeline_stages():
+    """Importa las etapas una sola vez por servidor (pandas, rdflib, OpenAI, jsonschema...)."""
+    stages = {}
+    for script in ["mcp_ingest.py", "raga_compute.py"]:
+        try:
+            stages[script] = pipeline_stages.load_stage(script)
+        except Exception as e:
+            stages[script] = e
+    return stages
+
 def run_script(script_name, desc):
     path = ROOT_DIR / "scripts" / script_name
     with st.status(f"⚙️ {desc}...", expanded=True) as s:
-        time.sleep(1)
         if path.exists():
-            try:
-                res = subprocess.run([sys.executable, str(path)], capture_output=True, text=True, timeout=60)
-                st.code(res.stdout)
-                s.update(label="✅ Completado", state="complete", expanded=False)
+            # Ejecución en proceso: módulos importados, base de conocimiento y recursos
+            # (schemas compilados, shapes SHACL...) se reutilizan entre ejecuciones
+            load_pipeline_stages()
+            res = pipeline_stages.run_stage(script_name)
+            st.code(res["stdout"])
+            if res["ok"]:
+                s.update(label=f"✅ Completado ({res['duration_sec']:.2f}s)", state="complete", expanded=False)
                 return True
-            except Exception as e:
-                s.update(label="❌ Error", state="error")
-                st.error(str(e))
+            s.update(label="❌ Error", state="error")
+            st.error(res["stderr"])
         else:
             st.warning(f"Simulando {script_name} (Archivo no encontrado)")
             s.update(label="⚠️ Simulado", state="complete", expanded=False)
@@ -255,10 +266,8 @@ def main():
                 
                 # 3. Llamar al cerebro pasando la función
                 try:
-                    # Borramos la memoria vieja para forzar recarga (opcional)
-                    # if (KB_PATH.parent / "knowledge_vectors.json").exists():
-                    #    (KB_PATH.parent / "knowledge_vectors.json").unlink()
-
+                    # Indexación incremental: solo PDFs nuevos/modificados.
+                    # Para reconstruir todo: ingest_pdfs(..., force=True)
                     gices_brain.ingest_pdfs(str(KB_PATH), progress_callback=update_ui)
                     
                     st.success("✅ Base de Conocimiento Vectorial Actualizada")
@@ -378,47 +387,66 @@ def main():
         
         if st.button("🛡️ Ejecutar Auditoría de Permanencia", type="primary"):
             try:
-                with st.spinner("🔍 Consultando normativa UE y analizando riesgo..."):
+                t_start = time.perf_counter()
+                with st.spinner("🔍 Consultando normativa UE..."):
                     # a) Recuperar contexto normativo
                     query = '¿Cuáles son los requisitos de permanencia y adicionalidad según el documento Nature Credits Roadmap 2025?'
                     context_chunks = gices_brain.retrieve_context(query, k=4)
                     
-                    # b) Mostrar evidencia cruda
-                    with st.expander("📄 Evidencia Normativa Recuperada (Raw)", expanded=False):
-                        if context_chunks:
-                            for c in context_chunks:
-                                st.markdown(f"**Fuente:** {c['source']} (Pág. {c['page']})")
-                                st.caption(f"...{c['content'][:400]}...")
-                                st.divider()
-                        else:
-                            st.warning("No se encontró evidencia relevante en la Base de Conocimiento.")
-
-                    # c) Dato de prueba
-                    test_data = {
-                        'project_type': 'Reforestación Activa', 
-                        'area': '150ha', 
-                        'permanence_guarantee': '10 años'
-                    }
-                    st.info(f"📋 Dato Auditado: {test_data}")
-
-                    # d) Análisis Deliberativo
-                    result = gices_brain.deliberative_analysis(test_data, context_chunks, mode="ECOACSA Audit")
-
-                    # e) Resultado final
-                    st.subheader("Dictamen del Auditor IA")
-                    
-                    check = result.get("compliance_check", "UNKNOWN").upper()
-                    narrative = result.get("narrative", "Sin análisis")
-                    
-                    if "CUMPLE" in check and "NO" not in check and "RIESGO" not in check:
-                        st.success(f"✅ VEREDICTO: {check}")
-                    elif "RIESGO" in check:
-                        st.warning(f"⚠️ VEREDICTO: {check}")
+                # b) Mostrar evidencia cruda
+                with st.expander("📄 Evidencia Normativa Recuperada (Raw)", expanded=False):
+                    if context_chunks:
+                        for c in context_chunks:
+                            st.markdown(f"**Fuente:** {c['source']} (Pág. {c['page']})")
+                            st.caption(f"...{c['content'][:400]}...")
+                            st.divider()
                     else:
-                        st.error(f"❌ VEREDICTO: {check}")
-                    
-                    st.write(f"**Justificación:** {narrative}")
-                    st.json(result)
+                        st.warning("No se encontró evidencia relevante en la Base de Conocimiento.")
+
+                # c) Dato de prueba
+                test_data = {
+                    'project_type': 'Reforestación Activa', 
+                    'area': '150ha', 
+                    'permanence_guarantee': '10 años'
+                }
+                st.info(f"📋 Dato Auditado: {test_data}")
+
+                # d) Análisis Deliberativo en streaming: la narrativa se pinta según llega
+                st.subheader("Dictamen del Auditor IA")
+                verdict_box = st.empty()
+                narrative_box = st.empty()
+                latency_box = st.empty()
+                verdict_box.info("⏳ Deliberando...")
+                streamed, result, first_token = "", {}, None
+                for kind, payload in gices_brain.deliberative_analysis_stream(test_data, context_chunks, mode="ECOACSA Audit"):
+                    if kind == "narrative":
+                        if first_token is None:
+                            first_token = time.perf_counter() - t_start
+                            latency_box.caption(f"⚡ Primer contenido en {first_token:.2f}s")
+                        streamed += payload
+                        narrative_box.markdown(f"**Justificación:** {streamed}▌")
+                    else:
+                        result = payload
+
+                # e) Resultado final (validado)
+                check = result.get("compliance_check", "UNKNOWN").upper()
+                narrative = result.get("narrative") or streamed or "Sin análisis"
+                
+                if "CUMPLE" in check and "NO" not in check and "RIESGO" not in check:
+                    verdict_box.success(f"✅ VEREDICTO: {check}")
+                elif "RIESGO" in check:
+                    verdict_box.warning(f"⚠️ VEREDICTO: {check}")
+                else:
+                    verdict_box.error(f"❌ VEREDICTO: {check}")
+
+                narrative_box.markdown(f"**Justificación:** {narrative}")
+                if result.get("validation_error"):
+                    st.warning(f"Dictamen no válido: {result['validation_error']}")
+                latency_box.caption(
+                    (f"⚡ Primer contenido en {first_token:.2f}s · " if first_token is not None else "")
+                    + f"total {time.perf_counter() - t_start:.2f}s"
+                )
+                st.json(result)
 
             except Exception as e:
                 st.error(f"Error en el proceso de auditoría: {e}")
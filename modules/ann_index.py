@@ -0,0 +1,136 @@
+import os
+import numpy as np
+from pathlib import Path
+
+# --- ÍNDICE IVF (Inverted File) EN NUMPY PURO ---
+# Los vectores se reparten en `nlist` listas según su centroide más cercano (k-means
+# esférico). Una consulta solo puntúa las `nprobe` listas más próximas:
+#   más nprobe -> más recall y más latencia; nprobe = nlist equivale a búsqueda exacta.
+IVF_FILE = "ivf.npz"
+ANN_MIN_ROWS = int(os.environ.get("GICES_ANN_MIN_ROWS", 5000))   # por debajo, búsqueda exacta
+ANN_NPROBE = int(os.environ.get("GICES_ANN_NPROBE", 16))
+RETRAIN_GROWTH = 4.0     # se re-entrenan centroides si el corpus crece x4 desde el entrenamiento
+
+
+def default_nlist(n):
+    return int(max(8, min(4096, 4 * np.sqrt(n))))
+
+
+def _assign(vectors, centroids, block=8192):
+    """Centroide más cercano (máximo producto escalar) por bloques para acotar memoria."""
+    out = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), block):
+        out[start:start + block] = np.argmax(vectors[start:start + block] @ centroids.T, axis=1)
+    return out
+
+
+def train_kmeans(vectors, nlist, iterations=20, sample_size=None, seed=0):
+    """k-means esférico sobre una muestra (los vectores ya vienen normalizados)."""
+    rng = np.random.default_rng(seed)
+    n = len(vectors)
+    sample_size = sample_size or min(n, max(nlist * 64, 10000))
+    idx = np.sort(rng.choice(n, size=min(sample_size, n), replace=False))
+    sample = np.asarray(vectors[idx], dtype=np.float32)
+    nlist = min(nlist, len(sample))
+    centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+    for _ in range(iterations):
+        labels = _assign(sample, centroids)
+        counts = np.bincount(labels, minlength=nlist)
+        order = np.argsort(labels, kind="stable")
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        empty = counts == 0
+        sums = np.zeros_like(centroids)
+        sums[~empty] = np.add.reduceat(sample[order], starts[~empty], axis=0)
+        # Listas vacías: se re-siembran con puntos aleatorios de la muestra
+        if empty.any():
+            sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()), replace=False)]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        centroids = sums / norms
+    return centroids.astype(np.float32)
+
+
+class IVFIndex:
+    def __init__(self, centroids, assignments, generation=None, trained_count=0):
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.assignments = np.asarray(assignments, dtype=np.int32)
+        self.generation = generation
+        self.trained_count = int(trained_count or len(self.assignments))
+        self._build_lists()
+
+    def _build_lists(self):
+        # Listas invertidas en formato CSR: order[offsets[c]:offsets[c+1]] son las filas de la lista c
+        self.order = np.argsort(self.assignments, kind="stable").astype(np.int64)
+        counts = np.bincount(self.assignments, minlength=len(self.centroids))
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    @property
+    def nlist(self):
+        return len(self.centroids)
+
+    def __len__(self):
+        return len(self.assignments)
+
+    @classmethod
+    def build(cls, vectors, nlist=None, generation=None, **kmeans_args):
+        nlist = nlist or default_nlist(len(vectors))
+        centroids = train_kmeans(vectors, nlist, **kmeans_args)
+        return cls(centroids, _assign(vectors, centroids), generation, len(vectors))
+
+    def extend(self, new_vectors):
+        """Asigna filas nuevas a los centroides existentes (sin re-entrenar)."""
+        if len(new_vectors):
+            self.assignments = np.concatenate([self.assignments, _assign(new_vectors, self.centroids)])
+            self._build_lists()
+
+    def candidates(self, query_vecs, nprobe=ANN_NPROBE):
+        """Para cada consulta, las filas de sus nprobe listas más cercanas."""
+        nprobe = min(nprobe, self.nlist)
+        sims = query_vecs @ self.centroids.T
+        probes = np.argpartition(-sims, nprobe - 1, axis=1)[:, :nprobe]
+        return [
+            np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in row])
+            for row in probes
+        ]
+
+    def save(self, root):
+        path = Path(root) / IVF_FILE
+        tmp = path.with_name(path.name + ".tmp.npz")
+        np.savez(
+            tmp, centroids=self.centroids, assignments=self.assignments,
+            generation=np.array(self.generation or ""), trained_count=np.array(self.trained_count)
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, root):
+        path = Path(root) / IVF_FILE
+        if not path.exists():
+            return None
+        with np.load(path) as data:
+            return cls(data["centroids"], data["assignments"], str(data["generation"]) or None,
+                       int(data["trained_count"]))
+
+
+def update_ivf(store, nlist=None):
+    """
+    Mantiene el índice IVF al día tras una escritura del almacén:
+    reutiliza centroides y solo asigna filas nuevas, salvo que el almacén se haya
+    reescrito (otra generación) o haya crecido más de RETRAIN_GROWTH veces.
+    """
+    if store.count < ANN_MIN_ROWS:
+        path = Path(store.root) / IVF_FILE
+        if path.exists():
+            path.unlink()
+        return None
+    index = IVFIndex.load(store.root)
+    generation = store.meta.get("generation")
+    if (index is None or index.generation != generation or len(index) > store.count
+            or store.count > RETRAIN_GROWTH * index.trained_count):
+        index = IVFIndex.build(store.vectors, nlist=nlist, generation=generation)
+    elif len(index) == store.count:
+        return index
+    else:
+        index.extend(store.vectors[len(index):store.count])
+    index.save(store.root)
+    return index
@@ -0,0 +1,127 @@
+import os
+import json
+import math
+from pathlib import Path
+
+import pandas as pd
+
+# --- INGESTA POR BLOQUES ---
+# Lectura de fuentes en bloques de tamaño fijo (NDJSON/JSONL y CSV) y escritura
+# incremental del normalizado: la memoria depende del tamaño de bloque, no del
+# fichero. Los JSON clásicos (una lista) se siguen cargando enteros y se
+# recorren por bloques para compartir el mismo camino de validación y DQ.
+CHUNK_ROWS = int(os.environ.get("GICES_INGEST_CHUNK_ROWS", 50_000))
+NDJSON_SUFFIXES = {".jsonl", ".ndjson"}
+
+
+def _reject_constant(name):
+    # json acepta NaN/Infinity, que no son JSON válido: el normalizado no podría escribirlos
+    raise ValueError(f"{name} no es un número JSON válido")
+
+
+def _loads(text, path, lineno=None):
+    """json.loads con errores de la forma "ruta:línea: motivo" (lineno: línea NDJSON)."""
+    try:
+        return json.loads(text, parse_constant=_reject_constant)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"{path}:{lineno or e.lineno}: JSON no válido ({e.msg}, columna {e.colno})") from e
+    except ValueError as e:
+        raise ValueError(f"{path}:{lineno}: {e}" if lineno else f"{path}: {e}") from e
+
+
+def _coerce(value, kind):
+    """Texto de CSV -> tipo declarado en el JSON Schema (si no encaja se deja tal cual)."""
+    try:
+        if kind == "integer":
+            return int(value)
+        if kind == "number":
+            number = float(value)
+            if not math.isfinite(number):   # "nan", "inf": no son números JSON
+                return value
+            return int(number) if number.is_integer() and "." not in value and "e" not in value.lower() else number
+        if kind == "boolean" and value.lower() in ("true", "false"):
+            return value.lower() == "true"
+    except ValueError:
+        pass
+    return value
+
+
+def _csv_records(frame, types):
+    records = []
+    for row in frame.to_dict(orient="records"):
+        # celda vacía = campo ausente (como en un JSON sin la clave)
+        records.append({k: _coerce(v, types.get(k)) for k, v in row.items() if v != ""})
+    return records
+
+
+def iter_chunks(path, schema=None, chunk_rows=CHUNK_ROWS):
+    """
+    Genera listas de registros (dict) de como mucho chunk_rows elementos.
+    Para CSV, los tipos se toman de schema["properties"][campo]["type"].
+    """
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix in NDJSON_SUFFIXES:
+        chunk = []
+        with open(path, encoding="utf-8") as f:
+            for lineno, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                chunk.append(_loads(line, path, lineno))
+                if len(chunk) >= chunk_rows:
+                    yield chunk
+                    chunk = []
+        if chunk:
+            yield chunk
+    elif suffix == ".csv":
+        types = {k: v.get("type") for k, v in ((schema or {}).get("properties") or {}).items()
+                 if isinstance(v.get("type"), str)}
+        reader = pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=chunk_rows)
+        for frame in reader:
+            yield _csv_records(frame, types)
+    else:
+        records = _loads(path.read_text(encoding="utf-8"), path)
+        if not isinstance(records, list):
+            raise ValueError(f"{path} debe ser una lista de objetos JSON")
+        for start in range(0, len(records), chunk_rows):
+            yield records[start:start + chunk_rows]
+
+
+class JsonArrayWriter:
+    """
+    Escribe una lista JSON registro a registro (un objeto por línea) en un
+    temporal que sustituye al destino al cerrar: los lectores (json.load) nunca
+    ven un fichero a medias.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.tmp = self.path.with_name(self.path.name + ".tmp")
+        self.f = open(self.tmp, "w", encoding="utf-8")
+        self.f.write("[")
+        self.count = 0
+
+    def write(self, records):
+        for rec in records:
+            self.f.write(("," if self.count else "") + "\n  " + json.dumps(rec, ensure_ascii=False, allow_nan=False))
+            self.count += 1
+
+    def close(self):
+        self.f.write("\n]\n" if self.count else "]\n")
+        self.f.close()
+        self.tmp.replace(self.path)
+
+    def abort(self):
+        self.f.close()
+        self.tmp.unlink(missing_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *_):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
@@ -0,0 +1,102 @@
+import re
+
+from modules.embedding_pipeline import count_tokens
+
+# Fin de frase (., !, ?, ;) seguido de espacio, o inicio de artículo/sección normativa
+SENTENCE_END = re.compile(r"(?<=[.!?;])\s+")
+ARTICLE_START = re.compile(
+    r"(?=\b(?:Artículo|ARTÍCULO|Article|ARTICLE|Art\.|Anexo|ANEXO|Annex|ANNEX)\s+[0-9IVXLC]+\b)"
+)
+
+
+def split_sentences(text):
+    """
+    Devuelve [(start, end, es_inicio_de_articulo)] con offsets de carácter sobre `text`.
+    Los encabezados de artículo/anexo cortan siempre, aunque no haya punto antes.
+    """
+    cuts = {0, len(text)}
+    cuts.update(m.end() for m in SENTENCE_END.finditer(text))
+    articles = {m.start() for m in ARTICLE_START.finditer(text)}
+    cuts.update(articles)
+    bounds = sorted(cuts)
+    spans = []
+    for start, end in zip(bounds, bounds[1:]):
+        # Recortamos espacios en los bordes sin perder los offsets
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if start < end:
+            spans.append((start, end, start in articles))
+    return spans
+
+
+def _split_long(text, start, end, max_tokens, overlap_tokens):
+    """Una frase más larga que max_tokens se parte por palabras en ventanas solapadas."""
+    words = [(m.start() + start, m.end() + start) for m in re.finditer(r"\S+", text[start:end])]
+    i = 0
+    while i < len(words):
+        j, tokens = i, 0
+        while j < len(words) and (j == i or tokens + count_tokens(text[words[j][0]:words[j][1]]) <= max_tokens):
+            tokens += count_tokens(text[words[j][0]:words[j][1]])
+            j += 1
+        yield words[i][0], words[j - 1][1]
+        if j >= len(words):
+            break
+        # retrocedemos para solapar ~overlap_tokens
+        back, k = 0, j
+        while k > i + 1 and back < overlap_tokens:
+            k -= 1
+            back += count_tokens(text[words[k][0]:words[k][1]])
+        i = k
+
+
+def chunk_text(text, max_tokens=300, overlap_tokens=50):
+    """
+    Parte un texto en fragmentos de como mucho max_tokens, respetando frases y artículos.
+    Cada fragmento arrastra las últimas frases del anterior (hasta overlap_tokens),
+    salvo cuando empieza un artículo nuevo. Genera (char_start, char_end, texto).
+    """
+    units = []
+    for start, end, is_article in split_sentences(text):
+        n = count_tokens(text[start:end])
+        if n <= max_tokens:
+            units.append((start, end, n, is_article))
+        else:
+            for i, (s, e) in enumerate(_split_long(text, start, end, max_tokens, overlap_tokens)):
+                units.append((s, e, count_tokens(text[s:e]), is_article and i == 0))
+
+    current, tokens = [], 0
+    for unit in units:
+        start, end, n, is_article = unit
+        if current and (tokens + n > max_tokens or is_article):
+            yield current[0][0], current[-1][1], text[current[0][0]:current[-1][1]]
+            # Solapamiento: arrastramos frases finales del fragmento anterior
+            carry, carried = [], 0
+            if not is_article:
+                for prev in reversed(current):
+                    if carried + prev[2] > overlap_tokens or carried + prev[2] + n > max_tokens:
+                        break
+                    carry.insert(0, prev)
+                    carried += prev[2]
+            current, tokens = carry, carried
+        current.append(unit)
+        tokens += n
+    if current:
+        yield current[0][0], current[-1][1], text[current[0][0]:current[-1][1]]
+
+
+def iter_chunks(pages, max_tokens=300, overlap_tokens=50):
+    """
+    Convierte un flujo de páginas {"source","page","content"} en un flujo de fragmentos
+    con offsets de carácter sobre la página. Es un generador: nada se acumula en memoria.
+    """
+    for page in pages:
+        for start, end, chunk in chunk_text(page["content"], max_tokens, overlap_tokens):
+            yield {
+                "source": page["source"],
+                "page": page["page"],
+                "char_start": start,
+                "char_end": end,
+                "content": chunk,
+            }
@@ -0,0 +1,204 @@
+import json
+import glob
+import shutil
+import numpy as np
+from pathlib import Path
+
+from modules.npy_io import npy_header, NPY_HEADER_SIZE
+
+# --- CAPA NORMALIZADA COLUMNAR ---
+# data/columnar/<dominio>/period=<periodo>/entity=<entidad | _none>/
+#   <columna>.npy        -> valores tipados: int64 o float64 (integer, number), bool
+#                           (boolean) o int32 con códigos de diccionario (string, -1 = nulo)
+#   <columna>.dict.npy   -> diccionario de una columna string (array unicode)
+#   <columna>.mask.npy   -> bool, True si el campo está presente (solo columnas opcionales)
+#   schema.json          -> sidecar: formato, partición, nº de filas, tipo y dtype de cada columna
+# Las columnas salen de las propiedades del JSON Schema del contrato. Los .npy se
+# abren con mmap: un lector solo toca los ficheros de las columnas que pide.
+# Todas las particiones son hojas del mismo nivel (la de sin entidad es entity=_none):
+# reescribir una no toca a sus hermanas.
+# Las numéricas se guardan como int64 mientras solo lleguen enteros JSON, para que
+# 12300 no vuelva como 12300.0; al primer float (o entero fuera de int64) la columna
+# pasa a float64. La partición se escribe en un directorio temporal que sustituye
+# al anterior al cerrar; schema.json es el último fichero en escribirse.
+COLUMNAR_FORMAT = "gices-columnar/1"
+COLUMNAR_ROOT = Path("data/columnar")
+SCHEMA_FILE = "schema.json"
+NO_ENTITY = "_none"
+# dtype por tipo si el sidecar no lo indica (particiones anteriores a "dtype")
+_DTYPES = {"integer": np.int64, "number": np.float64, "boolean": np.bool_, "string": np.int32}
+# integer y number empiezan como int64 y pasan a float64 si hace falta (ver _widen)
+_NUMERIC = ("integer", "number")
+WIDEN_BLOCK = 1 << 20
+
+
+def partition_dir(domain, period=None, entity=None, root=COLUMNAR_ROOT):
+    return Path(root) / domain / f"period={period or 'none'}" / f"entity={entity or NO_ENTITY}"
+
+
+class ColumnarWriter:
+    """Escribe una partición por bloques (mismos bloques que el normalizado JSON)."""
+
+    def __init__(self, path, schema, meta=None):
+        self.path = Path(path)
+        self.tmp = self.path.with_name("." + self.path.name + ".tmp")
+        shutil.rmtree(self.tmp, ignore_errors=True)
+        self.tmp.mkdir(parents=True)
+        props = (schema or {}).get("properties") or {}
+        required = set((schema or {}).get("required") or ())
+        self.columns = {}
+        self.skipped = []
+        for name, spec in props.items():
+            kind = spec.get("type") if isinstance(spec, dict) else None
+            if kind not in _DTYPES:
+                self.skipped.append(name)
+                continue
+            self.columns[name] = {"type": kind, "nullable": name not in required}
+        self.meta = dict(meta or {})
+        self.rows = 0
+        self._dicts = {n: {} for n, c in self.columns.items() if c["type"] == "string"}
+        self._files = {}
+        for name, col in self.columns.items():
+            self._open(name, np.int64 if col["type"] in _NUMERIC else _DTYPES[col["type"]])
+            if col["nullable"]:
+                self._open(name + ".mask", np.bool_)
+
+    def _open(self, name, dtype):
+        f = open(self.tmp / f"{name}.npy", "wb")
+        f.write(npy_header((0,), dtype))
+        self._files[name] = (f, dtype)
+
+    def _widen(self, name):
+        """Pasa a float64 una columna int64 ya escrita (por bloques, sin cargarla entera)."""
+        f, _ = self._files[name]
+        f.close()
+        src = self.tmp / f"{name}.npy"
+        dst = self.tmp / f"{name}.widen.npy"
+        with open(dst, "wb") as out:
+            out.write(npy_header((0,), np.float64))
+            for start in range(0, self.rows, WIDEN_BLOCK):
+                count = min(WIDEN_BLOCK, self.rows - start)
+                block = np.fromfile(src, dtype=np.int64, count=count, offset=NPY_HEADER_SIZE + 8 * start)
+                out.write(block.astype(np.float64).tobytes())
+        dst.replace(src)
+        f = open(src, "r+b")
+        f.seek(0, 2)
+        self._files[name] = (f, np.float64)
+
+    def _numeric(self, name, values):
+        dtype = self._files[name][1]
+        if dtype == np.int64:
+            if not any(isinstance(v, float) for v in values):
+                try:
+                    return np.asarray([0 if v is None else v for v in values], dtype=np.int64)
+                except OverflowError:
+                    pass
+            self._widen(name)
+        return np.asarray([np.nan if v is None else v for v in values], dtype=np.float64)
+
+    def _encode(self, name, values):
+        codes = self._dicts[name]
+        return [-1 if v is None else codes.setdefault(str(v), len(codes)) for v in values]
+
+    def write(self, records):
+        if not records:
+            return
+        for name, col in self.columns.items():
+            values = [r.get(name) for r in records]
+            if col["type"] == "string":
+                arr = np.asarray(self._encode(name, values), dtype=np.int32)
+            elif col["type"] in _NUMERIC:
+                arr = self._numeric(name, values)
+            else:
+                arr = np.asarray([False if v is None else v for v in values], dtype=np.bool_)
+            self._files[name][0].write(arr.tobytes())
+            if col["nullable"]:
+                present = np.fromiter((name in r and r[name] is not None for r in records), dtype=np.bool_,
+                                      count=len(records))
+                self._files[name + ".mask"][0].write(present.tobytes())
+        self.rows += len(records)
+
+    def close(self):
+        for name, (f, dtype) in self._files.items():
+            f.seek(0)
+            f.write(npy_header((self.rows,), dtype))
+            f.close()
+            if name in self.columns:
+                self.columns[name]["dtype"] = np.dtype(dtype).name
+        for name, codes in self._dicts.items():
+            np.save(self.tmp / f"{name}.dict.npy", np.array(list(codes), dtype=str))
+        sidecar = dict(self.meta, format=COLUMNAR_FORMAT, rows=self.rows, columns=self.columns, skipped=self.skipped)
+        (self.tmp / SCHEMA_FILE).write_text(json.dumps(sidecar, indent=2, ensure_ascii=False), encoding="utf-8")
+        old = self.path.with_name("." + self.path.name + ".old")
+        shutil.rmtree(old, ignore_errors=True)
+        if self.path.exists():
+            self.path.rename(old)
+        self.tmp.rename(self.path)
+        shutil.rmtree(old, ignore_errors=True)
+
+    def abort(self):
+        for f, _ in self._files.values():
+            f.close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *_):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+def partitions(domain, period=None, entity=None, root=COLUMNAR_ROOT):
+    """
+    Directorios de partición (con sidecar) de un dominio, filtrando por periodo y
+    entidad (NO_ENTITY para la partición sin entidad; None = todas).
+    """
+    base = Path(root) / domain
+    pattern = base / (f"period={period}" if period else "period=*") / (f"entity={entity}" if entity else "entity=*")
+    return [Path(sidecar).parent for sidecar in sorted(glob.glob(str(pattern / SCHEMA_FILE)))]
+
+
+def read_partition(path, columns=None):
+    """
+    {columna: array} de una partición. Numéricas y booleanas vía mmap; las string
+    se decodifican del diccionario (None donde faltan). Junto a cada columna
+    opcional se devuelve "<columna>.mask".
+    """
+    path = Path(path)
+    sidecar = json.loads((path / SCHEMA_FILE).read_text(encoding="utf-8"))
+    if sidecar.get("format") != COLUMNAR_FORMAT:
+        raise ValueError(f"Formato columnar no soportado en {path}: {sidecar.get('format')}")
+    out = {}
+    for name in columns or sidecar["columns"]:
+        col = sidecar["columns"].get(name)
+        if col is None:
+            raise KeyError(f"{path} no tiene la columna {name}")
+        values = np.load(path / f"{name}.npy", mmap_mode="r") if sidecar["rows"] else \
+            np.empty(0, dtype=col.get("dtype") or _DTYPES[col["type"]])
+        if col["type"] == "string":
+            vocab = np.load(path / f"{name}.dict.npy").astype(object)
+            decoded = np.full(len(values), None, dtype=object)
+            present = values >= 0
+            decoded[present] = vocab[values[present]]
+            values = decoded
+        out[name] = values
+        if col["nullable"]:
+            out[name + ".mask"] = np.load(path / f"{name}.mask.npy", mmap_mode="r") if sidecar["rows"] else \
+                np.empty(0, dtype=np.bool_)
+    return out
+
+
+def iter_rows(table, columns):
+    """Filas como dict (sin los campos ausentes), para quien necesita registros."""
+    n = len(table[columns[0]]) if columns else 0
+    cols = [(c, table[c].tolist(), table[c + ".mask"].tolist() if c + ".mask" in table else None) for c in columns]
+    for i in range(n):
+        row = {}
+        for name, values, mask in cols:
+            if (mask is None or mask[i]) and values[i] is not None:
+                row[name] = values[i]
+        yield row
@@ -0,0 +1,97 @@
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from modules.embedding_pipeline import is_rate_limit
+
+
+class TokenRateLimiter:
+    """
+    Cubo de tokens con reposición continua: como mucho `tokens_per_minute`
+    tokens (prompt + completion estimados) por minuto entre todos los hilos.
+    """
+
+    def __init__(self, tokens_per_minute):
+        self.capacity = float(tokens_per_minute)
+        self.available = float(tokens_per_minute)
+        self.rate = tokens_per_minute / 60.0
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens):
+        tokens = min(float(tokens), self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.available >= tokens:
+                    self.available -= tokens
+                    return
+                wait = (tokens - self.available) / self.rate
+            time.sleep(min(wait, 1.0))
+
+
+class DeliberationExecutor:
+    """
+    Ejecuta llamadas LLM en paralelo con concurrencia acotada, límite de tokens por
+    minuto, reintentos con jitter ante 429/5xx y timeout por registro.
+    `map` devuelve los resultados en el mismo orden que la entrada.
+    """
+
+    def __init__(self, max_workers=8, tokens_per_minute=30000, max_retries=4,
+                 timeout_sec=90, base_delay=1.0):
+        self.max_workers = max_workers
+        self.limiter = TokenRateLimiter(tokens_per_minute) if tokens_per_minute else None
+        self.max_retries = max_retries
+        self.timeout_sec = timeout_sec
+        self.base_delay = base_delay
+        self.stats = {"calls": 0, "retries": 0, "errors": 0, "timeouts": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _run_one(self, fn, item, tokens):
+        deadline = time.monotonic() + self.timeout_sec if self.timeout_sec else None
+        for attempt in range(self.max_retries + 1):
+            if self.limiter is not None:
+                self.limiter.acquire(tokens)
+            try:
+                self._count("calls")
+                remaining = deadline - time.monotonic() if deadline else None
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f"Timeout de {self.timeout_sec}s agotado")
+                return fn(item, timeout=remaining)
+            except Exception as e:
+                timed_out = isinstance(e, TimeoutError) or type(e).__name__ == "APITimeoutError"
+                out_of_time = deadline is not None and time.monotonic() >= deadline
+                if attempt >= self.max_retries or out_of_time or (not is_rate_limit(e) and not timed_out):
+                    raise
+                self._count("retries")
+                delay = self.base_delay * (2 ** attempt) * (0.5 + random.random())
+                if deadline is not None:
+                    delay = min(delay, max(0.0, deadline - time.monotonic()))
+                time.sleep(delay)
+
+    def map(self, fn, items, token_cost=lambda item: 1000, on_error=None):
+        """
+        fn(item, timeout=segundos_restantes) -> resultado.
+        Si un registro agota reintentos o su timeout, se usa on_error(item, exc) como resultado
+        (o se propaga la excepción si on_error es None).
+        """
+        items = list(items)
+        results = [None] * len(items)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = [pool.submit(self._run_one, fn, item, token_cost(item)) for item in items]
+            for i, future in enumerate(futures):
+                try:
+                    results[i] = future.result()
+                except Exception as e:
+                    self._count("timeouts" if isinstance(e, TimeoutError) or type(e).__name__ == "APITimeoutError" else "errors")
+                    if on_error is None:
+                        raise
+                    results[i] = on_error(items[i], e)
+        return results
@@ -0,0 +1,118 @@
+import time
+import sqlite3
+import threading
+from pathlib import Path
+
+
+class DiskCache:
+    """
+    Caché clave -> bytes persistida en SQLite, acotada por tamaño total (LRU)
+    y con caducidad opcional (ttl_sec). Segura para usar desde varios hilos.
+    """
+
+    def __init__(self, path, max_bytes=512 * 1024 * 1024, ttl_sec=None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ttl_sec = ttl_sec
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL,"
+            " created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache(accessed)")
+        self._total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+
+    def _expired(self, created, now):
+        return self.ttl_sec is not None and now - created > self.ttl_sec
+
+    def get_many(self, keys):
+        """Devuelve una lista alineada con keys (None si no está o ha caducado)."""
+        if not keys:
+            return []
+        now = time.time()
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                part = keys[start:start + 500]
+                marks = ",".join("?" * len(part))
+                for key, value, created in self._db.execute(
+                    f"SELECT key, value, created FROM cache WHERE key IN ({marks})", part
+                ):
+                    if not self._expired(created, now):
+                        found[key] = value
+            if found:
+                self._db.executemany("UPDATE cache SET accessed = ? WHERE key = ?", [(now, k) for k in found])
+            hits = sum(1 for k in keys if k in found)
+            self.stats["hits"] += hits
+            self.stats["misses"] += len(keys) - hits
+        return [found.get(k) for k in keys]
+
+    def get(self, key):
+        return self.get_many([key])[0]
+
+    def put_many(self, items):
+        """items: iterable de (key, bytes)."""
+        now = time.time()
+        rows = [(k, sqlite3.Binary(v), len(v), now, now) for k, v in items]
+        if not rows:
+            return
+        with self._lock:
+            keys = [r[0] for r in rows]
+            marks = ",".join("?" * len(keys))
+            replaced = self._db.execute(
+                f"SELECT COALESCE(SUM(size), 0) FROM cache WHERE key IN ({marks})", keys
+            ).fetchone()[0]
+            self._db.executemany("INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)", rows)
+            self._total += sum(r[2] for r in rows) - replaced
+            self.stats["writes"] += len(rows)
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def put(self, key, value):
+        self.put_many([(key, value)])
+
+    def delete(self, key):
+        with self._lock:
+            row = self._db.execute("SELECT size FROM cache WHERE key = ?", (key,)).fetchone()
+            if row:
+                self._db.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self._total -= row[0]
+
+    def _evict(self):
+        # Liberamos hasta el 90% del límite, empezando por lo menos usado
+        target = int(self.max_bytes * 0.9)
+        if self.ttl_sec is not None:
+            self._db.execute("DELETE FROM cache WHERE created < ?", (time.time() - self.ttl_sec,))
+            self._total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+        freed = []
+        excess = self._total - target
+        for key, size in self._db.execute("SELECT key, size FROM cache ORDER BY accessed"):
+            if excess <= 0:
+                break
+            freed.append((key,))
+            excess -= size
+            self._total -= size
+        self._db.executemany("DELETE FROM cache WHERE key = ?", freed)
+        self.stats["evictions"] += len(freed)
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    @property
+    def size_bytes(self):
+        return self._total
+
+    def hit_rate(self):
+        total = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / total if total else 0.0
+
+    def close(self):
+        with self._lock:
+            self._db.close()
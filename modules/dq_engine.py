@@ -0,0 +1,264 @@
+import re
+import operator
+import numpy as np
+import pandas as pd
+
+# --- MOTOR DE CALIDAD DE DATOS VECTORIZADO ---
+# Las reglas de contracts/dq_rules.yaml se compilan una vez a funciones sobre
+# columnas (DataFrame -> máscara booleana de filas que cumplen). Cada columna se
+# convierte a fecha/número una sola vez por evaluación y se comparte entre reglas.
+# Semántica de la antigua evaluación fila a fila (mcp_ingest.apply_rule, conservada como
+# referencia en tests/test_dq_engine.py): nulos y valores no convertibles no cumplen,
+# un campo ausente se lee como "" en texto y 0 en las comparaciones enteras, y las
+# reglas desconocidas se dan por cumplidas.
+DATE_FORMAT = "%Y-%m-%d"
+MAX_FAILING_REPORTED = 100
+
+_WITHIN_MONTH = re.compile(r"within_month\('([^']*)'\)")
+_EQUALS = re.compile(r"equals\('([^']*)'\)")
+# "a <= b", "employees_end <= employees_start + 1000", ...
+_COMPARISON = re.compile(r"^\s*(\w+)\s*(<=|>=|<|>|==|!=)\s*(\w+)\s*(?:([+-])\s*(\d+(?:\.\d+)?))?\s*$")
+_OPS = {"<=": operator.le, ">=": operator.ge, "<": operator.lt, ">": operator.gt, "==": operator.eq, "!=": operator.ne}
+
+
+def _is_missing(v):
+    # to_frame marca con NaN los campos ausentes del registro (None es un null explícito)
+    return isinstance(v, float) and v != v
+
+
+def _text(v):
+    return "" if _is_missing(v) else str(v)
+
+
+def _as_int(v):
+    """int(valor) como float: ausente -> 0, None o no convertible -> NaN."""
+    if _is_missing(v):
+        return 0.0
+    try:
+        return float(int(v))
+    except (TypeError, ValueError, OverflowError):
+        return np.nan
+
+
+class Columns:
+    """Vista de un DataFrame con las conversiones por columna memorizadas."""
+
+    def __init__(self, frame):
+        self.frame = frame
+        self.n = len(frame)
+        self._cache = {}
+
+    def _memo(self, key, build):
+        if key not in self._cache:
+            self._cache[key] = build()
+        return self._cache[key]
+
+    def raw(self, field):
+        if field in self.frame.columns:
+            return self.frame[field]
+        return pd.Series([np.nan] * self.n, index=self.frame.index, dtype=object)
+
+    def kind(self, field):
+        return self._memo(("kind", field), lambda: pd.api.types.infer_dtype(self.raw(field), skipna=False))
+
+    def text(self, field):
+        """str(valor) (None -> "None", ausente -> ""), como array unicode de NumPy."""
+        def build():
+            col = self.raw(field)
+            if self.kind(field) != "string":
+                col = col.map(_text)
+            return col.to_numpy(dtype=str)
+        return self._memo(("text", field), build)
+
+    def notnull(self, field):
+        return self._memo(("notnull", field), lambda: self.raw(field).notna().to_numpy())
+
+    def dates(self, field):
+        return self._memo(("dates", field), lambda: pd.to_datetime(
+            self.text(field), format=DATE_FORMAT, errors="coerce").to_numpy())
+
+    def numbers(self, field):
+        def build():
+            col = self.raw(field)
+            # los booleanos cuentan como 0/1 (float(True) == 1.0)
+            if self.kind(field) not in ("integer", "floating", "mixed-integer-float", "decimal", "string"):
+                col = col.map(lambda v: float(v) if isinstance(v, bool) else v)
+            out = pd.to_numeric(col, errors="coerce").to_numpy(dtype=np.float64, copy=True)
+            # float() admite textos que to_numeric no ("1_000", dígitos no ASCII): solo se reintentan los fallos
+            values = col.to_numpy()
+            for i in np.flatnonzero(np.isnan(out)):
+                if isinstance(values[i], str):
+                    try:
+                        out[i] = float(values[i])
+                    except ValueError:
+                        pass
+            return out
+        return self._memo(("numbers", field), build)
+
+    def integers(self, field):
+        """Enteros de las comparaciones entre campos (int(): "2.5" o "1e3" no convierten)."""
+        def build():
+            if self.kind(field) == "integer":
+                return self.raw(field).to_numpy(dtype=np.float64)
+            return np.fromiter((_as_int(v) for v in self.raw(field)), dtype=np.float64, count=self.n)
+        return self._memo(("integers", field), build)
+
+
+def _startswith(prefix):
+    if not prefix:
+        return lambda arr: np.ones(len(arr), dtype=bool)
+    # truncar al largo del prefijo es una copia en C; str.startswith iría elemento a elemento
+    return lambda arr: arr.astype(f"<U{len(prefix)}") == prefix
+
+
+def _comparison(left, op, right, sign, offset, as_dates):
+    delta = float(offset or 0) * (-1 if sign == "-" else 1)
+
+    def check_dates(cols):
+        a, b = cols.dates(left), cols.dates(right)
+        if delta:
+            b = b + np.timedelta64(int(delta), "D")
+        return ~(np.isnat(a) | np.isnat(b)) & _OPS[op](a, b)
+
+    def check_numbers(cols):
+        a, b = cols.integers(left), cols.integers(right)
+        with np.errstate(invalid="ignore"):
+            return ~(np.isnan(a) | np.isnan(b)) & _OPS[op](a, b + delta)
+
+    return check_dates if as_dates else check_numbers
+
+
+def compile_rule(rule, date_fields=()):
+    """Devuelve fn(Columns) -> np.ndarray[bool] con las filas que cumplen la regla."""
+    name = rule.get("rule") or ""
+    field = rule.get("field")
+    if name == "not_null":
+        return lambda cols: cols.notnull(field)
+    if name == "is_date":
+        return lambda cols: ~np.isnat(cols.dates(field))
+    if name == "is_yyyy_mm":
+        return lambda cols: pd.Series(cols.text(field)).str.fullmatch(r"\d{4}-\d{2}").to_numpy(dtype=bool)
+    if name == ">=0":
+        return lambda cols: np.nan_to_num(cols.numbers(field), nan=-1.0) >= 0
+    m = _WITHIN_MONTH.match(name)
+    if m:
+        starts = _startswith(m.group(1))
+        return lambda cols: starts(cols.text(field))
+    m = _EQUALS.match(name)
+    if m:
+        ref = m.group(1)
+        return lambda cols: cols.text(field) == ref
+    m = _COMPARISON.match(name)
+    if m:
+        # campos declarados is_date en el mismo contrato se comparan como fechas (period_start <= period_end)
+        as_dates = m.group(1) in date_fields and m.group(3) in date_fields
+        return _comparison(*m.groups(), as_dates)
+    return lambda cols: np.ones(cols.n, dtype=bool)
+
+
+def compile_rules(rules):
+    """{categoria: [regla]} -> [(categoria, regla, fn)], compilado una sola vez."""
+    items = [(cat, r) for cat, rs in (rules or {}).items() for r in rs or []]
+    date_fields = {r.get("field") for _, r in items if r.get("rule") == "is_date"}
+    return [(cat, r, compile_rule(r, date_fields)) for cat, r in items]
+
+
+def to_frame(records):
+    """
+    Registros JSON -> DataFrame de objetos sin inferencia de tipos (5 sigue siendo
+    int aunque falte en otras filas). Los campos ausentes quedan como NaN y los
+    null explícitos como None.
+    """
+    if not records:
+        return pd.DataFrame()
+    fields = dict.fromkeys(k for r in records for k in r)
+    return pd.DataFrame({k: pd.Series([r.get(k, np.nan) for r in records], dtype=object) for k in fields})
+
+
+def _summarize(res):
+    agg = {k: (sum(x["pass_rate"] for x in v) / max(1, len(v))) if v else 1.0 for k, v in res.items()}
+    agg["dq_pass"] = all(v >= 0.95 for v in agg.values())
+    return {"by_rule": res, "aggregate": agg}
+
+
+def evaluate(frame, compiled, categories=("completeness", "validity", "consistency", "timeliness")):
+    """
+    Una pasada columnar: para cada regla, pass_rate, nº de fallos y las primeras
+    filas que fallan, por categoría.
+    """
+    cols = Columns(frame)
+    total = max(1, cols.n)
+    res = {cat: [] for cat in categories}
+    for cat, rule, fn in compiled:
+        mask = fn(cols) if cols.n else np.zeros(0, dtype=bool)
+        failing = np.flatnonzero(~mask)
+        res.setdefault(cat, []).append({
+            "rule": rule,
+            "pass_rate": int(mask.sum()) / total,
+            "failed": int(len(failing)),
+            "failing_rows": failing[:MAX_FAILING_REPORTED].tolist(),
+        })
+    return _summarize(res)
+
+
+class DQAccumulator:
+    """
+    DQ por bloques (ingesta en streaming): suma cumplimientos y fallos de cada
+    bloque y desplaza las filas que fallan al índice global. result() devuelve lo
+    mismo que evaluate() sobre todos los registros juntos.
+    """
+
+    def __init__(self, rules, categories=("completeness", "validity", "consistency", "timeliness")):
+        self.compiled = compile_rules(rules)
+        self.categories = categories
+        self.rows = 0
+        self.passed = [0] * len(self.compiled)
+        self.failing = [[] for _ in self.compiled]
+
+    def add(self, records):
+        frame = to_frame(records)
+        cols = Columns(frame)
+        for i, (_, _, fn) in enumerate(self.compiled):
+            mask = fn(cols) if cols.n else np.zeros(0, dtype=bool)
+            self.passed[i] += int(mask.sum())
+            room = MAX_FAILING_REPORTED - len(self.failing[i])
+            failing = np.flatnonzero(~mask)
+            self.failing[i].extend((failing[:max(0, room)] + self.rows).tolist())
+        self.rows += cols.n
+        return self
+
+    def result(self):
+        total = max(1, self.rows)
+        res = {cat: [] for cat in self.categories}
+        for i, (cat, rule, _) in enumerate(self.compiled):
+            res.setdefault(cat, []).append({
+                "rule": rule,
+                "pass_rate": self.passed[i] / total,
+                "failed": self.rows - self.passed[i],
+                "failing_rows": self.failing[i],
+            })
+        return _summarize(res)
+
+
+def merge_results(parts):
+    """
+    Combina resultados de evaluate()/DQAccumulator de varias particiones:
+    parts = [(etiqueta, nº de filas, resultado)]. Las reglas se emparejan por
+    posición (mismo contrato) y failing_rows pasa a ser [etiqueta, fila].
+    """
+    rows = sum(n for _, n, _ in parts)
+    totals = {}
+    for label, n, result in parts:
+        for cat, entries in result["by_rule"].items():
+            merged = totals.setdefault(cat, [])
+            for i, entry in enumerate(entries):
+                if i == len(merged):
+                    merged.append({"rule": entry["rule"], "failed": 0, "failing_rows": []})
+                m = merged[i]
+                m["failed"] += entry["failed"]
+                room = MAX_FAILING_REPORTED - len(m["failing_rows"])
+                m["failing_rows"].extend([label, r] for r in entry["failing_rows"][:max(0, room)])
+    res = {cat: [{"rule": m["rule"], "pass_rate": (rows - m["failed"]) / max(1, rows),
+                  "failed": m["failed"], "failing_rows": m["failing_rows"]} for m in entries]
+           for cat, entries in totals.items()}
+    return _summarize(res)
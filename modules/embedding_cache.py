@@ -0,0 +1,79 @@
+import hashlib
+import threading
+import numpy as np
+from collections import OrderedDict
+
+from modules.disk_cache import DiskCache
+
+
+def normalize_text(text):
+    """Normalización usada para la clave: espacios colapsados y sin bordes."""
+    return " ".join(text.split())
+
+
+def embedding_key(text, model):
+    return hashlib.sha256((normalize_text(text) + "\x00" + model).encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Caché de embeddings direccionada por contenido: sha256(texto normalizado + modelo).
+    Un PDF renombrado o las páginas idénticas entre la versión ENG y SPA
+    reutilizan el mismo vector sin volver a llamar a la API.
+    """
+
+    def __init__(self, path, max_bytes=512 * 1024 * 1024):
+        self.store = DiskCache(path, max_bytes=max_bytes)
+
+    @property
+    def stats(self):
+        return self.store.stats
+
+    def get_many(self, texts, model):
+        values = self.store.get_many([embedding_key(t, model) for t in texts])
+        return [np.frombuffer(v, dtype=np.float32).tolist() if v is not None else None for v in values]
+
+    def get(self, text, model):
+        return self.get_many([text], model)[0]
+
+    def put_many(self, texts, model, vectors):
+        self.store.put_many(
+            (embedding_key(t, model), np.asarray(v, dtype=np.float32).tobytes())
+            for t, v in zip(texts, vectors)
+        )
+
+    def put(self, text, model, vector):
+        self.put_many([text], model, [vector])
+
+
+class LRUCache:
+    """LRU en memoria, acotada por número de entradas y segura entre hilos."""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.stats = {"hits": 0, "misses": 0}
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.stats["hits"] += 1
+                return self._data[key]
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
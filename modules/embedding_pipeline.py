@@ -0,0 +1,162 @@
+import time
+import random
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
+
+# Contador de tokens: tiktoken si está instalado; si no, aproximación ~4 caracteres/token
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _ENCODING = None
+
+
+def count_tokens(text):
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+def is_rate_limit(exc):
+    """429 o errores transitorios del servidor: merece la pena reintentar."""
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    if status == 429 or (status is not None and status >= 500):
+        return True
+    return type(exc).__name__ in {"RateLimitError", "APITimeoutError", "APIConnectionError", "InternalServerError"}
+
+
+def _retry_after(exc):
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class EmbeddingPipeline:
+    """
+    Vectoriza textos en lotes acotados por tokens, con varios lotes en vuelo.
+
+    `client` es cualquier objeto con la interfaz de OpenAI
+    (`client.embeddings.create(input=[...], model=...)`): el cliente oficial,
+    uno apuntando a un servidor local (`OpenAI(base_url=...)`) o un doble de pruebas.
+    Si se pasa `cache` (EmbeddingCache), solo se envían a la API los textos que no estén en ella.
+    """
+
+    def __init__(self, client, model="text-embedding-3-small", max_batch_tokens=8000,
+                 max_batch_items=256, max_workers=4, max_retries=6, base_delay=1.0, cache=None):
+        self.client = client
+        self.cache = cache
+        self.model = model
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_items = max_batch_items
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.stats = {"requests": 0, "retries": 0, "texts": 0, "tokens": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self.stats[key] += n
+
+    # --- Lotes ---
+    def batches(self, items, text_of):
+        """
+        Agrupa items en lotes sin superar max_batch_tokens ni max_batch_items.
+        Cada entrada es (item, texto, vector_en_caché | None); solo los fallos cuentan tokens,
+        pero aciertos y fallos cuentan para max_batch_items: una reindexación servida
+        entera desde la caché también avanza por lotes acotados.
+        """
+        batch, tokens = [], 0
+        for group in self._with_cache(items, text_of):
+            for item, text, cached in group:
+                n = 0 if cached is not None else count_tokens(text)
+                if batch and (tokens + n > self.max_batch_tokens or len(batch) >= self.max_batch_items):
+                    yield batch
+                    batch, tokens = [], 0
+                batch.append((item, text, cached))
+                tokens += n
+        if batch:
+            yield batch
+
+    def _with_cache(self, items, text_of, lookup_size=256):
+        """Consulta la caché por grupos para no hacer una consulta por texto."""
+        group = []
+        for item in items:
+            group.append((item, text_of(item).replace("\n", " ")))
+            if len(group) >= lookup_size:
+                yield self._lookup(group)
+                group = []
+        if group:
+            yield self._lookup(group)
+
+    def _lookup(self, group):
+        if self.cache is None:
+            return [(item, text, None) for item, text in group]
+        cached = self.cache.get_many([text for _, text in group], self.model)
+        return [(item, text, vec) for (item, text), vec in zip(group, cached)]
+
+    # --- Petición con reintentos ---
+    def embed_batch(self, texts):
+        for attempt in range(self.max_retries + 1):
+            try:
+                self._count("requests")
+                response = self.client.embeddings.create(input=list(texts), model=self.model)
+                data = sorted(response.data, key=lambda d: getattr(d, "index", 0))
+                usage = getattr(response, "usage", None)
+                self._count("tokens", getattr(usage, "total_tokens", 0) or 0)
+                self._count("texts", len(texts))
+                return [d.embedding for d in data]
+            except Exception as e:
+                if attempt >= self.max_retries or not is_rate_limit(e):
+                    raise
+                self._count("retries")
+                delay = _retry_after(e) or self.base_delay * (2 ** attempt)
+                time.sleep(delay * (0.5 + random.random()))
+
+    def embed(self, texts):
+        """Versión simple: lista de textos -> lista de vectores (mismo orden)."""
+        return [vec for _, vec in self.embed_stream(texts)]
+
+    def embed_stream(self, items, text_of=lambda x: x, on_batch=None):
+        """
+        Genera (item, vector) en el mismo orden de entrada.
+        La entrada se consume de forma perezosa en el hilo llamante y como mucho
+        hay 2 * max_workers lotes pendientes, así que la memoria queda acotada.
+        """
+        pending = deque()
+        done = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for batch in self.batches(items, text_of):
+                pending.append((batch, self._submit(pool, batch)))
+                while len(pending) >= 2 * self.max_workers:
+                    done += yield from self._drain(pending.popleft(), on_batch, done)
+            while pending:
+                done += yield from self._drain(pending.popleft(), on_batch, done)
+
+    def _submit(self, pool, batch):
+        texts = [text for _, text, cached in batch if cached is None]
+        if not texts:
+            future = Future()
+            future.set_result([])
+            return future
+        return pool.submit(self._embed_and_cache, texts)
+
+    def _embed_and_cache(self, texts):
+        vectors = self.embed_batch(texts)
+        if self.cache is not None:
+            self.cache.put_many(texts, self.model, vectors)
+        return vectors
+
+    def _drain(self, entry, on_batch, done):
+        batch, future = entry
+        fresh = iter(future.result())
+        for item, _, cached in batch:
+            yield item, cached if cached is not None else next(fresh)
+        if on_batch:
+            on_batch(done + len(batch))
+        return len(batch)
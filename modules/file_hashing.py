@@ -0,0 +1,119 @@
+import os
+import hashlib
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+from modules.disk_cache import DiskCache
+
+# --- SERVICIO DE HASHING DE FICHEROS ---
+# SHA-256 en streaming (bloques fijos: memoria plana aunque el fichero pese GB),
+# en paralelo con hilos (hashlib libera el GIL con bloques grandes) y con caché
+# de digests por (ruta, tamaño, mtime_ns, inodo): re-sellar un paquete sin
+# cambios no vuelve a leer los PDFs normativos.
+BLOCK_SIZE = 1024 * 1024
+HASH_WORKERS = int(os.environ.get("GICES_HASH_WORKERS", min(8, os.cpu_count() or 1)))
+# Caché persistente entre procesos (vacío = solo en memoria)
+HASH_CACHE_PATH = os.environ.get("GICES_HASH_CACHE", "rag/hash_cache.sqlite")
+
+_memory = {}
+_lock = threading.Lock()
+_disk = None
+_disk_failed = False
+stats = {"hashed": 0, "cached": 0, "bytes_hashed": 0}
+
+
+def _disk_cache():
+    global _disk, _disk_failed
+    if _disk is None and HASH_CACHE_PATH and not _disk_failed:
+        with _lock:
+            if _disk is None and not _disk_failed:
+                try:
+                    _disk = DiskCache(HASH_CACHE_PATH, max_bytes=16 * 1024 * 1024)
+                except Exception as e:
+                    _disk_failed = True
+                    print(f"⚠️ Caché de hashes no disponible: {e}")
+    return _disk
+
+
+def stat_key(path):
+    """Identidad del contenido según el sistema de ficheros: (ruta, tamaño, mtime_ns, inodo)."""
+    st = os.stat(path)
+    return f"{os.path.realpath(path)}|{st.st_size}|{st.st_mtime_ns}|{st.st_ino}"
+
+
+def sha256_stream(path, block_size=BLOCK_SIZE):
+    """SHA-256 leyendo en bloques sobre un único buffer reutilizado."""
+    hasher = hashlib.sha256()
+    buf = bytearray(block_size)
+    view = memoryview(buf)
+    total = 0
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            hasher.update(view[:n])
+            total += n
+    with _lock:
+        stats["hashed"] += 1
+        stats["bytes_hashed"] += total
+    return hasher.hexdigest()
+
+
+def _lookup(keys):
+    found = {}
+    with _lock:
+        for key in keys:
+            if key in _memory:
+                found[key] = _memory[key]
+    missing = [k for k in keys if k not in found]
+    disk = _disk_cache()
+    if missing and disk is not None:
+        for key, value in zip(missing, disk.get_many(missing)):
+            if value is not None:
+                found[key] = value.decode("ascii")
+        with _lock:
+            _memory.update((k, found[k]) for k in missing if k in found)
+    with _lock:
+        stats["cached"] += len(found)
+    return found
+
+
+def _store(items):
+    with _lock:
+        _memory.update(items)
+    disk = _disk_cache()
+    if disk is not None:
+        disk.put_many((k, v.encode("ascii")) for k, v in items.items())
+
+
+def sha256_file(path):
+    return sha256_files([path])[0]
+
+
+def sha256_files(paths, max_workers=None):
+    """Digests en el mismo orden que paths; solo se leen los ficheros cambiados."""
+    paths = [str(p) for p in paths]
+    keys = [stat_key(p) for p in paths]
+    found = _lookup(list(dict.fromkeys(keys)))
+    todo = {}
+    for key, path in zip(keys, paths):
+        if key not in found:
+            todo.setdefault(key, path)
+    if todo:
+        workers = min(max_workers or HASH_WORKERS, len(todo))
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                digests = list(pool.map(sha256_stream, todo.values()))
+        else:
+            digests = [sha256_stream(p) for p in todo.values()]
+        fresh = dict(zip(todo.keys(), digests))
+        _store(fresh)
+        found.update(fresh)
+    return [found[k] for k in keys]
+
+
+def clear():
+    with _lock:
+        _memory.clear()
@@ -1,131 +1,452 @@
 import os
 import json
+import hashlib
+import threading
 import fitz  # PyMuPDF
 import numpy as np
 from openai import OpenAI
 from pathlib import Path
-from sklearn.metrics.pairwise import cosine_similarity
+from datetime import datetime
+
+from modules.vector_store import VectorStore, VectorStoreWriter, migrate_json, normalize_rows, compact, ROW_COLUMNS, META_FILE
+from modules.chunking import iter_chunks
+from modules.pdf_extract import iter_pages
+from modules.ann_index import update_ivf, IVF_FILE
+from modules.lexical_index import update_lexical, reciprocal_rank_fusion, LEXICAL_FILE
+from modules.embedding_pipeline import EmbeddingPipeline, count_tokens
+from modules.deliberation_executor import DeliberationExecutor
+from modules.embedding_cache import EmbeddingCache, LRUCache
+from modules.disk_cache import DiskCache
+from modules.file_hashing import sha256_file
+from modules.prompt_budget import assemble_evidence, format_evidence
+from modules.verdict_stream import JsonFieldStream, parse_verdict, validate_verdict
 
 # --- CONFIGURACIÓN ---
 api_key = os.environ.get("OPENAI_API_KEY")
 client = OpenAI(api_key=api_key) if api_key else None
+EMBEDDING_MODEL = "text-embedding-3-small"
+VECTOR_STORE_DIR = Path("rag/vector_store")
+# Formato antiguo (JSON con floats); solo se lee para migrarlo una vez
 VECTOR_DB_PATH = Path("rag/knowledge_vectors.json")
+# Lotes de embeddings: tokens por petición y peticiones simultáneas
+EMBED_BATCH_TOKENS = int(os.environ.get("GICES_EMBED_BATCH_TOKENS", 8000))
+EMBED_CONCURRENCY = int(os.environ.get("GICES_EMBED_CONCURRENCY", 4))
+# Caché de embeddings por contenido (vacío = desactivada)
+EMBED_CACHE_PATH = os.environ.get("GICES_EMBED_CACHE", "rag/embedding_cache.sqlite")
+EMBED_CACHE_MAX_MB = int(os.environ.get("GICES_EMBED_CACHE_MAX_MB", 1024))
+# Fragmentación: tokens por fragmento y solapamiento entre fragmentos consecutivos
+CHUNK_MAX_TOKENS = int(os.environ.get("GICES_CHUNK_MAX_TOKENS", 300))
+CHUNK_OVERLAP_TOKENS = int(os.environ.get("GICES_CHUNK_OVERLAP_TOKENS", 50))
+# Fracción de filas borradas (tombstones) a partir de la cual se compacta el almacén
+COMPACT_DEAD_RATIO = 0.3
+
+# Embeddings de consultas ya vistas (p.ej. la pregunta fija de la pestaña ECOACSA)
+QUERY_CACHE_SIZE = int(os.environ.get("GICES_QUERY_CACHE_SIZE", 1024))
+_query_cache = LRUCache(QUERY_CACHE_SIZE)
+
+_embedding_cache = None
+
+def get_embedding_cache():
+    global _embedding_cache
+    if _embedding_cache is None and EMBED_CACHE_PATH:
+        try:
+            _embedding_cache = EmbeddingCache(EMBED_CACHE_PATH, max_bytes=EMBED_CACHE_MAX_MB * 1024 * 1024)
+        except Exception as e:
+            print(f"⚠️ Caché de embeddings no disponible: {e}")
+    return _embedding_cache
 
-def get_embedding(text, model="text-embedding-3-small"):
+def get_embedding(text, model=EMBEDDING_MODEL):
     if not client: return []
     text = text.replace("\n", " ")
-    return client.embeddings.create(input=[text], model=model).data[0].embedding
+    cache = get_embedding_cache()
+    if cache is not None:
+        cached = cache.get(text, model)
+        if cached is not None:
+            return cached
+    vector = client.embeddings.create(input=[text], model=model).data[0].embedding
+    if cache is not None:
+        cache.put(text, model, vector)
+    return vector
+
+def get_embedding_pipeline(embed_client=None):
+    """Pipeline por lotes; embed_client permite inyectar otro cliente (p.ej. un servidor local falso)."""
+    return EmbeddingPipeline(
+        embed_client or client, model=EMBEDDING_MODEL,
+        max_batch_tokens=EMBED_BATCH_TOKENS, max_workers=EMBED_CONCURRENCY,
+        cache=get_embedding_cache()
+    )
+
+def load_vector_store():
+    """Abre el almacén binario (mmap). Si solo existe el JSON antiguo, lo migra."""
+    if VectorStore.exists(VECTOR_STORE_DIR):
+        return VectorStore(VECTOR_STORE_DIR)
+    if VECTOR_DB_PATH.exists():
+        print(f"🔁 Migrando {VECTOR_DB_PATH} al almacén binario {VECTOR_STORE_DIR}...")
+        return migrate_json(VECTOR_DB_PATH, VECTOR_STORE_DIR, model=EMBEDDING_MODEL)
+    return None
+
+# Base de conocimiento residente en el proceso: se abre una vez y solo se
+# reabre cuando cambia la versión del índice en disco (meta.json).
+_kb_lock = threading.Lock()
+_kb_handle = {"store": None, "stamp": None}
+
+def get_knowledge_base():
+    meta_path = VECTOR_STORE_DIR / META_FILE
+    try:
+        st = meta_path.stat()
+        stamp = (st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        stamp = None
+    with _kb_lock:
+        if stamp is not None and stamp == _kb_handle["stamp"]:
+            return _kb_handle["store"]
+        current = _kb_handle["store"]
+        if stamp is not None and current is not None:
+            try:
+                version = json.loads(meta_path.read_text(encoding="utf-8")).get("version")
+            except Exception:
+                version = None
+            if version == current.version:
+                _kb_handle["stamp"] = stamp
+                return current
+        store = load_vector_store()
+        _kb_handle["store"], _kb_handle["stamp"] = store, stamp
+        if current is not None and current is not store:
+            # El almacén anterior ya no se sirve: soltamos sus mmap en vez de esperar al GC
+            current.close()
+        if stamp is None and store is not None:
+            # Recién migrado desde el JSON antiguo: meta.json ya existe
+            st = meta_path.stat()
+            _kb_handle["stamp"] = (st.st_mtime_ns, st.st_size)
+        return store
+
+def embed_queries(queries):
+    """Embeddings de consultas con LRU en memoria; los fallos van en una sola petición por lotes."""
+    keys = [" ".join(q.split()) for q in queries]
+    vectors = [_query_cache.get(key) for key in keys]
+    missing = sorted({key for key, vec in zip(keys, vectors) if vec is None})
+    if missing:
+        fresh = dict(zip(missing, get_embedding_pipeline().embed(missing)))
+        for key, vec in fresh.items():
+            _query_cache.put(key, np.asarray(vec, dtype=np.float32))
+        vectors = [vec if vec is not None else np.asarray(fresh[key], dtype=np.float32) for key, vec in zip(keys, vectors)]
+    return np.vstack(vectors)
 
 # --- 1. CAPACIDAD VISUAL (Con Telemetría) ---
-def ingest_pdfs(pdf_dir, progress_callback=None):
+def _page_count(path):
+    try:
+        with fitz.open(path) as doc:
+            return doc.page_count
+    except Exception:
+        return 0
+
+def plan_reindex(files, store=None):
+    """
+    Compara los PDFs en disco con los documentos ya indexados.
+    Tamaño + mtime iguales -> sin cambios (no se relee el archivo);
+    si difieren se calcula el SHA-256 para distinguir un simple 'touch' de un cambio real.
+    """
+    indexed = store.live_docs() if store is not None else {}
+    plan = {"added": [], "modified": [], "touched": [], "removed": [], "unchanged": []}
+    for f in files:
+        st = f.stat()
+        info = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+        old = indexed.get(f.name)
+        if old and old.get("size") == info["size"] and old.get("mtime_ns") == info["mtime_ns"]:
+            plan["unchanged"].append((f, old))
+            continue
+        info["sha256"] = sha256_file(f)
+        if old and old.get("sha256") == info["sha256"]:
+            plan["touched"].append((f, info))
+        else:
+            plan["modified" if old else "added"].append((f, info))
+    names = {f.name for f in files}
+    plan["removed"] = [name for name in indexed if name not in names]
+    return plan
+
+def _refresh_indexes(store):
+    """Índices derivados persistidos junto a los vectores: ANN (IVF) y léxico (BM25)."""
+    before = [(store.root / name).stat().st_mtime_ns if (store.root / name).exists() else None
+              for name in (IVF_FILE, LEXICAL_FILE)]
+    update_ivf(store)
+    update_lexical(store)
+    after = [(store.root / name).stat().st_mtime_ns if (store.root / name).exists() else None
+             for name in (IVF_FILE, LEXICAL_FILE)]
+    return before != after
+
+def _index_settings():
+    return {"chunk_max_tokens": CHUNK_MAX_TOKENS, "chunk_overlap_tokens": CHUNK_OVERLAP_TOKENS}
+
+def ingest_pdfs(pdf_dir, progress_callback=None, embed_client=None, force=False):
     """
     Lee PDFs y vectoriza con barra de progreso en tiempo real.
+    Indexación incremental: solo se procesan los PDFs nuevos o modificados y los
+    retirados se marcan como borrados. force=True reconstruye el índice completo.
+    Las páginas se envían en lotes concurrentes (ver EmbeddingPipeline).
     """
-    knowledge = []
     pdf_path = Path(pdf_dir)
     
-    # Si existe memoria previa, la cargamos (puedes comentar esto si quieres forzar relectura)
-    if VECTOR_DB_PATH.exists():
-        if progress_callback: progress_callback(0.1, "🧠 Cargando memoria existente...")
+    # Memoria previa: punto de partida de la actualización incremental
+    store = None
+    if not force and (VectorStore.exists(VECTOR_STORE_DIR) or VECTOR_DB_PATH.exists()):
+        if progress_callback: progress_callback(0.05, "🧠 Cargando memoria existente...")
         try:
-            with open(VECTOR_DB_PATH, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except: pass
+            store = load_vector_store()
+        except Exception as e:
+            print(f"⚠️ Memoria ilegible, se reindexa: {e}")
+        if store is not None and store.meta.get("model") not in (None, EMBEDDING_MODEL):
+            print(f"🔁 Modelo distinto ({store.meta.get('model')}): se reindexa todo.")
+            store = None
+        if store is not None and (store.columns != ROW_COLUMNS or store.meta.get("settings") != _index_settings()):
+            print("🔁 Formato o fragmentación distintos: se reindexa todo.")
+            store = None
 
-    if not pdf_path.exists():
-        return []
-    
     # Listamos archivos primero para saber el total
-    files = list(pdf_path.glob("*.pdf"))
-    total_files = len(files)
-    
-    if total_files == 0:
+    files = sorted(pdf_path.glob("*.pdf")) if pdf_path.exists() else []
+    plan = plan_reindex(files, store)
+    changed = plan["added"] + plan["modified"]
+    print(
+        f"📂 {pdf_path}: {len(plan['added'])} nuevos, {len(plan['modified'])} modificados, "
+        f"{len(plan['removed'])} retirados, {len(plan['unchanged']) + len(plan['touched'])} sin cambios"
+    )
+
+    if store is None and not changed:
         return []
-    
-    print(f"📂 Indexando {total_files} archivos desde: {pdf_path}")
-    
-    for idx, f in enumerate(files):
-        # --- TELEMETRÍA: Calculamos porcentaje y avisamos a la App ---
-        if progress_callback:
-            percent = (idx / total_files)
-            progress_callback(percent, f"⏳ Procesando ({idx+1}/{total_files}): {f.name}")
-        # -------------------------------------------------------------
+    if not (changed or plan["removed"] or plan["touched"]):
+        if _refresh_indexes(store):
+            store = load_vector_store()
+        if progress_callback: progress_callback(1.0, "✅ Índice al día (sin cambios)")
+        return store
+    if changed and not (embed_client or client):
+        print("⚠️ Sin cliente de embeddings (OPENAI_API_KEY): no se puede indexar.")
+        return store if store is not None else []
 
-        try:
-            doc = fitz.open(f)
-            for i, page in enumerate(doc):
-                text = page.get_text().replace("\n", " ").strip()
-                if len(text) > 50:
-                    vector = get_embedding(text)
-                    knowledge.append({
-                        "source": f.name,
-                        "page": i + 1,
-                        "content": text,
-                        "embedding": vector
-                    })
-        except Exception as e:
-            print(f"⚠️ Error leyendo {f.name}: {e}")
-            
-    # Guardar memoria
-    if progress_callback: progress_callback(0.9, "💾 Guardando vectores en disco...")
+    # Los vectores se vuelcan a disco según llegan (sin lista intermedia en memoria)
+    pipeline = get_embedding_pipeline(embed_client)
+    with VectorStoreWriter(VECTOR_STORE_DIR, model=EMBEDDING_MODEL, append=store is not None,
+                           settings=_index_settings()) as writer:
+        for name in plan["removed"]:
+            writer.tombstone(name)
+        for f, info in plan["touched"]:
+            writer.update_doc(f.name, **info)
+        for f, info in changed:
+            writer.begin_doc(f.name, pages=_page_count(f), indexed_utc=datetime.utcnow().isoformat() + "Z", **info)
+
+        # Páginas (pool de procesos) -> fragmentos -> lotes de embeddings -> disco, todo en streaming
+        failed = set()
+        pages = iter_pages([f for f, _ in changed], progress_callback, failed=failed)
+        chunks = iter_chunks(pages, CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS)
+        for item, vector in pipeline.embed_stream(chunks, text_of=lambda c: c["content"]):
+            writer.add(vector, item["source"], item["page"], item["content"],
+                       item["char_start"], item["char_end"])
+        # La versión anterior de un PDF modificado solo se borra si la nueva se extrajo entera;
+        # si no, sigue viva y el PDF se reintenta en la próxima indexación
+        for f, _ in changed:
+            writer.finish_doc(f.name, ok=f.name not in failed)
+        # Guardar memoria
+        if progress_callback: progress_callback(0.9, "💾 Guardando vectores en disco...")
+    print(f"📡 Embeddings: {pipeline.stats}")
+    if pipeline.cache is not None:
+        print(f"🗃️ Caché de embeddings: {pipeline.cache.stats}")
     
-    try:
-        VECTOR_DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-        with open(VECTOR_DB_PATH, 'w', encoding='utf-8') as f:
-            json.dump(knowledge, f, ensure_ascii=False, indent=2)
-    except Exception as e:
-        print(f"Error guardando: {e}")
+    knowledge = load_vector_store()
+    if knowledge.dead_ratio > COMPACT_DEAD_RATIO:
+        if progress_callback: progress_callback(0.95, "🧹 Compactando índice...")
+        knowledge = compact(VECTOR_STORE_DIR)
+    if progress_callback: progress_callback(0.97, "🔎 Actualizando índices ANN y BM25...")
+    if _refresh_indexes(knowledge):
+        knowledge = load_vector_store()
 
     # Finalizar
     if progress_callback: progress_callback(1.0, "✅ Indexación Completada")
 
     return knowledge
 
-# --- 2. RECUPERACIÓN SEMÁNTICA (Sin cambios) ---
-def retrieve_context(query, knowledge_base=None, k=3):
-    if not knowledge_base:
-        if VECTOR_DB_PATH.exists():
-            with open(VECTOR_DB_PATH, 'r', encoding='utf-8') as f:
-                knowledge_base = json.load(f)
-        else: return []
+# --- 2. RECUPERACIÓN SEMÁNTICA ---
+MIN_SCORE = 0.3
+# "hybrid" (vectorial + BM25 fusionados por RRF), "vector" o "lexical".
+# Sin cliente de OpenAI se usa siempre "lexical".
+RETRIEVAL_MODE = os.environ.get("GICES_RETRIEVAL_MODE", "hybrid")
+# Candidatos que aporta cada ranking a la fusión
+FUSION_POOL = 20
+
+def _format_hit(item, score):
+    result = {
+        "source": item["source"],
+        "page": item["page"],
+        "content": item["content"],
+        "score": float(score)
+    }
+    if "char_start" in item:
+        result["char_start"], result["char_end"] = item["char_start"], item["char_end"]
+    return result
 
-    if not client or not knowledge_base: return []
+def _fuse(vector_hits, lexical_hits, k, rrf_k=60):
+    """
+    RRF de ambos rankings. score = RRF normalizado a [0, 1] (1 = primero en los dos);
+    se conservan el coseno y el BM25 originales para la trazabilidad.
+    """
+    cosine = dict(vector_hits)
+    bm25 = dict(lexical_hits)
+    # Solo compiten los candidatos vectoriales que superan el umbral de relevancia
+    vector_hits = [(idx, s) for idx, s in vector_hits if s > MIN_SCORE]
+    best = 2.0 / (rrf_k + 1)
+    return [
+        (idx, rrf / best, {"cosine": cosine.get(idx, 0.0), "bm25": bm25.get(idx, 0.0)})
+        for idx, rrf in reciprocal_rank_fusion([vector_hits, lexical_hits], k=k, rrf_k=rrf_k)
+    ]
+
+def _lexical_hits(knowledge_base, query, k):
+    """BM25 con score relativo al mejor resultado (para el campo de relevancia)."""
+    hits = knowledge_base.search_lexical(query, k)
+    top = hits[0][1] if hits else 1.0
+    return [_format_hit(knowledge_base.record(idx), score / top) | {"bm25": score} for idx, score in hits]
+
+def retrieve_context(query, knowledge_base=None, k=3, mode=None):
+    """
+    knowledge_base puede ser un VectorStore (formato binario) o, por compatibilidad,
+    una lista de dicts con "embedding" como la que devolvía la versión JSON.
+    """
+    return retrieve_context_many([query], knowledge_base, k, mode)[0]
+
+def retrieve_context_many(queries, knowledge_base=None, k=3, mode=None):
+    """
+    Recuperación por lotes: todas las consultas se vectorizan en una sola petición
+    (EmbeddingPipeline) y se puntúan con una multiplicación de matrices.
+    En modo "hybrid"/"lexical" se añade el índice BM25 (códigos exactos como "E4-5"
+    o "Artículo 4"), que no necesita API.
+    Devuelve una lista de resultados por consulta, en el mismo orden.
+    """
+    empty = [[] for _ in queries]
+    if knowledge_base is None or (isinstance(knowledge_base, list) and not knowledge_base):
+        knowledge_base = get_knowledge_base()
+        if knowledge_base is None: return empty
+    if not len(knowledge_base) or not queries: return empty
+
+    mode = mode or RETRIEVAL_MODE
+    has_lexical = isinstance(knowledge_base, VectorStore) and knowledge_base.lexical is not None
+    if not has_lexical:
+        mode = "vector"
+    elif not client:
+        mode = "lexical"
+    if mode == "vector" and not client: return empty
 
     try:
-        query_embedding = get_embedding(query)
-        kb_embeddings = [item["embedding"] for item in knowledge_base]
-        
-        query_vec = np.array(query_embedding).reshape(1, -1)
-        kb_matrix = np.array(kb_embeddings)
-        
-        similarities = cosine_similarity(query_vec, kb_matrix)[0]
-        top_indices = similarities.argsort()[-k:][::-1]
-        
-        results = []
-        for idx in top_indices:
-            score = similarities[idx]
-            if score > 0.3: 
-                item = knowledge_base[idx]
-                results.append({
-                    "source": item["source"],
-                    "page": item["page"],
-                    "content": item["content"],
-                    "score": float(score)
-                })
-        return results
+        if mode == "lexical":
+            return [_lexical_hits(knowledge_base, q, k) for q in queries]
+
+        query_matrix = embed_queries(queries)
+
+        if isinstance(knowledge_base, VectorStore) and mode == "hybrid":
+            pool = max(FUSION_POOL, k)
+            vector_hits = knowledge_base.search_many(query_matrix, k=pool)
+            return [
+                [_format_hit(knowledge_base.record(idx), score) | extra
+                 for idx, score, extra in _fuse(v_hits, knowledge_base.search_lexical(q, pool), k)]
+                for q, v_hits in zip(queries, vector_hits)
+            ]
+
+        if isinstance(knowledge_base, VectorStore):
+            all_hits = knowledge_base.search_many(query_matrix, k=k)
+            get_item = knowledge_base.record
+        else:
+            kb_matrix = normalize_rows([item["embedding"] for item in knowledge_base])
+            similarities = normalize_rows(query_matrix) @ kb_matrix.T
+            kk = min(k, len(knowledge_base))
+            top = np.argpartition(-similarities, kk - 1, axis=1)[:, :kk]
+            all_hits = [
+                sorted(((int(i), float(row[i])) for i in idx), key=lambda h: -h[1])
+                for row, idx in zip(similarities, top)
+            ]
+            get_item = lambda idx: knowledge_base[idx]
+
+        return [
+            [_format_hit(get_item(idx), score) for idx, score in hits if score > MIN_SCORE]
+            for hits in all_hits
+        ]
     except Exception as e:
         print(f"Error retrieval: {e}")
-        return []
+        return empty
 
-# --- 3. RAZONAMIENTO (Sin cambios) ---
-def deliberative_analysis(data_point, context_chunks, mode="Academic Validation"):
-    if not client: return {"narrative": "Error API Key", "compliance_check": "FAIL"}
+# --- 3. RAZONAMIENTO ---
+DELIBERATION_MODEL = "gpt-4o"
+# Ejecución concurrente de deliberaciones (ver DeliberationExecutor)
+DELIBERATION_CONCURRENCY = int(os.environ.get("GICES_DELIBERATION_CONCURRENCY", 8))
+DELIBERATION_TPM = int(os.environ.get("GICES_DELIBERATION_TPM", 30000))
+DELIBERATION_TIMEOUT_SEC = float(os.environ.get("GICES_DELIBERATION_TIMEOUT_SEC", 90))
+DELIBERATION_MAX_COMPLETION_TOKENS = 400
+# Presupuesto de tokens para la evidencia del prompt (0 = sin límite) y umbral de casi-duplicados
+PROMPT_EVIDENCE_TOKENS = int(os.environ.get("GICES_PROMPT_EVIDENCE_TOKENS", 1500))
+EVIDENCE_DEDUP_THRESHOLD = float(os.environ.get("GICES_EVIDENCE_DEDUP_THRESHOLD", 0.8))
+# Caché de respuestas del LLM (temperature=0 -> misma entrada, misma respuesta).
+# GICES_RESPONSE_CACHE vacío la desactiva; GICES_RESPONSE_CACHE_BYPASS=1 la ignora en una ejecución.
+RESPONSE_CACHE_PATH = os.environ.get("GICES_RESPONSE_CACHE", "rag/response_cache.sqlite")
+RESPONSE_CACHE_MAX_MB = int(os.environ.get("GICES_RESPONSE_CACHE_MAX_MB", 256))
+RESPONSE_CACHE_TTL_DAYS = float(os.environ.get("GICES_RESPONSE_CACHE_TTL_DAYS", 30))
+RESPONSE_CACHE_BYPASS = os.environ.get("GICES_RESPONSE_CACHE_BYPASS", "") not in ("", "0")
+
+# Contadores acumulados del proceso (raga_compute vuelca la diferencia de cada ejecución)
+# "errors": dictámenes que no salen del modelo (sin API key, fallo de la llamada o JSON no válido)
+deliberation_stats = {"records": 0, "cache_hits": 0, "cache_misses": 0, "llm_calls": 0, "bypassed": 0,
+                      "prompt_tokens": 0, "completion_tokens": 0, "errors": 0}
+_stats_lock = threading.Lock()
+_response_cache = None
+
+def get_response_cache():
+    global _response_cache
+    if _response_cache is None and RESPONSE_CACHE_PATH:
+        try:
+            _response_cache = DiskCache(
+                RESPONSE_CACHE_PATH,
+                max_bytes=RESPONSE_CACHE_MAX_MB * 1024 * 1024,
+                ttl_sec=RESPONSE_CACHE_TTL_DAYS * 86400 if RESPONSE_CACHE_TTL_DAYS > 0 else None
+            )
+        except Exception as e:
+            print(f"⚠️ Caché de respuestas no disponible: {e}")
+    return _response_cache
+
+def _count_deliberation(**deltas):
+    with _stats_lock:
+        for key, value in deltas.items():
+            deliberation_stats[key] += value
+
+def deliberation_report(since=None):
+    """
+    Copia de los contadores con la tasa de aciertos calculada. Los contadores son del
+    proceso (en la App se acumulan entre ejecuciones): con since=<informe anterior>
+    devuelve solo lo ocurrido desde entonces.
+    """
+    with _stats_lock:
+        report = dict(deliberation_stats)
+    if since is not None:
+        report = {key: value - since.get(key, 0) for key, value in report.items()}
+    lookups = report["cache_hits"] + report["cache_misses"]
+    report["hit_rate"] = round(report["cache_hits"] / lookups, 4) if lookups else 0.0
+    return report
+
+def evidence_id(chunk):
+    """Identificador estable de un fragmento: fuente, página y rango de caracteres."""
+    return f"{chunk.get('source')}#p{chunk.get('page')}:{chunk.get('char_start', '')}-{chunk.get('char_end', '')}"
+
+def response_key(data_point, context_chunks, prompt=None, model=DELIBERATION_MODEL):
+    """sha256 de modelo + prompt + dato + IDs de la evidencia usada."""
+    payload = json.dumps({
+        "model": model,
+        "prompt": prompt if prompt is not None else build_prompt(data_point, context_chunks),
+        "data_point": data_point,
+        "evidence": [evidence_id(c) for c in context_chunks],
+    }, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _cache_enabled(use_cache):
+    return use_cache and not RESPONSE_CACHE_BYPASS and get_response_cache() is not None
+
+def assemble_prompt(data_point, context_chunks, budget_tokens=None):
+    """Devuelve (prompt, informe de la evidencia). Ver modules/prompt_budget."""
+    budget = PROMPT_EVIDENCE_TOKENS if budget_tokens is None else budget_tokens
+    evidence, report = assemble_evidence(context_chunks, budget or None, EVIDENCE_DEDUP_THRESHOLD)
+    evidence_str = "\n\n".join(format_evidence(c) for c in evidence)
 
-    evidence_str = "\n\n".join([
-        f"- [Fuente: {c['source']} Pág.{c['page']} | Relevancia: {c.get('score',0):.2f}] {c['content'][:800]}..." 
-        for c in context_chunks
-    ])
-    
     prompt = f"""
     Actúa como un auditor experto en normativas de sostenibilidad (CSRD/ESRS/TNFD).
     OBJETIVO: Validar rigurosamente el siguiente dato reportado contra la evidencia normativa.
@@ -139,13 +460,190 @@ def deliberative_analysis(data_point, context_chunks, mode="Academic Validation"
         "key_gap": "Brecha principal"
     }}
     """
+    report["prompt_tokens_est"] = count_tokens(prompt)
+    return prompt, report
+
+def build_prompt(data_point, context_chunks):
+    return assemble_prompt(data_point, context_chunks)[0]
+
+def _cached_verdict(raw):
+    """
+    Dictamen de la caché validado de nuevo; None si no es válido (se trata como
+    fallo de caché). El consumo de tokens no se repite: un acierto no gasta nada.
+    """
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
+        verdict, error = validate_verdict(json.loads(raw))
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+    if error:
+        return None
+    evidence = (verdict.get("token_usage") or {}).get("evidence")
+    verdict["token_usage"] = {"prompt_tokens": 0, "completion_tokens": 0, "cached": True, "evidence": evidence}
+    return verdict
+
+def _deliberate(data_point, context_chunks, mode="Academic Validation", timeout=None, assembled=None):
+    """
+    Llamada al LLM sin capturar errores (los reintentos los gestiona el llamante).
+    assembled = (prompt, informe) ya calculado por assemble_prompt, para no repetirlo.
+    El dictamen sale validado; si no cumple lleva "validation_error".
+    """
+    prompt, evidence_report = assembled or assemble_prompt(data_point, context_chunks)
+    llm = client.with_options(timeout=timeout, max_retries=0) if timeout and hasattr(client, "with_options") else client
+    response = llm.chat.completions.create(
+        model=DELIBERATION_MODEL,
+        messages=[{"role": "system", "content": prompt}],
+        response_format={"type": "json_object"},
+        temperature=0.0,
+        max_tokens=DELIBERATION_MAX_COMPLETION_TOKENS
+    )
+    analysis, error = parse_verdict(response.choices[0].message.content)
+    if error:
+        analysis["validation_error"] = error
+    # Consumo real de la llamada (o la estimación local si la API no lo devuelve)
+    usage = getattr(response, "usage", None)
+    prompt_tokens = getattr(usage, "prompt_tokens", None) or evidence_report["prompt_tokens_est"]
+    completion_tokens = getattr(usage, "completion_tokens", None) or 0
+    _count_deliberation(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+    analysis["token_usage"] = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                               "evidence": evidence_report}
+    return analysis
+
+def deliberative_analysis(data_point, context_chunks, mode="Academic Validation", use_cache=True):
+    return deliberative_analysis_many([(data_point, context_chunks)], mode, max_workers=1, use_cache=use_cache)[0]
+
+def deliberative_analysis_many(items, mode="Academic Validation", max_workers=None,
+                               tokens_per_minute=None, timeout_sec=None, use_cache=True):
+    """
+    Versión concurrente para carteras grandes. items = [(data_point, context_chunks)].
+    Primero se consulta la caché de respuestas; solo los fallos van al LLM, con
+    concurrencia acotada, límite de tokens/minuto, reintentos con jitter y timeout por
+    registro. Los resultados vuelven en el mismo orden que items.
+    use_cache=False (o GICES_RESPONSE_CACHE_BYPASS=1) fuerza la llamada y no escribe en caché.
+    """
+    items = list(items)
+    _count_deliberation(records=len(items))
+    if not client:
+        _count_deliberation(errors=len(items))
+        return [{"narrative": "Error API Key", "compliance_check": "FAIL"} for _ in items]
+
+    results = [None] * len(items)
+    keys = [None] * len(items)
+    # Prompt y recuento de tokens una sola vez por registro: sirven para la clave de
+    # caché, el coste en el limitador de tokens/minuto y la llamada al LLM
+    assembled = [assemble_prompt(dp, chunks) for dp, chunks in items]
+    cache = get_response_cache() if _cache_enabled(use_cache) else None
+    if cache is not None:
+        keys = [response_key(dp, chunks, prompt=assembled[i][0]) for i, (dp, chunks) in enumerate(items)]
+        for i, cached in enumerate(cache.get_many(keys)):
+            if cached is not None:
+                results[i] = _cached_verdict(cached)
+        hits = sum(r is not None for r in results)
+        _count_deliberation(cache_hits=hits, cache_misses=len(items) - hits)
+    else:
+        _count_deliberation(bypassed=len(items))
+
+    pending = [i for i, r in enumerate(results) if r is None]
+    if not pending:
+        return results
+
+    executor = DeliberationExecutor(
+        max_workers=max_workers or DELIBERATION_CONCURRENCY,
+        tokens_per_minute=tokens_per_minute or DELIBERATION_TPM,
+        timeout_sec=timeout_sec or DELIBERATION_TIMEOUT_SEC,
+    )
+    failed = set()
+
+    def on_error(i, e):
+        failed.add(i)
+        return {"narrative": f"Error: {e}", "compliance_check": "FAIL"}
+
+    fresh = executor.map(
+        lambda i, timeout: _deliberate(items[i][0], items[i][1], mode, timeout=timeout, assembled=assembled[i]),
+        pending,
+        token_cost=lambda i: assembled[i][1]["prompt_tokens_est"] + DELIBERATION_MAX_COMPLETION_TOKENS,
+        on_error=on_error,
+    )
+    _count_deliberation(llm_calls=executor.stats["calls"])
+    for i, analysis in zip(pending, fresh):
+        results[i] = analysis
+    _count_deliberation(errors=sum(i in failed or "validation_error" in results[i] for i in pending))
+    if cache is not None:
+        # Los errores y los dictámenes no válidos no se cachean: se reintentan en la siguiente ejecución
+        cache.put_many(
+            (keys[i], json.dumps(results[i], ensure_ascii=False).encode("utf-8"))
+            for i in pending if i not in failed and "validation_error" not in results[i]
+        )
+    if len(pending) > 1:
+        print(f"🧮 Deliberaciones: {executor.stats}")
+    return results
+
+def deliberative_analysis_stream(data_point, context_chunks, mode="Academic Validation", use_cache=True):
+    """
+    Variante en streaming para la App. Genera eventos:
+      ("narrative", texto)  -> fragmentos de la narrativa según llegan del LLM
+      ("verdict", dict)     -> dictamen final validado (compliance_check, key_gap)
+    Con acierto en la caché de respuestas la narrativa llega de una vez.
+    """
+    _count_deliberation(records=1)
+    if not client:
+        _count_deliberation(errors=1)
+        yield "verdict", {"narrative": "Error API Key", "compliance_check": "FAIL"}
+        return
+
+    prompt, evidence_report = assemble_prompt(data_point, context_chunks)
+    cache = get_response_cache() if _cache_enabled(use_cache) else None
+    key = response_key(data_point, context_chunks, prompt=prompt) if cache is not None else None
+    if cache is not None:
+        cached = cache.get(key)
+        verdict = _cached_verdict(cached) if cached is not None else None
+        _count_deliberation(cache_hits=int(verdict is not None), cache_misses=int(verdict is None))
+        if verdict is not None:
+            yield "narrative", verdict.get("narrative", "")
+            yield "verdict", verdict
+            return
+    else:
+        _count_deliberation(bypassed=1)
+
+    try:
+        # Mismo límite por registro que DeliberationExecutor (aquí sin reintentos: la App ya pinta la narrativa)
+        llm = client.with_options(timeout=DELIBERATION_TIMEOUT_SEC, max_retries=0) \
+            if hasattr(client, "with_options") else client
+        stream = llm.chat.completions.create(
+            model=DELIBERATION_MODEL,
             messages=[{"role": "system", "content": prompt}],
             response_format={"type": "json_object"},
-            temperature=0.0
+            temperature=0.0,
+            max_tokens=DELIBERATION_MAX_COMPLETION_TOKENS,
+            stream=True,
+            stream_options={"include_usage": True}
         )
-        return json.loads(response.choices[0].message.content)
+        _count_deliberation(llm_calls=1)
+        narrative = JsonFieldStream("narrative")
+        parts, usage = [], None
+        for chunk in stream:
+            if getattr(chunk, "usage", None):
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content or ""
+            parts.append(delta)
+            text = narrative.feed(delta)
+            if text:
+                yield "narrative", text
     except Exception as e:
-        return {"narrative": f"Error: {e}", "compliance_check": "FAIL"}
+        _count_deliberation(errors=1)
+        yield "verdict", {"narrative": f"Error: {e}", "compliance_check": "FAIL"}
+        return
+
+    verdict, error = parse_verdict("".join(parts))
+    prompt_tokens = getattr(usage, "prompt_tokens", None) or evidence_report["prompt_tokens_est"]
+    completion_tokens = getattr(usage, "completion_tokens", None) or 0
+    _count_deliberation(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+    verdict["token_usage"] = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                              "evidence": evidence_report}
+    if error:
+        _count_deliberation(errors=1)
+        verdict["validation_error"] = error
+    elif cache is not None:
+        cache.put(key, json.dumps(verdict, ensure_ascii=False).encode("utf-8"))
+    yield "verdict", verdict
@@ -0,0 +1,111 @@
+import os
+import re
+import glob
+from pathlib import Path
+
+import yaml
+
+# --- MANIFIESTO DE INGESTA ---
+# Una partición es (dominio × entidad × periodo) con su fichero de entrada. El
+# manifiesto (YAML) las enumera explícitamente o las deduce de patrones glob con
+# los marcadores {entity} y {period}:
+#
+#   normalized: "data/normalized/{entity}/{domain}_{period}.json"   # opcional
+#   partitions:
+#     - { domain: energy, entity: ACME, period: "2024-01", input: data/samples/energy_2024-01.json }
+#   sources:
+#     - { domain: hr, glob: "data/raw/{entity}/hr_{period}.jsonl" }
+NORMALIZED_TEMPLATE = "data/normalized/{entity}/{domain}_{period}.json"
+NORMALIZED_TEMPLATE_NO_ENTITY = "data/normalized/{domain}_{period}.json"
+_PLACEHOLDER = re.compile(r"\{(entity|period)\}")
+_TEMPLATE_FIELD = re.compile(r"\{(\w*)\}")
+_KEYS = ("domain", "entity", "period")
+_MONTH = re.compile(r"^\d{4}-\d{2}$")
+_MONTH_RULE = re.compile(r"^(within_month|equals)\('\d{4}-\d{2}'\)$")
+
+
+def partition_id(part):
+    return "/".join(str(part[k]) for k in ("domain", "entity", "period") if part.get(k))
+
+
+def normalized_path(part, template=None):
+    if template is None:
+        template = NORMALIZED_TEMPLATE if part.get("entity") else NORMALIZED_TEMPLATE_NO_ENTITY
+    return template.format(domain=part["domain"], entity=part.get("entity") or "", period=part.get("period") or "")
+
+
+def expand_glob(domain, pattern):
+    """Particiones de un patrón con {entity}/{period}, extraídos de cada ruta encontrada."""
+    pieces = _PLACEHOLDER.split(pattern)   # literales en posiciones pares, nombres en impares
+    regex = re.compile("^" + "".join(f"(?P<{p}>[^/]+)" if i % 2 else re.escape(p)
+                                     for i, p in enumerate(pieces)) + "$")
+    parts = []
+    for path in sorted(glob.glob(_PLACEHOLDER.sub("*", pattern))):
+        m = regex.match(Path(path).as_posix())
+        if m:
+            parts.append({"domain": domain, "input": path, **m.groupdict()})
+    return parts
+
+
+def check_template(template, parts, where):
+    """
+    La plantilla solo admite {domain}, {entity} y {period}, y debe incluir cada uno
+    de ellos que varíe entre las particiones que la usan (si no, se pisarían).
+    """
+    used = set(_TEMPLATE_FIELD.findall(template))
+    unknown = used - set(_KEYS)
+    if unknown:
+        raise ValueError(f"Marcadores desconocidos en la plantilla normalized de {where}: {sorted(unknown)}")
+    for key in _KEYS:
+        values = {p.get(key) for p in parts if "normalized" not in p}
+        if key not in used and len(values) > 1:
+            raise ValueError(f"La plantilla normalized de {where} no incluye {{{key}}} "
+                             f"y hay particiones con distinto {key}: {sorted(map(str, values))}")
+
+
+def load_manifest(path, schemas):
+    """
+    Lista de particiones {domain, entity, period, input, schema, normalized}.
+    schemas: {dominio: ruta del JSON Schema}; un dominio desconocido es un error, y
+    también dos particiones con el mismo normalizado.
+    """
+    spec = yaml.safe_load(Path(path).read_text(encoding="utf-8")) or {}
+    template = spec.get("normalized")
+    parts = [dict(p) for p in spec.get("partitions") or []]
+    for source in spec.get("sources") or []:
+        parts.extend(expand_glob(source["domain"], source["glob"]))
+    if template is not None:
+        check_template(template, parts, path)
+    seen, outputs = set(), {}
+    for part in parts:
+        if part["domain"] not in schemas:
+            raise ValueError(f"Dominio desconocido en {path}: {part['domain']} (válidos: {list(schemas)})")
+        pid = partition_id(part)
+        if pid in seen:
+            raise ValueError(f"Partición duplicada en {path}: {pid}")
+        seen.add(pid)
+        part.setdefault("entity", None)
+        part.setdefault("period", None)
+        part.setdefault("schema", schemas[part["domain"]])
+        part.setdefault("normalized", normalized_path(part, template))
+        out = os.path.normpath(part["normalized"])
+        if out in outputs:
+            raise ValueError(f"Las particiones {outputs[out]} y {pid} de {path} escriben el mismo normalizado: {out}")
+        outputs[out] = pid
+    return parts
+
+
+def rules_for_period(rules, period):
+    """
+    Las reglas de puntualidad de dq_rules.yaml citan el mes de referencia
+    (within_month('2024-01'), equals('2024-01')): en cada partición mensual se
+    evalúan contra el periodo de la partición.
+    """
+    if not period or not _MONTH.match(str(period)):
+        return rules
+
+    def swap(rule):
+        if not isinstance(rule.get("rule"), str):
+            return rule
+        return dict(rule, rule=_MONTH_RULE.sub(rf"\1('{period}')", rule["rule"]))
+    return {cat: [swap(r) for r in rs or []] for cat, rs in (rules or {}).items()}
@@ -0,0 +1,163 @@
+import os
+import re
+import math
+import numpy as np
+from pathlib import Path
+
+# --- ÍNDICE LÉXICO BM25 ---
+# Índice invertido persistido junto a los vectores (rag/vector_store/lexical.npz):
+#   terms          -> vocabulario (term_id = posición)
+#   term_offsets   -> CSR: postings del término t en [term_offsets[t], term_offsets[t+1])
+#   post_rows/tfs  -> fila del almacén y frecuencia del término en ella
+#   doc_len        -> nº de tokens por fila (normalización de longitud de BM25)
+# Funciona sin API key y sin embeddings: es el camino offline de retrieve_context.
+LEXICAL_FILE = "lexical.npz"
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+TOKEN_RE = re.compile(r"[0-9a-záéíóúüñç]+(?:[-./][0-9a-záéíóúüñç]+)*")
+# "Artículo 4", "Article 4", "Art. 4", "Anexo II"... -> un único token "art:4" / "annex:ii"
+REFERENCE_RE = re.compile(r"\b(art[íi]culo|article|art\.|anexo|annex)\s+([0-9]+[a-z]?|[ivxlc]+)\b")
+REFERENCE_KIND = {"artículo": "art", "articulo": "art", "article": "art", "art.": "art", "anexo": "annex", "annex": "annex"}
+
+
+def tokenize(text):
+    """
+    Tokens en minúsculas. Los códigos compuestos (E4-5, 2024/1991) se indexan enteros
+    y también por partes, y las referencias a artículos/anexos generan un token propio.
+    """
+    text = text.lower()
+    tokens = []
+    for m in TOKEN_RE.finditer(text):
+        tok = m.group(0).strip(".")
+        if not tok:
+            continue
+        tokens.append(tok)
+        if any(c in tok for c in "-./"):
+            tokens.extend(p for p in re.split(r"[-./]", tok) if p)
+    for m in REFERENCE_RE.finditer(text):
+        tokens.append(f"{REFERENCE_KIND[m.group(1)]}:{m.group(2)}")
+    return tokens
+
+
+class LexicalIndex:
+    def __init__(self, terms, term_offsets, post_rows, post_tfs, doc_len, generation=None):
+        self.terms = list(terms)
+        self.term_ids = {t: i for i, t in enumerate(self.terms)}
+        self.term_offsets = np.asarray(term_offsets, dtype=np.int64)
+        self.post_rows = np.asarray(post_rows, dtype=np.int64)
+        self.post_tfs = np.asarray(post_tfs, dtype=np.float32)
+        self.doc_len = np.asarray(doc_len, dtype=np.float32)
+        self.generation = generation
+        self.avgdl = float(self.doc_len.mean()) if len(self.doc_len) else 0.0
+
+    def __len__(self):
+        return len(self.doc_len)
+
+    @classmethod
+    def empty(cls, generation=None):
+        return cls([], [0], [], [], [], generation)
+
+    def extend(self, texts):
+        """Añade filas nuevas (en orden) re-ordenando los postings de forma vectorizada."""
+        base = len(self.doc_len)
+        term_ids = dict(self.term_ids)
+        terms = list(self.terms)
+        new_t, new_r, new_f, lens = [], [], [], []
+        for offset, text in enumerate(texts):
+            tokens = tokenize(text)
+            lens.append(len(tokens))
+            counts = {}
+            for tok in tokens:
+                counts[tok] = counts.get(tok, 0) + 1
+            for tok, tf in counts.items():
+                if tok not in term_ids:
+                    term_ids[tok] = len(terms)
+                    terms.append(tok)
+                new_t.append(term_ids[tok])
+                new_r.append(base + offset)
+                new_f.append(tf)
+        if not lens:
+            return self
+
+        old_t = np.repeat(np.arange(len(self.terms), dtype=np.int64), np.diff(self.term_offsets))
+        all_t = np.concatenate([old_t, np.asarray(new_t, dtype=np.int64)])
+        order = np.argsort(all_t, kind="stable")   # estable: las filas quedan ordenadas dentro de cada término
+        rows = np.concatenate([self.post_rows, np.asarray(new_r, dtype=np.int64)])[order]
+        tfs = np.concatenate([self.post_tfs, np.asarray(new_f, dtype=np.float32)])[order]
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(all_t, minlength=len(terms)))])
+        doc_len = np.concatenate([self.doc_len, np.asarray(lens, dtype=np.float32)])
+        return LexicalIndex(terms, offsets, rows, tfs, doc_len, self.generation)
+
+    def search(self, query, k=10, live=None):
+        """Devuelve [(fila, score_bm25)] ordenado de mayor a menor."""
+        n = len(self.doc_len)
+        ids = [self.term_ids[t] for t in set(tokenize(query)) if t in self.term_ids]
+        if not ids or n == 0:
+            return []
+        rows_parts, score_parts = [], []
+        for t in ids:
+            start, end = self.term_offsets[t], self.term_offsets[t + 1]
+            rows = self.post_rows[start:end]
+            tf = self.post_tfs[start:end]
+            df = end - start
+            idf = math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+            norm = BM25_K1 * (1.0 - BM25_B + BM25_B * self.doc_len[rows] / (self.avgdl or 1.0))
+            rows_parts.append(rows)
+            score_parts.append(idf * tf * (BM25_K1 + 1.0) / (tf + norm))
+        rows = np.concatenate(rows_parts)
+        scores = np.concatenate(score_parts)
+        uniq, inverse = np.unique(rows, return_inverse=True)
+        totals = np.bincount(inverse, weights=scores)
+        if live is not None:
+            keep = live[uniq]
+            uniq, totals = uniq[keep], totals[keep]
+        k = min(k, len(uniq))
+        if k <= 0:
+            return []
+        top = np.argpartition(-totals, k - 1)[:k]
+        top = top[np.argsort(-totals[top])]
+        return [(int(uniq[i]), float(totals[i])) for i in top]
+
+    def save(self, root):
+        path = Path(root) / LEXICAL_FILE
+        tmp = path.with_name(path.name + ".tmp.npz")
+        np.savez(
+            tmp, terms=np.array(self.terms, dtype=str), term_offsets=self.term_offsets,
+            post_rows=self.post_rows, post_tfs=self.post_tfs, doc_len=self.doc_len,
+            generation=np.array(self.generation or "")
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, root):
+        path = Path(root) / LEXICAL_FILE
+        if not path.exists():
+            return None
+        with np.load(path) as data:
+            return cls(data["terms"].tolist(), data["term_offsets"], data["post_rows"], data["post_tfs"],
+                       data["doc_len"], str(data["generation"]) or None)
+
+
+def update_lexical(store):
+    """Tras escribir el almacén: tokeniza solo las filas nuevas (o todas si se reescribió)."""
+    generation = store.meta.get("generation")
+    try:
+        index = LexicalIndex.load(store.root)
+    except Exception:
+        index = None
+    if index is None or index.generation != generation or len(index) > store.count:
+        index = LexicalIndex.empty(generation)
+    if len(index) < store.count:
+        index = index.extend(store.content(i) for i in range(len(index), store.count))
+        index.save(store.root)
+    return index
+
+
+def reciprocal_rank_fusion(rankings, k=3, rrf_k=60):
+    """Fusiona varias listas [(fila, score)] por RRF: sum(1 / (rrf_k + rango))."""
+    fused = {}
+    for ranking in rankings:
+        for rank, (row, _) in enumerate(ranking):
+            fused[row] = fused.get(row, 0.0) + 1.0 / (rrf_k + rank + 1)
+    return sorted(fused.items(), key=lambda kv: -kv[1])[:k]
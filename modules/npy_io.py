@@ -0,0 +1,23 @@
+import struct
+import numpy as np
+
+# --- CABECERAS .npy DE TAMAÑO FIJO ---
+# Compartidas por vector_store y columnar_store. Con la cabecera siempre de
+# NPY_HEADER_SIZE bytes se puede anexar al final del fichero y reescribir la
+# forma (shape) en sitio al cerrar, sin mover los datos; los datos empiezan
+# siempre en el mismo desplazamiento.
+NPY_MAGIC = b"\x93NUMPY\x01\x00"
+NPY_HEADER_SIZE = 128
+
+
+def npy_header(shape, dtype):
+    """Cabecera .npy v1.0 de NPY_HEADER_SIZE bytes para un array C-contiguo."""
+    header = repr({
+        "descr": np.lib.format.dtype_to_descr(np.dtype(dtype)),
+        "fortran_order": False,
+        "shape": tuple(shape),
+    }).encode("latin1")
+    pad = NPY_HEADER_SIZE - len(NPY_MAGIC) - 2 - len(header) - 1
+    if pad < 0:
+        raise ValueError(f"Cabecera .npy demasiado larga para {shape}")
+    return NPY_MAGIC + struct.pack("<H", len(header) + pad + 1) + header + b" " * pad + b"\n"
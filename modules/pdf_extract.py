@@ -0,0 +1,81 @@
+import os
+from collections import deque
+from multiprocessing import get_context
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz  # PyMuPDF
+
+# Páginas por tarea enviada al pool: lo bastante grande para amortizar el fitz.open
+# de cada proceso, lo bastante pequeña para repartir bien PDFs grandes.
+PAGES_PER_TASK = 8
+EXTRACT_WORKERS = int(os.environ.get("GICES_EXTRACT_WORKERS", os.cpu_count() or 1))
+MIN_TEXT_CHARS = 50
+
+
+def _clean(text):
+    return text.replace("\n", " ").strip()
+
+
+def extract_page_range(path, start, end):
+    """Se ejecuta en un proceso del pool: abre el PDF y extrae [start, end)."""
+    with fitz.open(path) as doc:
+        return [(i + 1, _clean(doc[i].get_text())) for i in range(start, min(end, doc.page_count))]
+
+
+def _page_ranges(path, pages_per_task):
+    with fitz.open(path) as doc:
+        total = doc.page_count
+    return [(start, start + pages_per_task) for start in range(0, total, pages_per_task)]
+
+
+def iter_pdf_pages(path, pool=None, pages_per_task=PAGES_PER_TASK, max_inflight=None):
+    """
+    Genera (nº de página, texto) en orden. Con `pool` las páginas se extraen en paralelo
+    y se devuelven en orden a medida que terminan, con un máximo de tareas en vuelo
+    (por defecto, el doble de procesos del pool).
+    """
+    path = str(path)
+    if pool is None:
+        with fitz.open(path) as doc:
+            for i, page in enumerate(doc):
+                yield i + 1, _clean(page.get_text())
+        return
+
+    max_inflight = max_inflight or 2 * getattr(pool, "_max_workers", EXTRACT_WORKERS)
+    pending = deque()
+    for start, end in _page_ranges(path, pages_per_task):
+        pending.append(pool.submit(extract_page_range, path, start, end))
+        if len(pending) >= max_inflight:
+            yield from pending.popleft().result()
+    while pending:
+        yield from pending.popleft().result()
+
+
+def iter_pages(files, progress_callback=None, workers=EXTRACT_WORKERS, failed=None):
+    """
+    Recorre las páginas con texto útil de cada PDF, avisando a la App por archivo.
+    Genera {"source", "page", "content"}. La telemetría se emite desde el hilo llamante
+    (seguro para Streamlit); solo la extracción se reparte entre procesos.
+    Los nombres de los PDFs que fallan se añaden a `failed` (un set) si se pasa.
+    """
+    total_files = len(files)
+    # spawn: quien llama (Streamlit, el ejecutor de deliberaciones) tiene hilos vivos y fork los duplicaría a medias
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) if workers > 1 and files else None
+    try:
+        for idx, f in enumerate(files):
+            # --- TELEMETRÍA: Calculamos porcentaje y avisamos a la App ---
+            if progress_callback:
+                percent = (idx / total_files)
+                progress_callback(percent, f"⏳ Procesando ({idx+1}/{total_files}): {f.name}")
+            # -------------------------------------------------------------
+            try:
+                for page_no, text in iter_pdf_pages(f, pool, max_inflight=2 * workers):
+                    if len(text) > MIN_TEXT_CHARS:
+                        yield {"source": f.name, "page": page_no, "content": text}
+            except Exception as e:
+                print(f"⚠️ Error leyendo {f.name}: {e}")
+                if failed is not None:
+                    failed.add(f.name)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
@@ -0,0 +1,163 @@
+import os
+import json
+import glob
+import fnmatch
+import hashlib
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from modules.file_hashing import sha256_files
+
+# --- MOTOR DEL PIPELINE (DAG) ---
+# Cada etapa declara sus artefactos de entrada, de salida y su código:
+#   {"name": ..., "cmd": [...], "inputs": [...], "outputs": [...], "code": [...], "env": [...]}
+# Las dependencias se deducen (B depende de A si lee algo que A escribe), las
+# etapas independientes se ejecutan en paralelo y, como make, una etapa se salta
+# si el hash de sus entradas, de su código y de las variables de entorno que lee
+# coincide con la última ejecución correcta y sus salidas siguen intactas. Se
+# admiten patrones glob en las rutas y en los nombres de variable ("GICES_*").
+# Una etapa que devuelve "cacheable": False (p. ej. dictámenes con errores de la
+# API) no deja huella: se vuelve a ejecutar la próxima vez.
+
+
+def expand(patterns):
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        paths.extend(matches)
+    return paths
+
+
+def hash_paths(patterns):
+    """{ruta: sha256 | None si no existe}."""
+    paths = expand(patterns)
+    present = [p for p in paths if Path(p).is_file()]
+    digests = dict(zip(present, sha256_files(present)))
+    return {p: digests.get(p) for p in paths}
+
+
+def hash_env(patterns, environ=None):
+    """{variable: sha256 del valor | None si no está definida}. Los valores no se guardan en claro."""
+    environ = os.environ if environ is None else environ
+    names = set()
+    for pattern in patterns:
+        if glob.has_magic(pattern):
+            names.update(n for n in environ if fnmatch.fnmatchcase(n, pattern))
+        else:
+            names.add(pattern)
+    return {n: hashlib.sha256(environ[n].encode("utf-8")).hexdigest() if n in environ else None
+            for n in sorted(names)}
+
+
+def stage_key(stage, environ=None):
+    """Huella de lo que determina el resultado de la etapa: comando, entradas, código y entorno."""
+    payload = json.dumps({
+        "cmd": stage["cmd"],
+        "inputs": hash_paths(stage.get("inputs", [])),
+        "code": hash_paths(stage.get("code", [])),
+        "env": hash_env(stage.get("env", []), environ),
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def dependencies(stages):
+    """
+    {etapa: [etapas de las que depende]} según entradas/salidas declaradas. Un patrón
+    glob enlaza también por su texto: la arista existe aunque aún no haya ficheros.
+    """
+    producers = {}
+    for s in stages:
+        for out in s.get("outputs", []) + expand(s.get("outputs", [])):
+            producers[out] = s["name"]
+    deps = {}
+    for s in stages:
+        inputs = s.get("inputs", [])
+        needed = {producers[i] for i in inputs + expand(inputs) if i in producers}
+        needed.update(s.get("after", []))
+        needed.discard(s["name"])
+        deps[s["name"]] = sorted(needed)
+    return deps
+
+
+def load_state(path):
+    path = Path(path)
+    if not path.exists():
+        return {}
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except Exception:
+        return {}
+
+
+def save_state(path, state):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(state, indent=2, ensure_ascii=False))
+    tmp.replace(path)
+
+
+def up_to_date(stage, key, state):
+    prev = state.get(stage["name"])
+    if not prev or prev.get("key") != key:
+        return False
+    return hash_paths(stage.get("outputs", [])) == prev.get("outputs")
+
+
+def run_dag(stages, run_fn, state_path, force=False, max_workers=None):
+    """
+    Ejecuta las etapas respetando dependencias. run_fn(stage) -> dict con "ok" (y,
+    opcionalmente, "cacheable": False para no guardar su huella aunque haya ido bien).
+    force=True re-ejecuta todo; también admite un conjunto de nombres de etapa.
+    Devuelve los resultados en el orden de `stages`, cada uno con
+    status = "executed" | "cached" | "blocked" (falló una dependencia).
+    """
+    deps = dependencies(stages)
+    by_name = {s["name"]: s for s in stages}
+    state = load_state(state_path)
+    state_lock = threading.Lock()
+    results = {}
+    running = {}
+
+    def execute(stage):
+        key = stage_key(stage)
+        forced = force is True or (bool(force) and stage["name"] in force)
+        if not forced and up_to_date(stage, key, state):
+            return {"name": stage["name"], "ok": True, "status": "cached", "duration_sec": 0.0,
+                    "stdout": "", "stderr": ""}
+        result = run_fn(stage)
+        result["status"] = "executed"
+        if result.get("ok") and result.get("cacheable", True):
+            outputs = hash_paths(stage.get("outputs", []))
+            with state_lock:
+                state[stage["name"]] = {"key": key, "outputs": outputs}
+        else:
+            with state_lock:
+                state.pop(stage["name"], None)
+        return result
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(stages) or 1) as pool:
+        while len(results) < len(stages):
+            progressed = False
+            for name, stage in by_name.items():
+                if name in results or name in running:
+                    continue
+                if any(d in results and not results[d]["ok"] for d in deps[name]):
+                    results[name] = {"name": name, "ok": False, "status": "blocked", "duration_sec": 0.0,
+                                     "stdout": "", "stderr": f"Dependencias fallidas: {deps[name]}"}
+                    progressed = True
+                elif all(d in results for d in deps[name]):
+                    running[name] = pool.submit(execute, stage)
+                    progressed = True
+            if not running:
+                if not progressed:
+                    pending = [n for n in by_name if n not in results]
+                    raise ValueError(f"Dependencias circulares entre etapas: {pending}")
+                continue
+            done, _ = wait(list(running.values()), return_when=FIRST_COMPLETED)
+            for name in [n for n, f in running.items() if f in done]:
+                results[name] = running.pop(name).result()
+
+    save_state(state_path, state)
+    return [results[s["name"]] for s in stages]
@@ -0,0 +1,140 @@
+import io
+import os
+import sys
+import time
+import inspect
+import importlib
+import threading
+import traceback
+from pathlib import Path
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+# --- EJECUCIÓN DE ETAPAS EN PROCESO ---
+# Las etapas del pipeline (scripts/*.py con main()) se importan una vez y se
+# ejecutan dentro del proceso llamante: sin arrancar un intérprete por paso ni
+# reimportar pandas/rdflib/OpenAI, y reutilizando la base de conocimiento y los
+# recursos de modules.resource_cache entre ejecuciones.
+#
+# Cada etapa corre en su propio hilo con timeout. Su salida se captura por hilo
+# (ver _ThreadStream): los prints de otras sesiones de la App siguen yendo a la
+# consola, no a la salida de la etapa. Los argumentos llegan como main(argv),
+# sin tocar sys.argv.
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+SCRIPTS_DIR = ROOT_DIR / "scripts"
+# Mismo límite que tenía el subprocess de la App
+STAGE_TIMEOUT_SEC = float(os.environ.get("GICES_STAGE_TIMEOUT_SEC", 60))
+
+# Un pipeline a la vez (las etapas escriben en los mismos ficheros). Lo libera el
+# hilo de la etapa al terminar: una etapa colgada no bloquea a los siguientes
+# llamantes más allá de su propio timeout.
+_run_lock = threading.Lock()
+
+
+class _ThreadStream(io.TextIOBase):
+    """
+    Sustituto de sys.stdout/sys.stderr que escribe en el buffer del hilo actual
+    si lo tiene y, si no, en el stream original.
+    """
+
+    def __init__(self, original):
+        self.original = original
+        self.local = threading.local()
+
+    def _target(self):
+        return getattr(self.local, "buffer", None) or self.original
+
+    def write(self, text):
+        return self._target().write(text)
+
+    def flush(self):
+        self._target().flush()
+
+    def writable(self):
+        return True
+
+    @property
+    def encoding(self):
+        return getattr(self.original, "encoding", "utf-8")
+
+    def isatty(self):
+        return self._target() is self.original and self.original.isatty()
+
+    def fileno(self):
+        return self.original.fileno()
+
+
+_install_lock = threading.Lock()
+
+
+def _thread_streams():
+    with _install_lock:
+        if not isinstance(sys.stdout, _ThreadStream):
+            sys.stdout = _ThreadStream(sys.stdout)
+        if not isinstance(sys.stderr, _ThreadStream):
+            sys.stderr = _ThreadStream(sys.stderr)
+    return sys.stdout, sys.stderr
+
+
+def load_stage(script_name):
+    """Importa scripts/<script_name> (con o sin .py) y devuelve el módulo."""
+    for path in (str(ROOT_DIR), str(SCRIPTS_DIR)):   # los scripts importan utils_hash "a pelo"
+        if path not in sys.path:
+            sys.path.append(path)
+    return importlib.import_module(Path(script_name).stem)
+
+
+def _call_main(main, argv):
+    if inspect.signature(main).parameters:
+        return main(list(argv))
+    if argv:
+        raise TypeError(f"{main.__module__}.main() no acepta argumentos")
+    return main()
+
+
+def _stage_thread(name, argv, out, err, future):
+    stdout, stderr = _thread_streams()
+    stdout.local.buffer, stderr.local.buffer = out, err
+    try:
+        _call_main(load_stage(name).main, argv or [])
+        future.set_result(True)
+    except SystemExit as e:
+        ok = e.code in (None, 0)
+        if not ok:
+            err.write(f"{e.code}\n")
+        future.set_result(ok)
+    except BaseException:
+        err.write(traceback.format_exc())
+        future.set_result(False)
+    finally:
+        stdout.local.buffer = stderr.local.buffer = None
+        _run_lock.release()
+
+
+def run_stage(script_name, argv=None, timeout=None):
+    """
+    Ejecuta main() de la etapa en un hilo capturando su salida.
+    Devuelve {"name", "ok", "duration_sec", "stdout", "stderr"} como pipeline_run.run_step.
+    timeout (por defecto STAGE_TIMEOUT_SEC) cuenta también la espera a que termine
+    la etapa anterior; al agotarse la etapa se da por fallida aunque su hilo siga vivo.
+    """
+    timeout = STAGE_TIMEOUT_SEC if timeout is None else timeout
+    out, err = io.StringIO(), io.StringIO()
+    name = Path(script_name).stem
+    t0 = time.perf_counter()
+    if not _run_lock.acquire(timeout=timeout if timeout > 0 else -1):
+        return {"name": name, "ok": False, "duration_sec": time.perf_counter() - t0, "stdout": "",
+                "stderr": f"Otra etapa sigue en ejecución tras {timeout:.0f}s de espera\n"}
+    future = Future()
+    # daemon: un main() colgado no impide cerrar el servidor
+    threading.Thread(target=_stage_thread, args=(name, argv, out, err, future),
+                     name=f"stage-{name}", daemon=True).start()
+    remaining = timeout - (time.perf_counter() - t0) if timeout > 0 else None
+    try:
+        ok = future.result(timeout=max(remaining, 0) if remaining is not None else None)
+    except FutureTimeout:
+        ok = False
+        err.write(f"Timeout de {timeout:.0f}s agotado\n")
+    duration = time.perf_counter() - t0
+    return {"name": name, "ok": ok, "duration_sec": duration,
+            "stdout": out.getvalue()[-4000:], "stderr": err.getvalue()[-4000:]}
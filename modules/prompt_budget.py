@@ -0,0 +1,55 @@
+import re
+
+from modules.embedding_pipeline import count_tokens
+
+# --- PRESUPUESTO DE TOKENS PARA LA EVIDENCIA DEL PROMPT ---
+# En vez de recortar cada fragmento a ciegas, se eliminan los casi-duplicados
+# (p.ej. la misma página en la versión ENG y SPA, o el solape entre fragmentos
+# consecutivos) y se llena el presupuesto por orden de relevancia con fragmentos
+# completos: el texto más relevante nunca se trunca.
+SHINGLE_WORDS = 5
+DEDUP_THRESHOLD = 0.8
+WORD_RE = re.compile(r"\w+")
+
+
+def shingles(text, n=SHINGLE_WORDS):
+    words = WORD_RE.findall(text.lower())
+    if len(words) <= n:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + n]) for i in range(len(words) - n + 1)}
+
+
+def near_duplicate(a, b, threshold=DEDUP_THRESHOLD):
+    """Containment de shingles: el fragmento menor está casi entero dentro del mayor."""
+    if not a or not b:
+        return False
+    return len(a & b) / min(len(a), len(b)) >= threshold
+
+
+def format_evidence(chunk):
+    return f"- [Fuente: {chunk['source']} Pág.{chunk['page']} | Relevancia: {chunk.get('score', 0):.2f}] {chunk['content']}"
+
+
+def assemble_evidence(chunks, budget_tokens, threshold=DEDUP_THRESHOLD):
+    """
+    Devuelve (fragmentos elegidos, informe). Recorre los fragmentos de mayor a menor
+    score, descarta los casi-duplicados de uno ya elegido y añade los que caben enteros
+    en budget_tokens. budget_tokens=None desactiva el límite.
+    """
+    ranked = sorted(enumerate(chunks), key=lambda ic: (-ic[1].get("score", 0), ic[0]))
+    chosen, chosen_shingles = [], []
+    report = {"candidates": len(chunks), "duplicates": 0, "over_budget": 0, "evidence_tokens": 0}
+    for _, chunk in ranked:
+        sh = shingles(chunk["content"])
+        if any(near_duplicate(sh, other, threshold) for other in chosen_shingles):
+            report["duplicates"] += 1
+            continue
+        tokens = count_tokens(format_evidence(chunk)) + 1  # +1 por el separador
+        if budget_tokens is not None and report["evidence_tokens"] + tokens > budget_tokens:
+            report["over_budget"] += 1
+            continue
+        chosen.append(chunk)
+        chosen_shingles.append(sh)
+        report["evidence_tokens"] += tokens
+    report["selected"] = len(chosen)
+    return chosen, report
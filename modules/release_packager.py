@@ -0,0 +1,180 @@
+import os
+import json
+import time
+import zlib
+import shutil
+import zipfile
+import tempfile
+from pathlib import Path
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# --- EMPAQUETADO DE RELEASES ---
+# Política por entrada: los formatos ya comprimidos (PDF, imágenes, ofimática,
+# archivos comprimidos) se guardan sin comprimir (ZIP_STORED); el resto se
+# comprime con DEFLATE en paralelo (zlib libera el GIL) a ficheros temporales y
+# se copia en bruto al ZIP en el orden de entrada. Todo se lee y escribe por
+# bloques: el tamaño de los miembros no afecta a la memoria.
+#
+# La copia en bruto no tiene API pública en zipfile: usa la cabecera local de
+# ZipInfo.FileHeader y el estado interno de ZipFile (fp, filelist, NameToInfo,
+# start_dir, _didModify, _writing), estable en CPython 3.8-3.13 y fijado por
+# tests/test_release_packager.py. Si falta algo de eso se comprime con zf.write
+# en el hilo principal, y un ZIP con miembros en bruto se verifica con testzip().
+BLOCK_SIZE = 1024 * 1024
+PACKAGE_WORKERS = int(os.environ.get("GICES_PACKAGE_WORKERS", os.cpu_count() or 1))
+DEFLATE_LEVEL = 6
+STORED_SUFFIXES = {
+    ".pdf", ".zip", ".gz", ".tgz", ".bz2", ".xz", ".zst", ".7z", ".rar",
+    ".png", ".jpg", ".jpeg", ".gif", ".webp", ".mp4", ".mp3",
+    ".xlsx", ".docx", ".pptx", ".odt", ".ods", ".parquet", ".npz", ".tsr",
+}
+# Muestra para decidir en tipos desconocidos: si DEFLATE no gana un 10%, se guarda tal cual
+PROBE_BYTES = 64 * 1024
+PROBE_MIN_SAVING = 0.10
+
+
+def choose_method(path):
+    path = Path(path)
+    if path.suffix.lower() in STORED_SUFFIXES:
+        return zipfile.ZIP_STORED
+    with open(path, "rb") as f:
+        sample = f.read(PROBE_BYTES)
+    if len(sample) >= 4096 and len(zlib.compress(sample, 1)) > len(sample) * (1 - PROBE_MIN_SAVING):
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+def _deflate_to_temp(path, tmp_dir, level):
+    """Comprime path a un temporal (DEFLATE crudo, como en ZIP) calculando CRC y tamaños."""
+    t0 = time.perf_counter()
+    comp = zlib.compressobj(level, zlib.DEFLATED, -15)
+    crc, size = 0, 0
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir, suffix=".deflate")
+    with os.fdopen(fd, "wb") as out, open(path, "rb") as src:
+        for block in iter(lambda: src.read(BLOCK_SIZE), b""):
+            crc = zlib.crc32(block, crc)
+            size += len(block)
+            out.write(comp.compress(block))
+        out.write(comp.flush())
+        compressed = out.tell()
+    return {"tmp": tmp_path, "crc": crc, "size": size, "compressed": compressed,
+            "seconds": time.perf_counter() - t0}
+
+
+_RAW_WRITE_ATTRS = ("fp", "filelist", "NameToInfo", "start_dir", "_didModify", "_writing")
+
+
+def supports_raw_write(zf):
+    return hasattr(zipfile.ZipInfo, "FileHeader") and all(hasattr(zf, a) for a in _RAW_WRITE_ATTRS)
+
+
+def _write_precompressed(zf, zinfo, job):
+    """Añade al ZIP un miembro ya comprimido (cabecera local + datos en bruto)."""
+    if zf._writing:
+        raise ValueError("Hay otro miembro del ZIP abierto para escritura")
+    zinfo.compress_type = zipfile.ZIP_DEFLATED
+    zinfo.CRC = job["crc"]
+    zinfo.file_size = job["size"]
+    zinfo.compress_size = job["compressed"]
+    zip64 = max(job["size"], job["compressed"]) > zipfile.ZIP64_LIMIT
+    zinfo.header_offset = zf.fp.tell()
+    zf.fp.write(zinfo.FileHeader(zip64))
+    with open(job["tmp"], "rb") as src:
+        shutil.copyfileobj(src, zf.fp, BLOCK_SIZE)
+    zf.filelist.append(zinfo)
+    zf.NameToInfo[zinfo.filename] = zinfo
+    zf.start_dir = zf.fp.tell()
+    zf._didModify = True
+
+
+def _write_stored(zf, zinfo, path):
+    zinfo.compress_type = zipfile.ZIP_STORED
+    size = os.path.getsize(path)
+    with open(path, "rb") as src, zf.open(zinfo, "w", force_zip64=size > zipfile.ZIP64_LIMIT) as dst:
+        shutil.copyfileobj(src, dst, BLOCK_SIZE)
+
+
+def _write_deflated(zf, path, arcname, level):
+    """Camino público (sin compresión en paralelo) si no hay copia en bruto."""
+    zf.write(path, arcname, compress_type=zipfile.ZIP_DEFLATED, compresslevel=level)
+    return zf.getinfo(arcname)
+
+
+def build_package(out_path, entries, workers=None, level=DEFLATE_LEVEL, report_path=None):
+    """
+    entries: lista de (ruta, nombre_en_zip). Devuelve el informe por entrada
+    (método, tamaños, ratio y segundos) y lo escribe en report_path si se indica.
+    """
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    workers = max(1, workers or PACKAGE_WORKERS)
+    plan = [(Path(p), arc, choose_method(p)) for p, arc in entries]
+    report = []
+    raw_members = 0
+    t_start = time.perf_counter()
+
+    with tempfile.TemporaryDirectory(dir=out_path.parent, prefix=".pack_") as tmp_dir, \
+            ThreadPoolExecutor(max_workers=workers) as pool, \
+            zipfile.ZipFile(out_path, "w") as zf:
+        raw = supports_raw_write(zf)
+        # Compresión por delante del escritor, con un máximo de temporales en disco
+        pending = deque()
+        submitted = 0
+
+        def refill():
+            nonlocal submitted
+            while submitted < len(plan) and len(pending) < 2 * workers:
+                path, _, method = plan[submitted]
+                pending.append(pool.submit(_deflate_to_temp, path, tmp_dir, level)
+                               if raw and method == zipfile.ZIP_DEFLATED else None)
+                submitted += 1
+
+        refill()
+        for path, arcname, method in plan:
+            future = pending.popleft()
+            refill()
+            zinfo = zipfile.ZipInfo.from_file(path, arcname)
+            t0 = time.perf_counter()
+            if future is not None:
+                job = future.result()
+                if job["compressed"] < job["size"]:
+                    _write_precompressed(zf, zinfo, job)
+                    raw_members += 1
+                else:
+                    method = zipfile.ZIP_STORED  # DEFLATE no compensó: se guarda tal cual
+                    _write_stored(zf, zinfo, path)
+                os.remove(job["tmp"])
+                seconds = job["seconds"] + time.perf_counter() - t0
+            elif method == zipfile.ZIP_DEFLATED:
+                zinfo = _write_deflated(zf, path, arcname, level)
+                seconds = time.perf_counter() - t0
+            else:
+                _write_stored(zf, zinfo, path)
+                seconds = time.perf_counter() - t0
+            report.append({
+                "name": arcname,
+                "method": "deflate" if method == zipfile.ZIP_DEFLATED else "stored",
+                "size": zinfo.file_size,
+                "compressed_size": zinfo.compress_size,
+                "ratio": round(zinfo.compress_size / zinfo.file_size, 4) if zinfo.file_size else 1.0,
+                "seconds": round(seconds, 4),
+            })
+
+    if raw_members:
+        with zipfile.ZipFile(out_path) as zf:
+            bad = zf.testzip()
+        if bad is not None:
+            raise zipfile.BadZipFile(f"{out_path}: CRC incorrecto en {bad}")
+
+    summary = {
+        "zip": str(out_path),
+        "entries": report,
+        "total_size": sum(r["size"] for r in report),
+        "total_compressed": sum(r["compressed_size"] for r in report),
+        "seconds": round(time.perf_counter() - t_start, 4),
+        "workers": workers,
+    }
+    if report_path:
+        Path(report_path).write_text(json.dumps(summary, indent=2, ensure_ascii=False))
+    return summary
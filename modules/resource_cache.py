@@ -0,0 +1,39 @@
+import threading
+from pathlib import Path
+
+from modules.file_hashing import sha256_file
+
+# --- CACHÉ DE RECURSOS DEL PROCESO ---
+# Objetos caros de construir (validadores JSON Schema compilados, shapes SHACL,
+# ontología...) que se reutilizan entre ejecuciones del pipeline dentro
+# del mismo proceso (la App de Streamlit). Cada entrada se invalida cuando cambia
+# el sha256 de alguno de sus ficheros de origen (modules.file_hashing).
+
+_resources = {}   # nombre -> (huellas de los ficheros, objeto)
+_lock = threading.Lock()
+
+
+def fingerprint(paths):
+    """Huella de un conjunto de ficheros (None para los que no existen)."""
+    return tuple((str(p), sha256_file(p) if Path(p).exists() else None) for p in paths)
+
+
+def cached_resource(name, paths, loader):
+    """
+    Devuelve loader() cacheado bajo `name` mientras el contenido de `paths` no cambie.
+    El objeto se comparte: quien lo use no debe mutarlo.
+    """
+    current = fingerprint(paths)
+    with _lock:
+        entry = _resources.get(name)
+        if entry is not None and entry[0] == current:
+            return entry[1]
+    value = loader()
+    with _lock:
+        _resources[name] = (current, value)
+    return value
+
+
+def clear():
+    with _lock:
+        _resources.clear()
@@ -0,0 +1,213 @@
+import os
+import re
+import json
+import operator
+from multiprocessing import get_context
+from concurrent.futures import ProcessPoolExecutor
+
+from jsonschema import Draft202012Validator
+
+# --- VALIDACIÓN JSON SCHEMA RÁPIDA ---
+# Los contratos de contracts/*.schema.json son planos (type, properties,
+# required, additionalProperties, minimum, minLength, pattern...). Se compilan a
+# funciones que solo responden "¿es válido?": los registros válidos (el caso
+# habitual) no pasan por jsonschema. Los inválidos se revalidan con
+# Draft202012Validator para que los mensajes sean exactamente los de siempre.
+# Un schema con palabras clave no soportadas usa directamente el validador completo.
+VALIDATE_WORKERS = int(os.environ.get("GICES_VALIDATE_WORKERS", 0))
+PARTITION_ROWS = 10_000
+
+# Palabras clave sin efecto en la validación (format es solo anotación sin format_checker)
+_ANNOTATIONS = {"$schema", "$id", "$comment", "title", "description", "examples", "default", "format"}
+_SUPPORTED = _ANNOTATIONS | {"type", "properties", "required", "additionalProperties", "minimum", "maximum",
+                             "exclusiveMinimum", "exclusiveMaximum", "minLength", "maxLength", "pattern"}
+
+
+def _is_number(v):
+    return isinstance(v, (int, float)) and not isinstance(v, bool)
+
+
+_TYPES = {
+    "string": lambda v: isinstance(v, str),
+    "number": _is_number,
+    # como jsonschema: 3.0 es integer
+    "integer": lambda v: (isinstance(v, int) and not isinstance(v, bool))
+    or (isinstance(v, float) and v.is_integer()),
+    "boolean": lambda v: isinstance(v, bool),
+    "null": lambda v: v is None,
+    "object": lambda v: isinstance(v, dict),
+    "array": lambda v: isinstance(v, list),
+}
+
+
+class Unsupported(Exception):
+    pass
+
+
+def _compile_node(schema):
+    """Schema -> fn(valor) -> bool. Lanza Unsupported si usa algo fuera del subconjunto."""
+    if schema is True or schema == {}:
+        return lambda v: True
+    if schema is False:
+        return lambda v: False
+    if not isinstance(schema, dict) or set(schema) - _SUPPORTED:
+        raise Unsupported(schema)
+
+    checks = []
+    kinds = schema.get("type")
+    if kinds is not None:
+        kinds = [kinds] if isinstance(kinds, str) else list(kinds)
+        if any(k not in _TYPES for k in kinds):
+            raise Unsupported(kinds)
+        tests = [_TYPES[k] for k in kinds]
+        checks.append(tests[0] if len(tests) == 1 else (lambda v: any(t(v) for t in tests)))
+
+    # Cada palabra clave solo aplica a su tipo de instancia (como en jsonschema)
+    for key, op in (("minimum", operator.ge), ("maximum", operator.le),
+                    ("exclusiveMinimum", operator.gt), ("exclusiveMaximum", operator.lt)):
+        if key in schema:
+            bound = schema[key]
+            if not _is_number(bound):
+                raise Unsupported(key)
+            checks.append(lambda v, bound=bound, op=op: not _is_number(v) or op(v, bound))
+    if "minLength" in schema:
+        n = schema["minLength"]
+        checks.append(lambda v: not isinstance(v, str) or len(v) >= n)
+    if "maxLength" in schema:
+        n = schema["maxLength"]
+        checks.append(lambda v: not isinstance(v, str) or len(v) <= n)
+    if "pattern" in schema:
+        search = re.compile(schema["pattern"]).search
+        checks.append(lambda v: not isinstance(v, str) or search(v) is not None)
+
+    if {"properties", "required", "additionalProperties"} & set(schema):
+        props = {k: _compile_node(s) for k, s in (schema.get("properties") or {}).items()}
+        required = tuple(schema.get("required") or ())
+        additional = schema.get("additionalProperties", True)
+        if additional not in (True, False):
+            additional = _compile_node(additional)
+
+        def check_object(v):
+            if not isinstance(v, dict):
+                return True
+            for k in required:
+                if k not in v:
+                    return False
+            for k, item in v.items():
+                fn = props.get(k)
+                if fn is not None:
+                    if not fn(item):
+                        return False
+                elif additional is False or (additional is not True and not additional(item)):
+                    return False
+            return True
+        checks.append(check_object)
+
+    if not checks:
+        return lambda v: True
+    if len(checks) == 1:
+        return checks[0]
+    checks = tuple(checks)
+
+    def check_all(v):
+        for c in checks:
+            if not c(v):
+                return False
+        return True
+    return check_all
+
+
+class SchemaChecker:
+    """
+    Validador de un contrato: is_valid() compilado y errors() con los mensajes
+    de Draft202012Validator (ordenados por ruta, como en mcp_ingest).
+    """
+
+    def __init__(self, schema):
+        self.schema = schema
+        self.key = json.dumps(schema, sort_keys=True)
+        self.validator = Draft202012Validator(schema)
+        try:
+            self.is_valid = _compile_node(schema)
+            self.compiled = True
+        except Unsupported:
+            self.is_valid = self.validator.is_valid
+            self.compiled = False
+        props = schema.get("properties") if self.compiled and isinstance(schema, dict) else None
+        if props:
+            # Un registro inválido solo se revalida donde falla: el nivel raíz (type, required,
+            # additionalProperties; las propiedades conocidas valen True) y cada propiedad que no cumple
+            root = dict(schema, properties={k: True for k in props})
+            self._root = (_compile_node(root), Draft202012Validator(root))
+            self._props = {k: (_compile_node(sub), Draft202012Validator(sub)) for k, sub in props.items()}
+        else:
+            self._root = self._props = None
+
+    def _iter_errors(self, record):
+        if self._props is None or not isinstance(record, dict):
+            return [(tuple(e.path), e.message) for e in self.validator.iter_errors(record)]
+        root_ok, root = self._root
+        found = [] if root_ok(record) else [(tuple(e.path), e.message) for e in root.iter_errors(record)]
+        for k, value in record.items():
+            entry = self._props.get(k)
+            if entry is not None and not entry[0](value):
+                found.extend(((k,) + tuple(e.path), e.message) for e in entry[1].iter_errors(value))
+        return found
+
+    def errors(self, record):
+        return [] if self.is_valid(record) else self._messages(record)
+
+    def _messages(self, record):
+        # sorted es estable: mismo orden que sorted(iter_errors, key=path) con el validador completo
+        return [msg for _, msg in sorted(self._iter_errors(record), key=lambda e: e[0])]
+
+    def check(self, records, start=0):
+        """(registros válidos, [{"index", "errors"}]) con índices a partir de start."""
+        valid, errors = [], []
+        is_valid = self.is_valid
+        for i, rec in enumerate(records, start=start):
+            if is_valid(rec):
+                valid.append(rec)
+                continue
+            msgs = self._messages(rec)
+            if msgs:
+                errors.append({"index": i, "errors": msgs})
+            else:
+                valid.append(rec)
+        return valid, errors
+
+
+# --- Modo paralelo: particiones de registros en un pool de procesos ---
+_worker_checkers = {}
+
+
+def _check_partition(schema_key, schema, records, start):
+    checker = _worker_checkers.get(schema_key)
+    if checker is None:
+        checker = _worker_checkers[schema_key] = SchemaChecker(schema)
+    return checker.check(records, start)
+
+
+def make_pool(workers=None):
+    """
+    Pool para check_parallel, o None si se valida en el propio proceso. Con spawn:
+    la ingesta también corre dentro de la App (hilos de Streamlit) y fork ahí no es seguro.
+    """
+    workers = VALIDATE_WORKERS if workers is None else workers
+    if not workers or workers <= 1:
+        return None
+    return ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"))
+
+
+def check_parallel(checker, records, pool=None, start=0):
+    """Como checker.check, repartiendo particiones de PARTITION_ROWS registros entre los procesos."""
+    if pool is None or len(records) <= PARTITION_ROWS:
+        return checker.check(records, start)
+    futures = [pool.submit(_check_partition, checker.key, checker.schema, records[i:i + PARTITION_ROWS], start + i)
+               for i in range(0, len(records), PARTITION_ROWS)]
+    valid, errors = [], []
+    for f in futures:
+        v, e = f.result()
+        valid.extend(v)
+        errors.extend(e)
+    return valid, errors
@@ -0,0 +1,203 @@
+import json
+import math
+from pathlib import Path
+from datetime import datetime, timedelta
+
+# --- HISTÓRICO SLO INCREMENTAL ---
+# Un t-digest por etapa (todo el histórico) más digests por hora y por día para
+# las ventanas móviles. Cada ejecución solo añade sus duraciones: el coste del
+# informe no depende de cuántas ejecuciones haya en ops/slo_history.jsonl.
+COMPRESSION = 100
+HOURLY_RETENTION = timedelta(hours=48)
+DAILY_RETENTION = timedelta(days=30)
+WINDOWS = {"24h": ("hours", timedelta(hours=24)), "7d": ("days", timedelta(days=7)), "30d": ("days", timedelta(days=30))}
+# Con pocas muestras el p95 se aproxima con el máximo (como hacía pipeline_run)
+MIN_SAMPLES_FOR_QUANTILE = 20
+
+
+class TDigest:
+    """t-digest con fusión (Dunning): centroides acotados por la compresión."""
+
+    def __init__(self, compression=COMPRESSION):
+        self.compression = compression
+        self.means, self.weights = [], []
+        self.buffer = []
+        self.count, self.total = 0, 0.0
+        self.min, self.max = math.inf, -math.inf
+
+    def add(self, x, w=1.0):
+        self.buffer.append((float(x), float(w)))
+        self.count += w
+        self.total += x * w
+        self.min, self.max = min(self.min, x), max(self.max, x)
+        if len(self.buffer) > 5 * self.compression:
+            self._compress()
+
+    def merge(self, other):
+        other._compress()
+        for m, w in zip(other.means, other.weights):
+            self.buffer.append((m, w))
+        self.count += other.count
+        self.total += other.total
+        self.min, self.max = min(self.min, other.min), max(self.max, other.max)
+        self._compress()
+        return self
+
+    def _k(self, q):
+        return self.compression / (2 * math.pi) * math.asin(2 * q - 1)
+
+    def _k_inv(self, k):
+        return (math.sin(min(k, self.compression / 4) * 2 * math.pi / self.compression) + 1) / 2
+
+    def _compress(self):
+        if not self.buffer:
+            return
+        points = sorted(list(zip(self.means, self.weights)) + self.buffer)
+        self.buffer = []
+        total = sum(w for _, w in points)
+        means, weights = [points[0][0]], [points[0][1]]
+        cum = 0.0
+        q_limit = self._k_inv(self._k(0.0) + 1)
+        for m, w in points[1:]:
+            if (cum + weights[-1] + w) / total <= q_limit:
+                weights[-1] += w
+                means[-1] += (m - means[-1]) * w / weights[-1]
+            else:
+                cum += weights[-1]
+                q_limit = self._k_inv(self._k(cum / total) + 1)
+                means.append(m)
+                weights.append(w)
+        self.means, self.weights = means, weights
+
+    def quantile(self, q):
+        self._compress()
+        if not self.means:
+            return None
+        if len(self.means) == 1:
+            return self.means[0]
+        target = q * self.count
+        centers, cum = [], 0.0
+        for w in self.weights:
+            centers.append(cum + w / 2)
+            cum += w
+        if target <= centers[0]:
+            return self.min + (self.means[0] - self.min) * (target / centers[0] if centers[0] else 0)
+        if target >= centers[-1]:
+            span = self.count - centers[-1]
+            return self.means[-1] + (self.max - self.means[-1]) * ((target - centers[-1]) / span if span else 0)
+        for i in range(1, len(centers)):
+            if target <= centers[i]:
+                frac = (target - centers[i - 1]) / (centers[i] - centers[i - 1])
+                return self.means[i - 1] + (self.means[i] - self.means[i - 1]) * frac
+        return self.max
+
+    def summary(self):
+        if not self.count:
+            return {"count": 0, "p95_sec": None, "mean_sec": None}
+        p95 = self.max if self.count < MIN_SAMPLES_FOR_QUANTILE else self.quantile(0.95)
+        return {"count": int(self.count), "p95_sec": round(p95, 4), "mean_sec": round(self.total / self.count, 4)}
+
+    def to_dict(self):
+        self._compress()
+        return {"c": self.compression, "m": self.means, "w": self.weights, "n": self.count,
+                "sum": self.total, "min": self.min if self.count else None, "max": self.max if self.count else None}
+
+    @classmethod
+    def from_dict(cls, d):
+        t = cls(d.get("c", COMPRESSION))
+        t.means, t.weights = list(d["m"]), list(d["w"])
+        t.count, t.total = d["n"], d["sum"]
+        if t.count:
+            t.min, t.max = d["min"], d["max"]
+        return t
+
+
+def _hour_key(ts):
+    return ts.strftime("%Y-%m-%dT%H")
+
+
+def _day_key(ts):
+    return ts.strftime("%Y-%m-%d")
+
+
+class SLOSketch:
+    """Estado persistido: por etapa, digest global + digests por hora/día y nº de saltadas."""
+
+    def __init__(self, stages=None):
+        self.stages = stages or {}
+
+    @classmethod
+    def load(cls, path):
+        path = Path(path)
+        if not path.exists():
+            return None
+        try:
+            return cls(json.loads(path.read_text(encoding="utf-8"))["stages"])
+        except Exception:
+            return None
+
+    def save(self, path):
+        path = Path(path)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps({"version": 1, "stages": self.stages}, ensure_ascii=False))
+        tmp.replace(path)
+
+    def _stage(self, name):
+        return self.stages.setdefault(name, {"all": TDigest().to_dict(), "hours": {}, "days": {}, "cached": 0})
+
+    def add_run(self, run, now=None):
+        """Incorpora una ejecución (mismo formato que una línea del histórico)."""
+        ts = datetime.fromisoformat(run["utc"].rstrip("Z")) if run.get("utc") else (now or datetime.utcnow())
+        for step in run["steps"]:
+            entry = self._stage(step["name"])
+            if step.get("status", "executed") != "executed":
+                entry["cached"] += step.get("status") == "cached"
+                continue
+            x = step["duration_sec"]
+            for field, key in (("hours", _hour_key(ts)), ("days", _day_key(ts))):
+                bucket = TDigest.from_dict(entry[field][key]) if key in entry[field] else TDigest()
+                bucket.add(x)
+                entry[field][key] = bucket.to_dict()
+            overall = TDigest.from_dict(entry["all"])
+            overall.add(x)
+            entry["all"] = overall.to_dict()
+        self.expire(now or ts)
+
+    def expire(self, now):
+        hour_floor = _hour_key(now - HOURLY_RETENTION)
+        day_floor = _day_key(now - DAILY_RETENTION)
+        for entry in self.stages.values():
+            entry["hours"] = {k: v for k, v in entry["hours"].items() if k > hour_floor}
+            entry["days"] = {k: v for k, v in entry["days"].items() if k > day_floor}
+
+    def aggregate(self, now=None):
+        now = now or datetime.utcnow()
+        agg = {}
+        for name, entry in self.stages.items():
+            row = TDigest.from_dict(entry["all"]).summary()
+            row["cached"] = entry.get("cached", 0)
+            row["windows"] = {}
+            for label, (field, span) in WINDOWS.items():
+                floor = (_hour_key if field == "hours" else _day_key)(now - span)
+                window = TDigest()
+                for key, d in entry[field].items():
+                    if key > floor:
+                        window.merge(TDigest.from_dict(d))
+                row["windows"][label] = window.summary()
+            agg[name] = row
+        return agg
+
+
+def rebuild_from_history(history_path):
+    """Migración única: construye el sketch leyendo un histórico existente."""
+    sketch = SLOSketch()
+    path = Path(history_path)
+    if path.exists():
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    sketch.add_run(json.loads(line))
+                except Exception:
+                    pass
+    sketch.expire(datetime.utcnow())
+    return sketch
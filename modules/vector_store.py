@@ -0,0 +1,433 @@
+import os
+import json
+import mmap
+import uuid
+import numpy as np
+from pathlib import Path
+from datetime import datetime
+
+from modules.ann_index import IVFIndex, ANN_NPROBE
+from modules.lexical_index import LexicalIndex
+from modules.npy_io import npy_header, NPY_HEADER_SIZE
+
+# --- FORMATO EN DISCO ---
+# rag/vector_store/
+#   vectors.npy   -> matriz float32 (N, D) ya normalizada (L2), abierta con mmap
+#   rows.npy      -> matriz int64 (N, len(ROW_COLUMNS)) con los metadatos por fila
+#   content.bin   -> textos UTF-8 concatenados (offsets en rows.npy)
+#   meta.json     -> cabecera compacta: versión, modelo, dimensión, documentos
+#   ivf.npz       -> índice ANN opcional (centroides + lista de cada fila), ver ann_index.py
+#   lexical.npz   -> índice invertido BM25, ver lexical_index.py
+# meta.json se escribe siempre el último: es el punto de confirmación del índice.
+STORE_FORMAT = "gices-vectors/1"
+VECTORS_FILE = "vectors.npy"
+ROWS_FILE = "rows.npy"
+CONTENT_FILE = "content.bin"
+META_FILE = "meta.json"
+# char_start/char_end: posición del fragmento dentro del texto de su página
+ROW_COLUMNS = ["doc", "page", "text_offset", "text_length", "char_start", "char_end"]
+
+# Centinela de VectorStore.lexical: distingue "sin cargar" de "cargado y no disponible" (None)
+_NOT_LOADED = object()
+
+
+def _load_matrix(path, count, width, dtype):
+    """Abre una matriz .npy sin copiarla a memoria (zero-copy vía mmap)."""
+    if count == 0 or not path.exists():
+        return np.empty((0, width), dtype=dtype)
+    return np.load(path, mmap_mode="r")[:count]
+
+
+def normalize_rows(matrix):
+    """Normaliza filas a norma L2 = 1 (las filas nulas se quedan a cero)."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class VectorStore:
+    """
+    Lector del almacén vectorial binario. No parsea nada pesado:
+    los vectores, filas y textos se mapean en memoria desde disco.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.meta = json.loads((self.root / META_FILE).read_text(encoding="utf-8"))
+        if self.meta.get("format") != STORE_FORMAT:
+            raise ValueError(f"Formato de almacén no soportado: {self.meta.get('format')}")
+        self.count = int(self.meta["count"])
+        self.dim = int(self.meta.get("dim") or 0)
+        self.docs = self.meta.get("docs", [])
+        self.columns = self.meta.get("columns", ROW_COLUMNS)
+        self.vectors = _load_matrix(self.root / VECTORS_FILE, self.count, self.dim, np.float32)
+        self.rows = _load_matrix(self.root / ROWS_FILE, self.count, len(self.columns), np.int64)
+        deleted = [i for i, d in enumerate(self.docs) if d.get("deleted")]
+        # Máscara de filas vivas (None = todas vivas)
+        self.live = ~np.isin(self.rows[:, 0], deleted) if deleted and self.count else None
+        self.ann = self._load_ann()
+        self._lexical = _NOT_LOADED
+        self._content = None
+        content_path = self.root / CONTENT_FILE
+        if content_path.exists() and content_path.stat().st_size > 0:
+            with open(content_path, "rb") as f:
+                self._content = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _load_ann(self):
+        try:
+            index = IVFIndex.load(self.root)
+        except Exception as e:
+            print(f"⚠️ Índice ANN ilegible, se usa búsqueda exacta: {e}")
+            return None
+        if index is None or index.generation != self.meta.get("generation") or len(index) > self.count:
+            return None
+        # Filas añadidas después del último build: se asignan en memoria
+        index.extend(self.vectors[len(index):self.count])
+        return index
+
+    @property
+    def lexical(self):
+        """
+        Índice BM25 (se carga al primer uso). None si no existe, es de otra generación
+        o no se puede leer; el resultado, también None, se recuerda hasta recargar el almacén.
+        """
+        if self._lexical is _NOT_LOADED:
+            self._lexical = self._load_lexical()
+        return self._lexical
+
+    def _load_lexical(self):
+        try:
+            index = LexicalIndex.load(self.root)
+        except Exception as e:
+            print(f"⚠️ Índice léxico ilegible: {e}")
+            return None
+        if index is None or index.generation != self.meta.get("generation") or len(index) > self.count:
+            return None
+        if len(index) < self.count:
+            index = index.extend(self.content(i) for i in range(len(index), self.count))
+        return index
+
+    def search_lexical(self, query, k=3):
+        return self.lexical.search(query, k, self.live) if self.lexical is not None else []
+
+    @staticmethod
+    def exists(root):
+        return (Path(root) / META_FILE).exists()
+
+    @property
+    def version(self):
+        return self.meta.get("version", 0)
+
+    def __len__(self):
+        return self.count if self.live is None else int(self.live.sum())
+
+    @property
+    def dead_ratio(self):
+        return 0.0 if self.live is None or not self.count else 1.0 - len(self) / self.count
+
+    def live_docs(self):
+        return {d["source"]: d for d in self.docs if not d.get("deleted")}
+
+    def content(self, idx):
+        offset, length = int(self.rows[idx][2]), int(self.rows[idx][3])
+        if self._content is None or length == 0:
+            return ""
+        return self._content[offset:offset + length].decode("utf-8")
+
+    def record(self, idx):
+        row = self.rows[idx]
+        item = {
+            "source": self.docs[int(row[0])]["source"],
+            "page": int(row[1]),
+            "content": self.content(idx),
+        }
+        if len(row) > 5:
+            item["char_start"], item["char_end"] = int(row[4]), int(row[5])
+        return item
+
+    def search(self, query_vec, k=3, nprobe=None, exact=False):
+        """
+        Devuelve [(idx, score)] por similitud coseno (producto escalar sobre vectores normalizados).
+        Con índice ANN solo se puntúan las filas de las `nprobe` listas más cercanas;
+        exact=True fuerza la búsqueda exhaustiva.
+        """
+        if self.count == 0:
+            return []
+        q = normalize_rows(np.asarray(query_vec, dtype=np.float32).reshape(1, -1))
+        if self.ann is not None and not exact:
+            rows = np.sort(self.ann.candidates(q, nprobe or ANN_NPROBE)[0])
+            scores = self.vectors[rows] @ q[0]
+        else:
+            rows = None
+            scores = self.vectors @ q[0]
+        if self.live is not None:
+            scores[~(self.live if rows is None else self.live[rows])] = -np.inf
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        top = top[np.isfinite(scores[top])]
+        return [(int(i if rows is None else rows[i]), float(scores[i])) for i in top]
+
+    def search_many(self, query_vecs, k=3, nprobe=None, exact=False, block=256):
+        """
+        Varias consultas a la vez: una multiplicación de matrices por bloque de consultas
+        (block acota la memoria: block x N puntuaciones) y top-k con argpartition.
+        Devuelve una lista [(idx, score)] por consulta.
+        """
+        q = normalize_rows(np.asarray(query_vecs, dtype=np.float32).reshape(len(query_vecs), -1))
+        if self.count == 0:
+            return [[] for _ in range(len(q))]
+        if self.ann is not None and not exact:
+            return [self.search(vec, k, nprobe) for vec in q]
+        k = min(k, len(self))
+        results = []
+        for start in range(0, len(q), block):
+            scores = q[start:start + block] @ self.vectors.T
+            if self.live is not None:
+                scores[:, ~self.live] = -np.inf
+            if k <= 0:
+                results.extend([] for _ in scores)
+                continue
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-top_scores, axis=1)
+            for rows, vals in zip(np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)):
+                results.append([(int(i), float(v)) for i, v in zip(rows, vals) if np.isfinite(v)])
+        return results
+
+    def close(self):
+        """
+        Libera los mmap (contenido, vectores y filas). Las matrices .npy son np.memmap:
+        el mapeo se suelta al quedarse sin referencias. Después el almacén queda vacío.
+        """
+        if self._content is not None:
+            self._content.close()
+            self._content = None
+        self.count = 0
+        self.vectors = np.empty((0, self.dim), dtype=np.float32)
+        self.rows = np.empty((0, len(self.columns)), dtype=np.int64)
+        self.live = None
+        self.ann = None
+        self._lexical = None
+
+
+class VectorStoreWriter:
+    """
+    Escritor en streaming: cada fila se vuelca a disco al añadirla, por lo que
+    la memoria no crece con el tamaño del corpus. Se usa como context manager.
+
+    Con append=True se abre el almacén existente y se añaden filas al final
+    (las cabeceras .npy tienen tamaño fijo y se reescriben en sitio). Los documentos
+    retirados o modificados se marcan como borrados (tombstone) sin reescribir nada.
+    """
+
+    def __init__(self, root, model=None, append=False, settings=None):
+        self.root = Path(root)
+        self.model = model
+        self.settings = settings or {}
+        self.dim = None
+        self.count = 0
+        self.docs = []
+        self._doc_ids = {}
+        self._replaced = {}   # fuente -> doc_id de la versión anterior, pendiente de finish_doc
+        self._text_offset = 0
+        self._version = 0
+        self.root.mkdir(parents=True, exist_ok=True)
+
+        if append and VectorStore.exists(self.root):
+            meta = json.loads((self.root / META_FILE).read_text(encoding="utf-8"))
+            if meta.get("columns", ROW_COLUMNS) != ROW_COLUMNS:
+                raise ValueError("El almacén existente usa otras columnas: hay que reconstruirlo")
+            self.model = meta.get("model") or model
+            self.settings = settings or meta.get("settings", {})
+            self.dim = int(meta.get("dim") or 0) or None
+            self.count = int(meta["count"])
+            self.docs = meta.get("docs", [])
+            self._doc_ids = {d["source"]: i for i, d in enumerate(self.docs) if not d.get("deleted")}
+            self._text_offset = int(meta.get("content_bytes", _content_size(self.root)))
+            self._version = int(meta.get("version", 0))
+            self._generation = meta.get("generation")
+            self._paths = {name: self.root / name for name in [VECTORS_FILE, ROWS_FILE, CONTENT_FILE]}
+            self._vectors = self._open_append(VECTORS_FILE, NPY_HEADER_SIZE + self.count * 4 * (self.dim or 0))
+            self._rows = self._open_append(ROWS_FILE, NPY_HEADER_SIZE + self.count * 8 * len(ROW_COLUMNS))
+            self._content = self._open_append(CONTENT_FILE, self._text_offset)
+            if self.dim is None:
+                self._vectors.truncate(0)
+        else:
+            self._version = _previous_version(self.root)
+            self._generation = None
+            self._paths = {name: self._tmp(name) for name in [VECTORS_FILE, ROWS_FILE, CONTENT_FILE]}
+            self._vectors = open(self._paths[VECTORS_FILE], "wb")
+            self._rows = open(self._paths[ROWS_FILE], "wb")
+            self._content = open(self._paths[CONTENT_FILE], "wb")
+            self._rows.write(npy_header((0, len(ROW_COLUMNS)), np.int64))
+
+    def _open_append(self, name, committed_size):
+        # Lo que haya tras el último meta.json confirmado es basura de una escritura interrumpida
+        path = self.root / name
+        fh = open(path, "r+b" if path.exists() else "w+b")
+        fh.truncate(committed_size)
+        fh.seek(committed_size)
+        return fh
+
+    def _tmp(self, name):
+        return self.root / f"{name}.tmp"
+
+    def begin_doc(self, source, **info):
+        """
+        Registra un documento (hash, nº de páginas...). Si ya existía, la versión
+        anterior sigue viva hasta finish_doc (o close): un fallo al extraer o
+        vectorizar la nueva versión no deja el documento sin filas.
+        """
+        previous = self._doc_ids.get(source)
+        if previous is not None and source not in self._replaced:
+            self._replaced[source] = previous
+        self._doc_ids[source] = len(self.docs)
+        self.docs.append({"source": source, **info})
+        return self._doc_ids[source]
+
+    def finish_doc(self, source, ok=True):
+        """Confirma la nueva versión (borra la anterior) o, con ok=False, la descarta y restaura la anterior."""
+        previous = self._replaced.pop(source, None)
+        if ok:
+            if previous is not None:
+                self._mark_deleted(previous)
+            return
+        self._mark_deleted(self._doc_ids.pop(source))
+        if previous is not None:
+            self._doc_ids[source] = previous
+
+    def update_doc(self, source, **info):
+        self.docs[self._doc_ids[source]].update(info)
+
+    def tombstone(self, source):
+        doc_id = self._doc_ids.pop(source, None)
+        if doc_id is not None:
+            self._mark_deleted(doc_id)
+        previous = self._replaced.pop(source, None)
+        if previous is not None:
+            self._mark_deleted(previous)
+
+    def _mark_deleted(self, doc_id):
+        self.docs[doc_id]["deleted"] = True
+        self.docs[doc_id]["deleted_utc"] = datetime.utcnow().isoformat() + "Z"
+
+    def _doc_id(self, source):
+        if source not in self._doc_ids:
+            self.begin_doc(source)
+        return self._doc_ids[source]
+
+    def add(self, vector, source, page, content, char_start=0, char_end=None):
+        vec = normalize_rows(np.asarray(vector, dtype=np.float32).reshape(1, -1))
+        if self.dim is None:
+            self.dim = vec.shape[1]
+            self._vectors.write(npy_header((0, self.dim), np.float32))
+        elif vec.shape[1] != self.dim:
+            raise ValueError(f"Dimensión inesperada: {vec.shape[1]} != {self.dim}")
+
+        data = content.encode("utf-8")
+        self._content.write(data)
+        if char_end is None:
+            char_end = char_start + len(content)
+        row = np.array([[self._doc_id(source), page, self._text_offset, len(data), char_start, char_end]], dtype=np.int64)
+        self._text_offset += len(data)
+
+        self._vectors.write(vec.tobytes())
+        self._rows.write(row.tobytes())
+        self.count += 1
+
+    def close(self):
+        for source in list(self._replaced):
+            self.finish_doc(source)
+        if self.dim is None:
+            self._vectors.write(npy_header((0, 0), np.float32))
+        # Reescribimos la cabecera con la forma definitiva
+        for fh, width, dtype in [
+            (self._vectors, self.dim or 0, np.float32),
+            (self._rows, len(ROW_COLUMNS), np.int64),
+        ]:
+            fh.seek(0)
+            fh.write(npy_header((self.count, width), dtype))
+        for fh in [self._vectors, self._rows, self._content]:
+            fh.flush()
+            os.fsync(fh.fileno())
+            fh.close()
+
+        for name, path in self._paths.items():
+            if path != self.root / name:
+                os.replace(path, self.root / name)
+
+        meta = {
+            "format": STORE_FORMAT,
+            "version": self._version + 1,
+            # Cambia en cada reescritura completa: invalida índices derivados (ANN)
+            "generation": self._generation or uuid.uuid4().hex,
+            "model": self.model,
+            "dim": self.dim or 0,
+            "count": self.count,
+            "content_bytes": self._text_offset,
+            "columns": ROW_COLUMNS,
+            "settings": self.settings,
+            "docs": self.docs,
+            "updated_utc": datetime.utcnow().isoformat() + "Z",
+        }
+        _write_meta(self.root, meta)
+        return VectorStore(self.root)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            for fh in [self._vectors, self._rows, self._content]:
+                fh.close()
+
+
+def _content_size(root):
+    path = Path(root) / CONTENT_FILE
+    return path.stat().st_size if path.exists() else 0
+
+
+def _previous_version(root):
+    try:
+        return int(json.loads((Path(root) / META_FILE).read_text(encoding="utf-8")).get("version", 0))
+    except Exception:
+        return 0
+
+
+def _write_meta(root, meta):
+    tmp = Path(root) / f"{META_FILE}.tmp"
+    tmp.write_text(json.dumps(meta, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+    os.replace(tmp, Path(root) / META_FILE)
+
+
+def compact(root):
+    """Reescribe el almacén sin las filas borradas (sin volver a vectorizar)."""
+    store = VectorStore(root)
+    live_docs = [i for i, d in enumerate(store.docs) if not d.get("deleted")]
+    with VectorStoreWriter(root, model=store.meta.get("model"), settings=store.meta.get("settings")) as writer:
+        for doc_id in live_docs:
+            info = {k: v for k, v in store.docs[doc_id].items() if k != "source"}
+            writer.begin_doc(store.docs[doc_id]["source"], **info)
+        for idx in np.flatnonzero(store.live if store.live is not None else np.ones(store.count, bool)):
+            rec = store.record(idx)
+            writer.add(store.vectors[idx], rec["source"], rec["page"], rec["content"],
+                       rec.get("char_start", 0), rec.get("char_end"))
+    store.close()
+    return VectorStore(root)
+
+
+def migrate_json(json_path, root, model=None):
+    """Convierte el antiguo knowledge_vectors.json al formato binario (sin re-vectorizar)."""
+    with open(json_path, "r", encoding="utf-8") as f:
+        knowledge = json.load(f)
+    with VectorStoreWriter(root, model=model) as writer:
+        for item in knowledge:
+            if item.get("embedding"):
+                writer.add(item["embedding"], item["source"], item["page"], item["content"])
+    return VectorStore(root)
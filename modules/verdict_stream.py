@@ -0,0 +1,92 @@
+import json
+
+# --- VEREDICTOS EN STREAMING ---
+# El LLM responde en modo JSON; mientras llegan los fragmentos extraemos el valor
+# de "narrative" (para pintarlo al vuelo) y al final validamos el JSON completo.
+VERDICTS = ("CUMPLE", "RIESGO", "NO CUMPLE")
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class JsonFieldStream:
+    """
+    Extrae incrementalmente el valor de un campo de tipo string de un objeto JSON
+    que llega troceado. feed(fragmento) devuelve el texto nuevo decodificado del campo.
+    """
+
+    def __init__(self, field):
+        self.marker = f'"{field}"'
+        self.buffer = ""
+        self.pos = 0          # siguiente carácter de buffer por examinar
+        self.state = "seek"   # seek -> colon -> value -> done
+        self.done = False
+
+    def feed(self, text):
+        self.buffer += text
+        out = []
+        buf = self.buffer
+        while self.pos < len(buf) and not self.done:
+            if self.state == "seek":
+                idx = buf.find(self.marker, self.pos)
+                if idx < 0:
+                    # conservamos la cola por si el nombre del campo viene partido
+                    self.pos = max(self.pos, len(buf) - len(self.marker))
+                    break
+                self.pos = idx + len(self.marker)
+                self.state = "colon"
+            elif self.state == "colon":
+                ch = buf[self.pos]
+                if ch in " \t\r\n:":
+                    self.pos += 1
+                elif ch == '"':
+                    self.pos += 1
+                    self.state = "value"
+                else:
+                    self.state = "seek"   # no era la clave (p.ej. aparecía dentro de otro valor)
+            else:
+                ch = buf[self.pos]
+                if ch == '"':
+                    self.pos += 1
+                    self.done = True
+                elif ch == "\\":
+                    if self.pos + 1 >= len(buf):
+                        break
+                    esc = buf[self.pos + 1]
+                    if esc == "u":
+                        if self.pos + 6 > len(buf):
+                            break
+                        out.append(chr(int(buf[self.pos + 2:self.pos + 6], 16)))
+                        self.pos += 6
+                    else:
+                        out.append(_ESCAPES.get(esc, esc))
+                        self.pos += 2
+                else:
+                    out.append(ch)
+                    self.pos += 1
+        return "".join(out)
+
+
+def validate_verdict(data):
+    """
+    Normaliza y valida el dictamen final. Devuelve (dictamen, error); con error
+    el dictamen queda como FAIL conservando la narrativa recibida.
+    """
+    if not isinstance(data, dict):
+        return {"narrative": "", "compliance_check": "FAIL", "key_gap": ""}, "La respuesta no es un objeto JSON"
+    verdict = dict(data)
+    check = " ".join(str(verdict.get("compliance_check", "")).upper().replace("_", " ").split())
+    if check not in VERDICTS:
+        verdict["compliance_check"] = "FAIL"
+        return verdict, f"compliance_check inválido: {data.get('compliance_check')!r}"
+    verdict["compliance_check"] = check
+    gap = verdict.get("key_gap")
+    if not isinstance(gap, str) or not gap.strip():
+        verdict["compliance_check"] = "FAIL"
+        return verdict, "key_gap ausente o vacío"
+    return verdict, None
+
+
+def parse_verdict(text):
+    try:
+        return validate_verdict(json.loads(text))
+    except json.JSONDecodeError as e:
+        return {"narrative": "", "compliance_check": "FAIL", "key_gap": ""}, f"JSON incompleto: {e}"
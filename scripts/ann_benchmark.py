@@ -0,0 +1,81 @@
+import sys
+import time
+import argparse
+import numpy as np
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+from modules.ann_index import IVFIndex, default_nlist
+from modules.vector_store import VectorStore, normalize_rows
+
+STORE_DIR = Path("rag/vector_store")
+
+
+def synthetic_corpus(n, dim, clusters=200, seed=0):
+    """Vectores agrupados (como los de un corpus normativo real) y consultas cercanas a ellos."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=n)
+    vectors = normalize_rows(centers[labels] + 0.6 * rng.normal(size=(n, dim)).astype(np.float32))
+    return vectors
+
+
+def exact_topk(vectors, queries, k):
+    scores = queries @ vectors.T
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return [set(row) for row in top]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Recall@k y latencia del índice IVF frente a búsqueda exacta")
+    ap.add_argument("--store", action="store_true", help=f"usar los vectores de {STORE_DIR}")
+    ap.add_argument("--n", type=int, default=100000, help="filas sintéticas")
+    ap.add_argument("--dim", type=int, default=256)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--nlist", type=int, default=None)
+    ap.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+    args = ap.parse_args()
+
+    if args.store:
+        store = VectorStore(STORE_DIR)
+        vectors = np.asarray(store.vectors)
+    else:
+        vectors = synthetic_corpus(args.n, args.dim)
+    rng = np.random.default_rng(1)
+    picks = rng.choice(len(vectors), size=args.queries, replace=False)
+    queries = normalize_rows(vectors[picks] + 0.3 * rng.normal(size=(args.queries, vectors.shape[1])).astype(np.float32))
+
+    print(f"📐 Corpus: {len(vectors)} x {vectors.shape[1]}  | consultas: {args.queries}  | k={args.k}")
+    t0 = time.perf_counter()
+    index = IVFIndex.build(vectors, nlist=args.nlist or default_nlist(len(vectors)))
+    print(f"🏗️ IVF nlist={index.nlist} construido en {time.perf_counter() - t0:.2f}s")
+
+    truth = exact_topk(vectors, queries, args.k)
+    t0 = time.perf_counter()
+    for q in queries:
+        s = vectors @ q
+        np.argpartition(-s, args.k - 1)[:args.k]
+    exact_ms = (time.perf_counter() - t0) / len(queries) * 1000
+    print(f"{'modo':>10} {'recall@k':>9} {'ms/consulta':>12} {'candidatos':>11}")
+    print(f"{'exacta':>10} {1.0:>9.3f} {exact_ms:>12.3f} {len(vectors):>11}")
+
+    for nprobe in args.nprobe:
+        if nprobe > index.nlist:
+            break
+        hits, cand, lat = 0, 0, []
+        for q, gold in zip(queries, truth):
+            t0 = time.perf_counter()
+            rows = index.candidates(q.reshape(1, -1), nprobe)[0]
+            s = vectors[rows] @ q
+            k = min(args.k, len(rows))
+            top = rows[np.argpartition(-s, k - 1)[:k]]
+            lat.append(time.perf_counter() - t0)
+            hits += len(gold.intersection(top.tolist()))
+            cand += len(rows)
+        recall = hits / (args.k * len(queries))
+        print(f"{'nprobe=' + str(nprobe):>10} {recall:>9.3f} {np.mean(lat) * 1000:>12.3f} {cand // len(queries):>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,11 @@
-import json
 import sys
 from pathlib import Path
 
 # Truco para importar módulos desde la carpeta superior
 sys.path.append(str(Path(__file__).parent.parent))
-from modules.gices_brain import ingest_pdfs
+from modules.gices_brain import ingest_pdfs, VECTOR_STORE_DIR
 
 KB_DIR = Path("rag/knowledge_base")
-INDEX_FILE = Path("rag/index.json")
 
 def main():
     print("🎓 GICES-RAGA: Iniciando Ingesta de Conocimiento...")
@@ -23,13 +21,9 @@ def main():
         print("   Por favor sube: Reglamento Restauración, Nature Credits, etc.")
         return
 
-    # 2. Guardar Índice
-    Path("rag").mkdir(exist_ok=True)
-    with open(INDEX_FILE, "w", encoding="utf-8") as f:
-        json.dump(knowledge, f, indent=2, ensure_ascii=False)
-        
+    # 2. El índice ya queda persistido por ingest_pdfs (almacén binario)
     print(f"✅ Ingesta Completada. {len(knowledge)} fragmentos indexados.")
-    print(f"📍 Índice guardado en: {INDEX_FILE}")
+    print(f"📍 Índice guardado en: {VECTOR_STORE_DIR}")
 
 if __name__ == "__main__":
     main()
@@ -1,101 +1,48 @@
-import json, re
+import os, sys, json, argparse
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
 from pathlib import Path
 from datetime import datetime
-import pandas as pd
-from jsonschema import Draft202012Validator
 from utils_hash import sha256_file, sha256_json, write_json
 import yaml # pyyaml es necesario para load_yaml
 
+sys.path.append(str(Path(__file__).parent.parent))
+from modules.resource_cache import cached_resource
+from modules import dq_engine
+from modules.chunked_ingest import CHUNK_ROWS, iter_chunks, JsonArrayWriter
+from modules.schema_fastpath import SchemaChecker, VALIDATE_WORKERS, make_pool, check_parallel
+from modules.ingest_manifest import load_manifest, partition_id, rules_for_period
+from modules.columnar_store import ColumnarWriter, partition_dir
+
 # -------- Config --------
 SAMPLES = {
     "energy": {
         "input": "data/samples/energy_2024-01.json",
+        "period": "2024-01",
         "schema": "contracts/erp_energy.schema.json",
         "normalized": "data/normalized/energy_2024-01.json"
     },
     "hr": {
         "input": "data/samples/hr_2024-01.json",
+        "period": "2024-01",
         "schema": "contracts/hr_people.schema.json",
         "normalized": "data/normalized/hr_2024-01.json"
     },
     "ethics": {
         "input": "data/samples/ethics_2024-01.json",
+        "period": "2024-01",
         "schema": "contracts/ethics_cases.schema.json",
         "normalized": "data/normalized/ethics_2024-01.json"
     }
 }
 DQ_RULES_FILE = "contracts/dq_rules.yaml"
-
-# -------- Helpers DQ --------
-def is_date_iso(s: str) -> bool:
-    try:
-        datetime.strptime(s, "%Y-%m-%d")
-        return True
-    except Exception:
-        return False
-
-def is_yyyy_mm(s: str) -> bool:
-    return bool(re.fullmatch(r"\d{4}-\d{2}", s))
-
-def within_month(date_str: str, month: str) -> bool:
-    # month = 'YYYY-MM'
-    return date_str.startswith(month)
-
-def apply_rule(row: dict, rule: dict, domain: str) -> bool:
-    # Supports simple predicates used in dq_rules.yaml
-    name = rule.get("rule")
-    field = rule.get("field")
-    if name == "not_null":
-        return row.get(field) is not None
-    if name == "is_date":
-        return is_date_iso(str(row.get(field, "")))
-    if name == "is_yyyy_mm":
-        return is_yyyy_mm(str(row.get(field, "")))
-    if name == ">=0":
-        try:
-            val = row.get(field)
-            if val is None: return False
-            return float(val) >= 0
-        except Exception:
-            return False
-    if name and name.startswith("within_month("):
-        m = re.search(r"within_month\('([^']+)'\)", name)
-        month = m.group(1) if m else ""
-        return within_month(str(row.get(field, "")), month)
-    if name and name.startswith("equals("):
-        m = re.search(r"equals\('([^']+)'\)", name)
-        ref = m.group(1) if m else ""
-        return str(row.get(field, "")) == ref
-    if name == "period_start <= period_end":
-        try:
-            ps = datetime.strptime(row.get("period_start"), "%Y-%m-%d")
-            pe = datetime.strptime(row.get("period_end"), "%Y-%m-%d")
-            return ps <= pe
-        except Exception:
-            return False
-    if name == "employees_end <= employees_start + 1000":
-        try:
-            return int(row.get("employees_end", 0)) <= int(row.get("employees_start", 0)) + 1000
-        except Exception:
-            return False
-    if name == "closed_with_resolution <= cases_closed":
-        try:
-            return int(row.get("closed_with_resolution", 0)) <= int(row.get("cases_closed", 0))
-        except Exception:
-            return False
-    return True
-
-def evaluate_dq(records: list[dict], rules: dict, domain: str) -> dict:
-    res = {"completeness": [], "validity": [], "consistency": [], "timeliness": []}
-    for cat in res.keys():
-        for r in rules.get(cat, []):
-            passed = sum(1 for row in records if apply_rule(row, r, domain))
-            total = max(1, len(records))
-            res[cat].append({"rule": r, "pass_rate": passed / total})
-    # Aggregate
-    agg = {k: (sum(x["pass_rate"] for x in v) / max(1, len(v))) if v else 1.0 for k, v in res.items()}
-    agg["dq_pass"] = all(v >= 0.95 for v in agg.values())
-    return {"by_rule": res, "aggregate": agg}
+# Con extractos grandes solo se guardan los primeros errores de schema (el total sí se cuenta)
+MAX_SCHEMA_ERRORS_REPORTED = 1000
+# Particiones (dominio × entidad × periodo) en paralelo entre procesos; por debajo de
+# PARALLEL_MIN_BYTES de entrada arrancar procesos cuesta más de lo que ahorra
+INGEST_WORKERS = int(os.environ.get("GICES_INGEST_WORKERS", os.cpu_count() or 1))
+PARALLEL_MIN_BYTES = 8 * 1024 * 1024
 
 # -------- Load DQ rules --------
 def load_yaml(path: str) -> dict:
@@ -105,85 +52,166 @@ def load_yaml(path: str) -> dict:
 def json_load(path: str) -> dict | list:
     return json.loads(Path(path).read_text(encoding="utf-8"))
 
-# -------- Main --------
-def main():
-    dq_rules = load_yaml(DQ_RULES_FILE)
+def get_checker(schema_path) -> SchemaChecker:
+    # Compilado una vez por proceso (se recompila si cambia el schema) a comprobaciones
+    # directas; los mensajes de error siguen siendo los de jsonschema
+    return cached_resource(f"schema_fastpath:{schema_path}", [schema_path],
+                           lambda: SchemaChecker(json_load(schema_path)))
+
+def ingest_domain(domain: str, src: Path, sch: Path, dst: Path, rules: dict, chunk_rows: int = CHUNK_ROWS,
+                  pool=None, columnar: Path | None = None, meta: dict | None = None) -> dict:
+    """
+    Valida, normaliza y evalúa la DQ de una fuente bloque a bloque (NDJSON, CSV o
+    lista JSON). El normalizado se escribe de forma incremental y la DQ se acumula
+    entre bloques: la memoria no crece con el tamaño del fichero. Con `pool`
+    (schema_fastpath.make_pool) cada bloque se valida en paralelo por particiones.
+    Con `columnar`, los registros válidos se escriben también en ese directorio
+    en formato columnar (modules.columnar_store), con `meta` en su sidecar.
+    """
+    checker = get_checker(sch)
+    dq = dq_engine.DQAccumulator(rules)
+    errors, n_errors, total = [], 0, 0
+    with JsonArrayWriter(dst) as out, \
+            (ColumnarWriter(columnar, checker.schema, meta) if columnar else nullcontext()) as cols:
+        for chunk in iter_chunks(src, checker.schema, chunk_rows):
+            valid_records, chunk_errors = check_parallel(checker, chunk, pool, start=total)
+            n_errors += len(chunk_errors)
+            errors.extend(chunk_errors[:MAX_SCHEMA_ERRORS_REPORTED - len(errors)])
+            total += len(chunk)
+            out.write(valid_records)
+            if cols is not None:
+                cols.write(valid_records)
+            dq.add(valid_records)
+        records_valid = out.count
+    return {
+        "source": str(src),
+        "schema": str(sch),
+        "records_total": total,
+        "records_valid": records_valid,
+        "schema_errors": errors,
+        "schema_errors_total": n_errors,
+        "dq": dq.result()
+    }
 
-    normalized_paths = []
-    dq_summary = {}
+def ingest_partition(part: dict, chunk_rows: int = CHUNK_ROWS, pool=None) -> dict:
+    """Ingesta de una partición: resumen DQ + línea de linaje. Se ejecuta también en procesos hijo."""
+    dq_rules = cached_resource("dq_rules", [DQ_RULES_FILE], lambda: load_yaml(DQ_RULES_FILE))
+    rules = rules_for_period(dq_rules.get(part["domain"], {}), part.get("period"))
+    src, dst = Path(part["input"]), Path(part["normalized"])
+    columnar = partition_dir(part["domain"], part.get("period"), part.get("entity"))
+    meta = {"domain": part["domain"], "entity": part.get("entity"), "period": part.get("period"), "normalized": str(dst)}
+    summary = ingest_domain(part["domain"], src, Path(part["schema"]), dst, rules, chunk_rows, pool, columnar, meta)
+    lineage = {
+        "domain": part["domain"],
+        "entity": part.get("entity"),
+        "period": part.get("period"),
+        "src": str(src),
+        "src_sha256": sha256_file(src),
+        "normalized": str(dst),
+        "normalized_sha256": sha256_file(dst),
+        "columnar": str(columnar),
+        "utc": datetime.utcnow().isoformat() + "Z"
+    }
+    return {"summary": summary, "lineage": lineage}
+
+def merge_domain(pids: list[str], summaries: list[dict]) -> dict:
+    """Resumen de un dominio con varias particiones (entidades/periodos)."""
+    if len(summaries) == 1:
+        return summaries[0]
+    errors = [dict(e, partition=pid) for pid, s in zip(pids, summaries) for e in s["schema_errors"]]
+    return {
+        "partitions": pids,
+        "schema": summaries[0]["schema"],
+        "records_total": sum(s["records_total"] for s in summaries),
+        "records_valid": sum(s["records_valid"] for s in summaries),
+        "schema_errors": errors[:MAX_SCHEMA_ERRORS_REPORTED],
+        "schema_errors_total": sum(s["schema_errors_total"] for s in summaries),
+        "dq": dq_engine.merge_results([(pid, s["records_valid"], s["dq"]) for pid, s in zip(pids, summaries)])
+    }
 
+def default_partitions(overrides: dict) -> list[dict]:
+    parts = []
     for domain, cfg in SAMPLES.items():
-        src = Path(cfg["input"])
-        sch = Path(cfg["schema"])
-        dst = Path(cfg["normalized"])
-        dst.parent.mkdir(parents=True, exist_ok=True)
-
-        # 1) Cargar datos
-        records = json_load(src)
-        if not isinstance(records, list):
-            raise ValueError(f"{src} debe ser una lista de objetos JSON")
-
-        # 2) Validar JSON Schema
-        schema = json_load(sch)
-        validator = Draft202012Validator(schema)
-        valid_records, errors = [], []
-        for i, rec in enumerate(records):
-            errs = sorted(validator.iter_errors(rec), key=lambda e: e.path)
-            if errs:
-                errors.append({"index": i, "errors": [e.message for e in errs]})
-            else:
-                valid_records.append(rec)
-
-        # 3) Escribir normalizados (solo válidos)
-        write_json(dst, valid_records)
-        normalized_paths.append(str(dst))
-
-        # 4) DQ por reglas
-        rules = dq_rules.get(domain, {})
-        dq = evaluate_dq(valid_records, rules, domain)
-        dq_summary[domain] = {
-            "source": str(src),
-            "schema": str(sch),
-            "records_total": len(records),
-            "records_valid": len(valid_records),
-            "schema_errors": errors,
-            "dq": dq
-        }
-
-    # 5) Linaje y hashes
+        parts.append({"domain": domain, "entity": None, "period": cfg["period"],
+                      "input": overrides.get(domain, cfg["input"]), "schema": cfg["schema"],
+                      "normalized": cfg["normalized"]})
+    return parts
+
+# -------- Main --------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Ingesta MCP: JSON Schema + DQ + normalizados + linaje")
+    ap.add_argument("--manifest", help="YAML con las particiones dominio × entidad × periodo (ver modules/ingest_manifest.py)")
+    ap.add_argument("--source", action="append", default=[], metavar="DOMINIO=RUTA",
+                    help="Sustituye la fuente de un dominio (.json, .jsonl/.ndjson o .csv)")
+    ap.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="Registros por bloque")
+    ap.add_argument("--workers", type=int, default=INGEST_WORKERS, help="Procesos para ingerir particiones en paralelo")
+    ap.add_argument("--validate-workers", type=int, default=VALIDATE_WORKERS,
+                    help="Procesos para validar JSON Schema en paralelo (0/1 = en este proceso)")
+    args = ap.parse_args(argv)
+
+    overrides = {}
+    for item in args.source:
+        domain, _, path = item.partition("=")
+        if domain not in SAMPLES or not path:
+            ap.error(f"--source debe ser DOMINIO=RUTA con DOMINIO en {list(SAMPLES)}")
+        overrides[domain] = path
+    if args.manifest and overrides:
+        ap.error("--source no se combina con --manifest: declara la fuente en el manifiesto")
+
+    if args.manifest:
+        parts = load_manifest(args.manifest, {d: cfg["schema"] for d, cfg in SAMPLES.items()})
+    else:
+        parts = default_partitions(overrides)
+    if not parts:
+        raise SystemExit("No hay particiones que ingerir")
+
+    # 1-5) Por partición: carga por bloques, JSON Schema, normalizados (solo válidos), DQ y linaje
+    input_bytes = sum(Path(p["input"]).stat().st_size for p in parts)
+    workers = min(args.workers, len(parts)) if input_bytes >= PARALLEL_MIN_BYTES else 1
+    if workers > 1:
+        # spawn: main() también corre dentro de la App (pipeline_stages) y fork de un proceso con hilos no es seguro
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as executor:
+            futures = [executor.submit(ingest_partition, p, args.chunk_rows) for p in parts]
+            results = [f.result() for f in futures]
+    else:
+        pool = make_pool(args.validate_workers)
+        try:
+            results = [ingest_partition(p, args.chunk_rows, pool) for p in parts]
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+    pids = [partition_id(p) for p in parts]
+    partitions = {pid: dict(r["summary"], domain=p["domain"], entity=p.get("entity"), period=p.get("period"))
+                  for pid, p, r in zip(pids, parts, results)}
+
     lineage_path = Path("data/lineage.jsonl")
     lineage_path.parent.mkdir(parents=True, exist_ok=True)
-    lines = []
-    for domain, cfg in SAMPLES.items():
-        src = Path(cfg["input"])
-        dst = Path(cfg["normalized"])
-        lines.append(json.dumps({
-            "domain": domain,
-            "src": str(src),
-            "src_sha256": sha256_file(src),
-            "normalized": str(dst),
-            "normalized_sha256": sha256_file(dst),
-            "utc": datetime.utcnow().isoformat() + "Z"
-        }))
-
+    lines = [json.dumps(dict(r["lineage"], partition=pid)) for pid, r in zip(pids, results)]
     lineage_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
 
-    # 6) Reporte DQ agregado
-    def ok(dom):
-        agg = dq_summary[dom]["dq"]["aggregate"]
+    # 6) Reporte DQ agregado: por dominio (particiones combinadas) y por partición
+    dq_summary = {}
+    for domain in dict.fromkeys(p["domain"] for p in parts):
+        own = [(pid, r["summary"]) for pid, p, r in zip(pids, parts, results) if p["domain"] == domain]
+        dq_summary[domain] = merge_domain([pid for pid, _ in own], [s for _, s in own])
+
+    def ok(summary):
+        agg = summary["dq"]["aggregate"]
         return all(agg[k] >= 0.95 for k in ["completeness","validity","consistency","timeliness"])
 
     dq_report = {
         "domains": dq_summary,
-        "dq_pass": all(ok(dom) for dom in dq_summary.keys())
+        "partitions": partitions,
+        "dq_pass": all(ok(s) for s in partitions.values())
     }
     write_json("data/dq_report.json", dq_report)
 
-    print("Ingesta/DQ completada.")
+    print(f"Ingesta/DQ completada: {len(parts)} particiones ({workers} procesos).")
     print("data/dq_report.json escrito.")
     print("data/lineage.jsonl escrito.")
-    for p in normalized_paths:
-        print("OK →", p)
+    for p in parts:
+        print("OK →", p["normalized"])
 
 if __name__ == "__main__":
     main()
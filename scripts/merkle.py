@@ -1,9 +1,9 @@
+import sys
 from pathlib import Path
 import hashlib, json
 
-def sha256_file(path: str | Path) -> str:
-    p = Path(path)
-    return hashlib.sha256(p.read_bytes()).hexdigest()
+sys.path.append(str(Path(__file__).parent.parent))
+from modules.file_hashing import sha256_file, sha256_files
 
 def merkle_root_from_hashes(hashes: list[str]) -> str:
     if not hashes: return ""
@@ -18,9 +18,6 @@ def merkle_root_from_hashes(hashes: list[str]) -> str:
     return hashlib.sha256(level[0]).hexdigest()
 
 def build_manifest(artifacts: list[str], run_id: str) -> dict:
-    rows = []
-    for a in artifacts:
-        sha = sha256_file(a)
-        rows.append({"path": a, "sha256": sha})
+    rows = [{"path": a, "sha256": sha} for a, sha in zip(artifacts, sha256_files(artifacts))]
     root = merkle_root_from_hashes([r["sha256"] for r in rows])
     return {"run_id": run_id, "artifacts": rows, "merkle_root": f"SHA256:{root}"}
@@ -0,0 +1,245 @@
+import re
+import json
+import time
+import base64
+import random
+import hashlib
+import argparse
+import threading
+import numpy as np
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# --- SUSTITUTO LOCAL DE LA API DE OPENAI ---
+# Implementa /v1/embeddings y /v1/chat/completions con latencia, errores 5xx y 429
+# configurables. Los clientes oficiales lo usan sin cambios de código:
+#   OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=local python scripts/raga_compute.py
+# Sirve para medir el rendimiento del pipeline en CI o en máquinas sin conexión.
+
+EMBED_DIM = 1536
+WORD_RE = re.compile(r"\w+")
+
+
+def fake_embedding(text, dim=EMBED_DIM):
+    """Bolsa de palabras con hashing: textos que comparten vocabulario quedan cerca."""
+    vec = np.zeros(dim, dtype=np.float32)
+    for word in WORD_RE.findall(text.lower()):
+        h = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+        vec[h % dim] += 1.0 if (h >> 32) & 1 else -1.0
+    norm = np.linalg.norm(vec)
+    if norm == 0:
+        vec[0] = 1.0
+        norm = 1.0
+    return vec / norm
+
+
+def fake_completion(prompt):
+    """Respuesta JSON con la forma que espera cada llamador del repo."""
+    if "subpreguntas" in prompt:
+        return {"node": "Pregunta raíz", "children": [{"node": f"Subpregunta {i}", "children": []} for i in range(1, 4)]}
+    if "Generador Contextual" in prompt:
+        node = re.search(r"Nodo: '(.*)'", prompt)
+        return {"node": node.group(1) if node else "", "responses": [
+            {"label": label, "text": "Respuesta simulada."} for label in ("Ética", "Histórica", "Crítica")
+        ]}
+    verdict = "CUMPLE" if int(hashlib.sha256(prompt.encode("utf-8")).hexdigest(), 16) % 4 else "NO CUMPLE"
+    sources = re.findall(r"\[Fuente: ([^\]|]+?) Pág", prompt)
+    return {
+        "narrative": "Veredicto simulado por el servidor local.",
+        "compliance_check": verdict,
+        "citations": sorted(set(s.strip() for s in sources))[:3],
+        "key_gap": "N/A"
+    }
+
+
+def approx_tokens(text):
+    return len(text) // 4 + 1
+
+
+class StandinConfig:
+    """
+    Parámetros de inyección: latencias en ms, tasas de error y de 429 en [0, 1].
+    stream_token_ms es la pausa entre deltas cuando el cliente pide stream=True.
+    """
+
+    def __init__(self, latency_ms=50.0, jitter_ms=20.0, per_token_ms=0.0,
+                 error_rate=0.0, rate_limit_rate=0.0, retry_after_sec=0.5, seed=None, stream_token_ms=10.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.per_token_ms = per_token_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after_sec = retry_after_sec
+        self.stream_token_ms = stream_token_ms
+        self.random = random.Random(seed)
+        self.stats = {"requests": 0, "embeddings": 0, "chat": 0, "errors": 0, "rate_limited": 0}
+        self.lock = threading.Lock()
+
+    def count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+    def draw(self):
+        with self.lock:
+            return self.random.random(), self.random.uniform(-1.0, 1.0)
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = None  # se asigna en make_server
+
+    def log_message(self, format, *args):
+        pass  # sin ruido en la salida del benchmark
+
+    def _send(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status, message, kind, headers=None):
+        self._send(status, {"error": {"message": message, "type": kind, "code": None}}, headers)
+
+    def do_POST(self):
+        cfg = self.config
+        cfg.count("requests")
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            return self._error(400, "JSON inválido", "invalid_request_error")
+
+        if self.path.endswith("/embeddings"):
+            texts = body.get("input", [])
+            texts = [texts] if isinstance(texts, str) else texts
+            tokens = sum(approx_tokens(t) for t in texts)
+        elif self.path.endswith("/chat/completions"):
+            prompt = "\n".join(m.get("content") or "" for m in body.get("messages", []))
+            tokens = approx_tokens(prompt)
+        else:
+            return self._error(404, f"Ruta no soportada: {self.path}", "invalid_request_error")
+
+        # --- INYECCIÓN: latencia, 429 y 5xx ---
+        roll, jitter = cfg.draw()
+        time.sleep(max(0.0, cfg.latency_ms + jitter * cfg.jitter_ms + tokens * cfg.per_token_ms) / 1000)
+        if roll < cfg.rate_limit_rate:
+            cfg.count("rate_limited")
+            return self._error(429, "Rate limit simulado", "rate_limit_exceeded",
+                               {"Retry-After": str(cfg.retry_after_sec)})
+        if roll < cfg.rate_limit_rate + cfg.error_rate:
+            cfg.count("errors")
+            return self._error(500, "Error simulado", "server_error")
+
+        if self.path.endswith("/embeddings"):
+            cfg.count("embeddings")
+            data = []
+            for i, text in enumerate(texts):
+                vec = fake_embedding(text, int(body.get("dimensions") or EMBED_DIM))
+                if body.get("encoding_format") == "base64":
+                    value = base64.b64encode(vec.astype("<f4").tobytes()).decode("ascii")
+                else:
+                    value = vec.tolist()
+                data.append({"object": "embedding", "index": i, "embedding": value})
+            return self._send(200, {
+                "object": "list", "data": data, "model": body.get("model"),
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens}
+            })
+
+        cfg.count("chat")
+        content = json.dumps(fake_completion(prompt), ensure_ascii=False)
+        completion = approx_tokens(content)
+        if body.get("stream"):
+            return self._stream_chat(body, content, tokens, completion)
+        return self._send(200, {
+            "id": f"chatcmpl-local-{cfg.stats['chat']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": tokens, "completion_tokens": completion, "total_tokens": tokens + completion}
+        })
+
+    def _stream_chat(self, body, content, prompt_tokens, completion_tokens):
+        """Server-sent events como la API real: un delta por ~token y usage al final."""
+        cfg = self.config
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        base = {"id": f"chatcmpl-local-{cfg.stats['chat']}", "object": "chat.completion.chunk",
+                "created": int(time.time()), "model": body.get("model")}
+
+        def event(payload):
+            self.wfile.write(b"data: " + json.dumps(payload, ensure_ascii=False).encode("utf-8") + b"\n\n")
+            self.wfile.flush()
+
+        for start in range(0, len(content), 4):
+            event(base | {"choices": [{"index": 0, "delta": {"content": content[start:start + 4]}, "finish_reason": None}]})
+            if cfg.stream_token_ms:
+                time.sleep(cfg.stream_token_ms / 1000)
+        event(base | {"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        if (body.get("stream_options") or {}).get("include_usage"):
+            event(base | {"choices": [], "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                                                   "total_tokens": prompt_tokens + completion_tokens}})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def make_server(host="127.0.0.1", port=8765, config=None):
+    """Crea el servidor (port=0 elige uno libre). La URL base es f"http://{host}:{port}/v1"."""
+    handler = type("ConfiguredStandinHandler", (StandinHandler,), {"config": config or StandinConfig()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.config = handler.config
+    return server
+
+
+def start_in_thread(config=None, host="127.0.0.1", port=0):
+    """Arranca el servidor en segundo plano y devuelve (server, base_url)."""
+    server = make_server(host, port, config)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def add_injection_args(ap):
+    ap.add_argument("--latency-ms", type=float, default=50.0)
+    ap.add_argument("--jitter-ms", type=float, default=20.0)
+    ap.add_argument("--per-token-ms", type=float, default=0.0)
+    ap.add_argument("--error-rate", type=float, default=0.0, help="fracción de respuestas 500")
+    ap.add_argument("--rate-limit-rate", type=float, default=0.0, help="fracción de respuestas 429")
+    ap.add_argument("--stream-token-ms", type=float, default=10.0, help="pausa entre deltas con stream=True")
+    ap.add_argument("--seed", type=int, default=None)
+
+
+def config_from_args(args):
+    return StandinConfig(args.latency_ms, args.jitter_ms, args.per_token_ms,
+                         args.error_rate, args.rate_limit_rate, seed=args.seed,
+                         stream_token_ms=args.stream_token_ms)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Servidor local compatible con la API de OpenAI (embeddings + chat)")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    add_injection_args(ap)
+    args = ap.parse_args()
+
+    server = make_server(args.host, args.port, config_from_args(args))
+    print(f"🧪 Servidor local en http://{args.host}:{server.server_address[1]}/v1")
+    print(f"   export OPENAI_BASE_URL=http://{args.host}:{server.server_address[1]}/v1 OPENAI_API_KEY=local")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"📊 {server.config.stats}")
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
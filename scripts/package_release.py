@@ -1,7 +1,10 @@
-import zipfile
+import sys
 from pathlib import Path
 from datetime import datetime
 
+sys.path.append(str(Path(__file__).parent.parent))
+from modules.release_packager import build_package
+
 ARTS = [
     "data/normalized/energy_2024-01.json",
     "data/normalized/hr_2024-01.json",
@@ -18,11 +21,12 @@ def main():
     run_id = f"{datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')}"
     out = Path(f"release/audit/STEELTRACE_LAB_{run_id}.zip")
     out.parent.mkdir(parents=True, exist_ok=True)
-    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as z:
-        for p in ARTS:
-            if Path(p).exists():
-                z.write(p)
-    print("ZIP listo:", out)
+    # PDFs y formatos ya comprimidos van sin comprimir; el resto se comprime en paralelo
+    summary = build_package(out, [(p, p) for p in ARTS if Path(p).exists()],
+                            report_path=out.with_suffix(".report.json"))
+    for e in summary["entries"]:
+        print(f"  {e['method']:<7} {e['size']:>12} → {e['compressed_size']:>12}  {e['seconds']:.3f}s  {e['name']}")
+    print("ZIP listo:", out, f"({summary['seconds']:.2f}s)")
 
 if __name__ == "__main__":
     main()
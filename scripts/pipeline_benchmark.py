@@ -0,0 +1,163 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+import numpy as np
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+from scripts.openai_standin import start_in_thread, add_injection_args, config_from_args
+
+# --- BENCHMARK EXTREMO A EXTREMO (ingesta, recuperación, deliberación) ---
+# Arranca el sustituto local de OpenAI (o usa --base-url) y mide throughput y
+# latencias p50/p95/p99 de cada etapa con el código real de gices_brain.
+# Todo se escribe en un directorio temporal: no toca rag/ ni las cachés del proyecto.
+
+KB_DIR = Path("rag/knowledge_base")
+QUERY_TEMPLATES = [
+    "nature credits restoration integrity {}",
+    "restauración de ecosistemas degradados {}",
+    "biodiversity financial risk exposure {}",
+    "Artículo 4 restauración de hábitats {}",
+    "seguimiento y verificación de créditos de naturaleza {}",
+]
+
+
+class LatencyRecorder:
+    def __init__(self):
+        self.samples = []
+        self._lock = threading.Lock()
+
+    def timed(self, fn):
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.samples.append(time.perf_counter() - t0)
+        return wrapper
+
+
+class TimedEmbeddings:
+    """Envuelve client.embeddings para medir cada petición de la ingesta."""
+
+    def __init__(self, client, recorder):
+        self.embeddings = type("Embeddings", (), {"create": staticmethod(recorder.timed(client.embeddings.create))})()
+
+
+def summarize(name, count, elapsed, samples):
+    ms = np.asarray(samples, dtype=np.float64) * 1000
+    row = {"stage": name, "items": count, "elapsed_sec": round(elapsed, 3),
+           "throughput_per_sec": round(count / elapsed, 2) if elapsed > 0 else None, "requests": len(ms)}
+    for p in (50, 95, 99):
+        row[f"p{p}_ms"] = round(float(np.percentile(ms, p)), 2) if len(ms) else None
+    return row
+
+
+def print_table(rows):
+    print(f"{'etapa':<22} {'items':>7} {'seg':>8} {'items/s':>9} {'peticiones':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    fmt = lambda v: "-" if v is None else v
+    for r in rows:
+        print(f"{r['stage']:<22} {r['items']:>7} {r['elapsed_sec']:>8} {fmt(r['throughput_per_sec']):>9} "
+              f"{r['requests']:>10} {fmt(r['p50_ms']):>9} {fmt(r['p95_ms']):>9} {fmt(r['p99_ms']):>9}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark del pipeline RAGA contra un sustituto local de OpenAI")
+    ap.add_argument("--base-url", default=None, help="usar un servidor ya arrancado en vez del integrado")
+    ap.add_argument("--pdf-dir", type=Path, default=KB_DIR)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--records", type=int, default=100, help="registros a deliberar")
+    ap.add_argument("--k", type=int, default=3)
+    ap.add_argument("--concurrency", type=int, default=None, help="GICES_DELIBERATION_CONCURRENCY")
+    ap.add_argument("--tpm", type=int, default=None, help="GICES_DELIBERATION_TPM (tokens/minuto del LLM)")
+    ap.add_argument("--embed-concurrency", type=int, default=None, help="GICES_EMBED_CONCURRENCY")
+    ap.add_argument("--no-cache", action="store_true", help="sin caché de embeddings ni de respuestas")
+    ap.add_argument("--output", type=Path, default=None, help="volcar el resultado en JSON")
+    add_injection_args(ap)
+    args = ap.parse_args()
+
+    server = None
+    base_url = args.base_url
+    if base_url is None:
+        server, base_url = start_in_thread(config_from_args(args))
+    work = Path(tempfile.mkdtemp(prefix="gices_bench_"))
+
+    # El cliente de gices_brain se crea al importar: el entorno va antes del import
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ.setdefault("OPENAI_API_KEY", "local")
+    os.environ["GICES_EMBED_CACHE"] = "" if args.no_cache else str(work / "embedding_cache.sqlite")
+    os.environ["GICES_RESPONSE_CACHE"] = "" if args.no_cache else str(work / "response_cache.sqlite")
+    if args.concurrency:
+        os.environ["GICES_DELIBERATION_CONCURRENCY"] = str(args.concurrency)
+    if args.tpm:
+        os.environ["GICES_DELIBERATION_TPM"] = str(args.tpm)
+    if args.embed_concurrency:
+        os.environ["GICES_EMBED_CONCURRENCY"] = str(args.embed_concurrency)
+    import modules.gices_brain as brain
+    brain.VECTOR_STORE_DIR = work / "vector_store"
+    brain.VECTOR_DB_PATH = work / "knowledge_vectors.json"
+
+    print(f"🧪 API: {base_url}  | trabajo: {work}")
+    rows = []
+
+    # 1. Ingesta: extracción + fragmentación + embeddings + escritura del almacén
+    pdfs = sorted(args.pdf_dir.glob("*.pdf")) if args.pdf_dir.exists() else []
+    if not pdfs:
+        print(f"⚠️ No hay PDFs en {args.pdf_dir}: se omiten ingesta, recuperación y deliberación")
+        return
+    rec = LatencyRecorder()
+    t0 = time.perf_counter()
+    knowledge = brain.ingest_pdfs(args.pdf_dir, embed_client=TimedEmbeddings(brain.client, rec), force=True)
+    rows.append(summarize("ingest (fragmentos)", len(knowledge), time.perf_counter() - t0, rec.samples))
+    kb = brain.get_knowledge_base()
+
+    # 2. Recuperación: una consulta cada vez (latencia) y todas en lote (throughput)
+    queries = [QUERY_TEMPLATES[i % len(QUERY_TEMPLATES)].format(i) for i in range(args.queries)]
+    rec = LatencyRecorder()
+    retrieve = rec.timed(brain.retrieve_context)
+    t0 = time.perf_counter()
+    for q in queries:
+        retrieve(q, kb, k=args.k)
+    rows.append(summarize("retrieve (1 a 1)", len(queries), time.perf_counter() - t0, rec.samples))
+
+    batch = [q + " lote" for q in queries]  # consultas nuevas: sin aciertos en la LRU
+    t0 = time.perf_counter()
+    contexts = brain.retrieve_context_many(batch, kb, k=args.k)
+    elapsed = time.perf_counter() - t0
+    rows.append(summarize("retrieve_many (lote)", len(batch), elapsed, [elapsed]))
+
+    # 3. Deliberación: en frío y, con caché, una segunda pasada idéntica
+    records = [{"project_id": f"P{i:04d}", "ecosystem_area_ha": float(i % 50 + 1), "project_type": "restoration"}
+               for i in range(args.records)]
+    items = [(r, contexts[i % len(contexts)]) for i, r in enumerate(records)]
+    passes = ["deliberate (frío)"] if args.no_cache else ["deliberate (frío)", "deliberate (caliente)"]
+    original = brain._deliberate
+    for name in passes:
+        rec = LatencyRecorder()
+        brain._deliberate = rec.timed(original)
+        t0 = time.perf_counter()
+        brain.deliberative_analysis_many(items, use_cache=not args.no_cache)
+        rows.append(summarize(name, len(items), time.perf_counter() - t0, rec.samples))
+    brain._deliberate = original
+
+    print()
+    print_table(rows)
+    report = {"base_url": base_url, "args": {k: str(v) for k, v in vars(args).items()}, "stages": rows,
+              "deliberation": brain.deliberation_report()}
+    if server is not None:
+        report["server"] = dict(server.config.stats)
+        print(f"\n📊 Servidor: {report['server']}")
+        server.shutdown()
+    print(f"💾 Deliberación: {report['deliberation']}")
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+        print(f"📍 Informe: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,60 +1,116 @@
-import json, subprocess, time
+import os, sys, json, subprocess, time
 from pathlib import Path
-from statistics import quantiles
 from datetime import datetime
 
-STEPS = [
-    ("MCP.ingest",      ["python","scripts/mcp_ingest.py"]),
-    ("SHACL.validate",  ["python","scripts/shacl_validate.py"]),
-    ("RAGA.compute",    ["python","scripts/raga_compute.py"]),
-    ("EEE.gate",        ["python","scripts/eee_gate.py"]),
-    ("XBRL.generate",   ["python","scripts/xbrl_generate.py"]),
-    ("EVIDENCE.build",  ["python","scripts/evidence_build.py"])
+sys.path.append(str(Path(__file__).parent.parent))
+from modules.pipeline_dag import run_dag
+from modules.slo_sketch import SLOSketch, rebuild_from_history
+
+# Cada etapa declara qué lee, qué escribe y de qué código depende. El orden de
+# ejecución sale de ahí: SHACL.validate y RAGA.compute (y luego EEE.gate y
+# XBRL.generate) corren en paralelo, y una etapa sin cambios se salta.
+NORMALIZED = ["data/normalized/energy_2024-01.json", "data/normalized/hr_2024-01.json",
+              "data/normalized/ethics_2024-01.json"]
+# Capa columnar de mcp_ingest: todos los ficheros de cada partición (.npy y schema.json)
+COLUMNAR = ["data/columnar/*/period=*/entity=*/*"]
+STAGES = [
+    {"name": "MCP.ingest", "cmd": ["python", "scripts/mcp_ingest.py"],
+     "inputs": ["data/samples/*.json", "contracts/*.schema.json", "contracts/dq_rules.yaml"],
+     "outputs": NORMALIZED + COLUMNAR + ["data/dq_report.json", "data/lineage.jsonl"],
+     "code": ["scripts/mcp_ingest.py", "scripts/utils_hash.py", "modules/dq_engine.py",
+              "modules/chunked_ingest.py", "modules/schema_fastpath.py", "modules/ingest_manifest.py",
+              "modules/columnar_store.py", "modules/npy_io.py"]},
+    {"name": "SHACL.validate", "cmd": ["python", "scripts/shacl_validate.py"],
+     "inputs": NORMALIZED + COLUMNAR + ["ontology/esrs.owl", "contracts/shacl_*.ttl"],
+     "outputs": ["ontology/validation.log", "ontology/linaje.ttl"],
+     "code": ["scripts/shacl_validate.py", "modules/columnar_store.py", "modules/npy_io.py"]},
+    {"name": "RAGA.compute", "cmd": ["python", "scripts/raga_compute.py"],
+     "inputs": ["data/normalized/energy_2024-01.json", "data/normalized/biodiversity_2024.json",
+                "rag/vector_store/meta.json"] + COLUMNAR,
+     "outputs": ["raga/kpis.json", "raga/explain.json"],
+     "code": ["scripts/raga_compute.py", "modules/*.py"],
+     # Credenciales y ajustes del LLM/recuperación (modelo, modo, presupuestos, bypass de caché)
+     "env": ["OPENAI_API_KEY", "OPENAI_BASE_URL", "GICES_*"]},
+    {"name": "EEE.gate", "cmd": ["python", "scripts/eee_gate.py"],
+     "inputs": ["ops/eee_gate.yaml", "raga/kpis.json", "raga/explain.json", "ontology/validation.log"],
+     "outputs": ["ops/gate_report.json", "eee/eee_report.json"],
+     "code": ["scripts/eee_gate.py"]},
+    {"name": "XBRL.generate", "cmd": ["python", "scripts/xbrl_generate.py"],
+     "inputs": ["raga/kpis.json", "xbrl/schema/basic_xbrl.xsd"],
+     "outputs": ["xbrl/informe.xbrl", "xbrl/validation.log"],
+     "code": ["scripts/xbrl_generate.py"]},
+    {"name": "EVIDENCE.build", "cmd": ["python", "scripts/evidence_build.py"],
+     "inputs": ["raga/kpis.json", "raga/explain.json", "ontology/validation.log", "ontology/linaje.ttl",
+                "ops/gate_report.json", "eee/eee_report.json", "xbrl/informe.xbrl", "xbrl/validation.log"],
+     "outputs": ["evidence/evidence_manifest.json", "evidence/tokens/2025Q1.tsr", "evidence/verify/2025Q1.txt"],
+     "code": ["scripts/evidence_build.py", "scripts/merkle.py"]},
 ]
 
 SLO_FILE = Path("ops/slo_report.json")
 HISTORY  = Path("ops/slo_history.jsonl")
+# Huellas de la última ejecución correcta de cada etapa (para saltar las que no cambian)
+STATE_FILE = Path("ops/pipeline_state.json")
+# t-digests por etapa (global + ventanas móviles): el informe no relee el histórico
+SKETCH_FILE = Path("ops/slo_sketch.json")
+# Informes que los pasos dejan en disco y se anexan al informe SLO
+STEP_REPORTS = {"RAGA.compute": Path("raga/run_report.json")}
 
-def run_step(name, cmd):
+def load_step_report(name):
+    path = STEP_REPORTS.get(name)
+    if path is None or not path.exists():
+        return None
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except Exception:
+        return None
+
+def run_step(name, cmd, env=None):
+    report = STEP_REPORTS.get(name)
+    if report is not None and report.exists():
+        report.unlink()   # que no se cuele el informe de una ejecución anterior
     t0 = time.perf_counter()
-    proc = subprocess.run(cmd, capture_output=True, text=True)
+    proc = subprocess.run(cmd, capture_output=True, text=True, env=env)
     t1 = time.perf_counter()
     dur = t1 - t0
     ok  = proc.returncode == 0
-    return {"name": name, "ok": ok, "duration_sec": dur, "stdout": proc.stdout[-4000:], "stderr": proc.stderr[-4000:]}
-
-def p95(values):
-    if not values:
-        return None
-    if len(values) < 20:
-        # con pocas muestras usamos el max como aproximación
-        return max(values)
-    return quantiles(values, n=100)[94]
-
-def aggregate(history):
-    # history: lista de runs con pasos y duraciones
-    agg = {}
-    for run in history:
-        for s in run["steps"]:
-            agg.setdefault(s["name"], []).append(s["duration_sec"])
-    return {k: {"count": len(v), "p95_sec": round(p95(v), 4), "mean_sec": round(sum(v)/len(v), 4)} for k,v in agg.items()}
+    step = {"name": name, "ok": ok, "duration_sec": dur, "stdout": proc.stdout[-4000:], "stderr": proc.stderr[-4000:]}
+    extra = load_step_report(name)
+    if extra is not None:
+        step["report"] = extra
+        step["cacheable"] = extra.get("cacheable", True)
+    return step
 
 def main():
     Path("ops").mkdir(exist_ok=True)
-    steps = [run_step(n,c) for n,c in STEPS]
-    run = {"utc": datetime.utcnow().isoformat()+"Z", "steps": steps}
-    HISTORY.write_text((HISTORY.read_text() if HISTORY.exists() else "") + json.dumps(run)+"\n")
-
-    # reconstruir historia
-    hist = []
-    for line in HISTORY.read_text().splitlines():
-        try:
-            hist.append(json.loads(line))
-        except Exception:
-            pass
-
-    agg = aggregate(hist)
-    SLO_FILE.write_text(json.dumps({"utc": run["utc"], "agg": agg, "last_run": steps}, indent=2, ensure_ascii=False))
+    args = sys.argv[1:]
+    env = None
+    force = "--force" in args   # re-ejecutar todo aunque no haya cambios
+    if "--no-llm-cache" in args:
+        # Fuerza llamadas reales al LLM en RAGA.compute (la caché ni se lee ni se escribe)
+        env = dict(os.environ, GICES_RESPONSE_CACHE_BYPASS="1")
+        force = force or {"RAGA.compute"}
+    max_workers = 1 if "--serial" in args else None
+    t0 = time.perf_counter()
+    steps = run_dag(STAGES, lambda stage: run_step(stage["name"], stage["cmd"], env), STATE_FILE,
+                    force=force, max_workers=max_workers)
+    wall = time.perf_counter() - t0
+    run = {"utc": datetime.utcnow().isoformat()+"Z", "wall_sec": round(wall, 4), "steps": steps}
+
+    # Sketch incremental (si no existe, se construye una vez desde el histórico previo)
+    sketch = SLOSketch.load(SKETCH_FILE) or rebuild_from_history(HISTORY)
+    sketch.add_run(run)
+    sketch.save(SKETCH_FILE)
+
+    # Histórico solo-anexado: una línea por ejecución, sin releer ni reescribir
+    with open(HISTORY, "a", encoding="utf-8") as f:
+        f.write(json.dumps(run) + "\n")
+
+    agg = sketch.aggregate()
+    cache = {s["name"]: s["report"]["deliberation"] for s in steps if "deliberation" in s.get("report", {})}
+    SLO_FILE.write_text(json.dumps({"utc": run["utc"], "wall_sec": run["wall_sec"], "agg": agg, "last_run": steps,
+                                    "llm_cache": cache}, indent=2, ensure_ascii=False))
+    for s in steps:
+        print(f"  {s['status']:<8} {s['duration_sec']:>8.2f}s  {s['name']}{'' if s['ok'] else '  ❌'}")
     print("SLO report →", SLO_FILE)
 
 if __name__ == "__main__":
@@ -1,35 +1,49 @@
 import json
 import sys
+import numpy as np
 from pathlib import Path
 
 # Importar el cerebro
 sys.path.append(str(Path(__file__).parent.parent))
-from modules.gices_brain import retrieve_context, deliberative_analysis
+from modules.gices_brain import retrieve_context_many, deliberative_analysis_many, get_knowledge_base, deliberation_report
+from modules.columnar_store import read_partition, partition_dir, SCHEMA_FILE
 
 DATA_DIR = Path("data/normalized")
+PERIOD = "2024-01"
 RAGA_DIR = Path("raga")
-INDEX_FILE = Path("rag/index.json")
+# Contadores de la ejecución (caché de respuestas, llamadas al LLM); pipeline_run los recoge
+RUN_REPORT = RAGA_DIR / "run_report.json"
 
 def load_json(path):
     if path.exists():
         return json.loads(path.read_text(encoding="utf-8"))
     return []
 
-def main():
+def main(argv=None):
+    # --no-cache: ignora la caché de respuestas del LLM (equivale a GICES_RESPONSE_CACHE_BYPASS=1)
+    use_cache = "--no-cache" not in (sys.argv[1:] if argv is None else argv)
+    # Los contadores de deliberación son del proceso: en la App persisten entre ejecuciones
+    stats_start = deliberation_report()
     print("⚙️ Iniciando Cálculo RAGA...")
     RAGA_DIR.mkdir(exist_ok=True)
     
     # 1. Cargar Datos Normalizados
     # Primero ejecutamos mcp_ingest (paso previo en el pipeline), aquí leemos el resultado
-    energy_data = load_json(DATA_DIR / "energy_2024-01.json")
+    # Energía: solo la columna kwh de la capa columnar (misma partición que energy_<periodo>.json);
+    # sin ella, el normalizado JSON
+    energy_dir = partition_dir("energy", PERIOD)
+    if (energy_dir / SCHEMA_FILE).exists():
+        energy_kwh = read_partition(energy_dir, ["kwh"])["kwh"]
+    else:
+        energy_kwh = np.array([r["kwh"] for r in load_json(DATA_DIR / f"energy_{PERIOD}.json")], dtype=np.float64)
     biodiv_data = load_json(DATA_DIR / "biodiversity_2024.json") # El dato nuevo
     
     kpis = {}
     explanations = {}
 
     # --- A. Lógica Determinista (Energía) ---
-    if energy_data:
-        total_co2 = sum(r["kwh"] * 0.23 for r in energy_data) / 1000
+    if len(energy_kwh):
+        total_co2 = float((energy_kwh * 0.23).sum()) / 1000
         kpis["E1-1.co2e"] = total_co2
         explanations["E1-1"] = {"narrative": "Cálculo aritmético directo (kWh * Factor)."}
 
@@ -38,34 +52,49 @@ def main():
         print("🦋 Dato de Biodiversidad detectado. Activando Validación Académica...")
         
         # Cargar Conocimiento (Fase 0)
-        knowledge_base = load_json(INDEX_FILE)
+        knowledge_base = get_knowledge_base()
         if not knowledge_base:
             print("⚠️ Advertencia: No hay base de conocimiento. Ejecuta ingest_knowledge.py primero.")
             knowledge_base = []
 
+        # 1. Recuperar Evidencia (RAGA): todas las consultas en una sola pasada por el corpus
+        queries = [
+            f"nature credits restoration integrity {record.get('project_type', '')} {record.get('financial_risk_exposure', '')}"
+            for record in biodiv_data
+        ]
+        contexts = retrieve_context_many(queries, knowledge_base)
+
+        # 2. Deliberar (AI): en paralelo, con resultados en el orden de los registros
+        analyses = deliberative_analysis_many(list(zip(biodiv_data, contexts)), use_cache=use_cache)
+
         # Procesar cada registro de biodiversidad
-        for i, record in enumerate(biodiv_data):
+        for i, (record, context, analysis) in enumerate(zip(biodiv_data, contexts, analyses)):
             kpi_id = f"E4-5.project_{i+1}"
             kpis[kpi_id] = record["ecosystem_area_ha"]
             
-            # 1. Recuperar Evidencia (RAGA)
-            query = f"nature credits restoration integrity {record.get('project_type', '')} {record.get('financial_risk_exposure', '')}"
-            context = retrieve_context(query, knowledge_base)
-            
-            # 2. Deliberar (AI)
-            analysis = deliberative_analysis(record, [c["content"] for c in context])
-            
             # 3. Guardar Explicación Estructurada
             explanations[kpi_id] = {
                 "type": "deliberative_validation",
                 "narrative": analysis.get("narrative"),
                 "compliance": analysis.get("compliance_check"),
-                "evidence_used": [c["source"] for c in context]
+                "evidence_used": [c["source"] for c in context],
+                "token_usage": analysis.get("token_usage")
             }
 
     # Guardar Resultados
     (RAGA_DIR / "kpis.json").write_text(json.dumps(kpis, indent=2, ensure_ascii=False))
     (RAGA_DIR / "explain.json").write_text(json.dumps(explanations, indent=2, ensure_ascii=False))
+    report = {"deliberation": deliberation_report(since=stats_start)}
+    # Con dictámenes de error (sin API key, fallos de la llamada) el resultado no es reutilizable:
+    # pipeline_run no guarda la huella de la etapa y la repite en la siguiente ejecución
+    report["cacheable"] = report["deliberation"]["errors"] == 0
+    RUN_REPORT.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    d = report["deliberation"]
+    print(f"💾 Caché de respuestas: {d['cache_hits']} aciertos / {d['cache_misses']} fallos "
+          f"(hit rate {d['hit_rate']:.0%}), {d['llm_calls']} llamadas al LLM, "
+          f"{d['prompt_tokens']} + {d['completion_tokens']} tokens")
+    if d["errors"]:
+        print(f"⚠️ {d['errors']} dictámenes con error: la etapa no se marcará como al día")
     
     print("✅ RAGA Compute Finalizado.")
 
@@ -1,9 +1,14 @@
+import sys
 import json
 from pathlib import Path
 from datetime import datetime
 from rdflib import Graph, Namespace, Literal, RDF, XSD, URIRef
 from pyshacl import validate
 
+sys.path.append(str(Path(__file__).parent.parent))
+from modules.resource_cache import cached_resource
+from modules.columnar_store import read_partition, partition_dir, iter_rows, SCHEMA_FILE
+
 ROOT = Path(".")
 ONTOLOGY_FILE = ROOT / "ontology" / "esrs.owl"
 SHACL_E1 = ROOT / "contracts" / "shacl_e1.ttl"
@@ -12,11 +17,20 @@ SHACL_G1 = ROOT / "contracts" / "shacl_g1.ttl"
 OUT_VALIDATION = ROOT / "ontology" / "validation.log"
 OUT_LINEAGE    = ROOT / "ontology" / "linaje.ttl"
 
+PERIOD = "2024-01"
+
 EX = Namespace("http://example.com/esrs#")
 
 def _load_json(path: Path):
     return json.loads(path.read_text(encoding="utf-8"))
 
+def _load_records(domain: str, data_path: Path, columns: list[str]):
+    # Capa columnar de mcp_ingest: solo se leen las columnas que se materializan en el grafo
+    part = partition_dir(domain, PERIOD)
+    if (part / SCHEMA_FILE).exists():
+        return iter_rows(read_partition(part, columns), columns)
+    return _load_json(data_path)
+
 def _add_evidence(g: Graph, subj: URIRef, ev_path: str):
     ev = URIRef(str(subj) + "/evidence/1")
     g.add((subj, EX.hasEvidence, ev))
@@ -24,7 +38,7 @@ def _add_evidence(g: Graph, subj: URIRef, ev_path: str):
     g.add((ev, EX.evidencePath, Literal(ev_path, datatype=XSD.string)))
 
 def materialize_e1(g: Graph, data_path: Path):
-    records = _load_json(data_path)
+    records = _load_records("energy", data_path, ["company_id", "period_start", "period_end", "kwh", "emission_factor_co2e"])
     for i, r in enumerate(records, start=1):
         subj = URIRef(f"http://example.com/esrs#E1Record/{i}")
         g.add((subj, RDF.type, EX.E1Record))
@@ -36,7 +50,7 @@ def materialize_e1(g: Graph, data_path: Path):
         _add_evidence(g, subj, ev_path=f"data/normalized/{data_path.name}")
 
 def materialize_s1(g: Graph, data_path: Path):
-    records = _load_json(data_path)
+    records = _load_records("hr", data_path, ["company_id", "period", "employees_start", "employees_end", "exits"])
     for i, r in enumerate(records, start=1):
         subj = URIRef(f"http://example.com/esrs#S1Record/{i}")
         g.add((subj, RDF.type, EX.S1Record))
@@ -51,7 +65,7 @@ def materialize_s1(g: Graph, data_path: Path):
         _add_evidence(g, subj, ev_path=f"data/normalized/{data_path.name}")
 
 def materialize_g1(g: Graph, data_path: Path):
-    records = _load_json(data_path)
+    records = _load_records("ethics", data_path, ["company_id", "period", "cases_opened", "cases_closed", "closed_with_resolution"])
     for i, r in enumerate(records, start=1):
         subj = URIRef(f"http://example.com/esrs#G1Record/{i}")
         g.add((subj, RDF.type, EX.G1Record))
@@ -65,8 +79,16 @@ def materialize_g1(g: Graph, data_path: Path):
             if k in r: g.add((subj, prop, Literal(r[k], datatype=dtype)))
         _add_evidence(g, subj, ev_path=f"data/normalized/{data_path.name}")
 
+def _parse_turtle(path: Path) -> Graph:
+    g = Graph(); g.parse(path, format="turtle")
+    return g
+
+def load_shapes(shape_path: Path) -> Graph:
+    # Shapes parseadas una vez por proceso; se invalidan si cambia el .ttl
+    return cached_resource(f"shacl:{shape_path}", [shape_path], lambda: _parse_turtle(shape_path))
+
 def run_shacl(data_graph: Graph, shape_path: Path, title: str) -> tuple[bool, str]:
-    sh = Graph(); sh.parse(shape_path, format="turtle")
+    sh = load_shapes(shape_path)
     conforms, _, results_text = validate(
         data_graph=data_graph, shacl_graph=sh,
         inference="rdfs", abort_on_first=False,
@@ -80,7 +102,8 @@ def main():
 
     g = Graph()
     if ONTOLOGY_FILE.exists():
-        g.parse(ONTOLOGY_FILE, format="turtle")
+        # La ontología cacheada no se toca: se copian sus tripletas al grafo de datos
+        g += cached_resource("ontology", [ONTOLOGY_FILE], lambda: _parse_turtle(ONTOLOGY_FILE))
 
     e1 = ROOT / "data" / "normalized" / "energy_2024-01.json"
     s1 = ROOT / "data" / "normalized" / "hr_2024-01.json"
@@ -1,12 +1,15 @@
-import hashlib, json
+import sys, hashlib, json
 from pathlib import Path
 
+sys.path.append(str(Path(__file__).parent.parent))
+from modules.file_hashing import sha256_file as _sha256_file_cached
+
 def sha256_bytes(data: bytes) -> str:
     return hashlib.sha256(data).hexdigest()
 
 def sha256_file(path: str | Path) -> str:
-    p = Path(path)
-    return sha256_bytes(p.read_bytes())
+    # En streaming y con caché por (ruta, tamaño, mtime_ns, inodo)
+    return _sha256_file_cached(path)
 
 def sha256_json(obj) -> str:
     # canonical JSON for stable hash
@@ -0,0 +1,8 @@
+import sys
+from pathlib import Path
+
+# Los módulos se importan como en los scripts: modules.* desde la raíz y utils_hash desde scripts/
+ROOT = Path(__file__).resolve().parent.parent
+for path in (ROOT, ROOT / "scripts"):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
@@ -0,0 +1,101 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from modules import ann_index
+from modules.ann_index import IVFIndex, IVF_FILE, update_ivf
+from modules.vector_store import normalize_rows
+
+
+def _corpus(n=3000, dim=32, clusters=40, seed=0):
+    """Vectores normalizados agrupados alrededor de `clusters` centros (como los embeddings reales)."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    vectors = centers[rng.integers(clusters, size=n)] + 0.35 * rng.normal(size=(n, dim))
+    return normalize_rows(vectors)
+
+
+def _queries(vectors, n=50, seed=1):
+    rng = np.random.default_rng(seed)
+    picked = vectors[rng.choice(len(vectors), size=n, replace=False)]
+    return normalize_rows(picked + 0.1 * rng.normal(size=picked.shape))
+
+
+def _exact(vectors, q, k):
+    return set(np.argsort(-(vectors @ q))[:k].tolist())
+
+
+def _ann(index, vectors, q, k, nprobe):
+    rows = index.candidates(q.reshape(1, -1), nprobe)[0]
+    scores = vectors[rows] @ q
+    return set(rows[np.argsort(-scores)[:k]].tolist())
+
+
+def _recall(index, vectors, queries, k, nprobe):
+    hits = sum(len(_ann(index, vectors, q, k, nprobe) & _exact(vectors, q, k)) for q in queries)
+    return hits / (k * len(queries))
+
+
+def test_recall_against_brute_force():
+    vectors = _corpus()
+    queries = _queries(vectors)
+    index = IVFIndex.build(vectors, nlist=32)
+    assert index.nlist == 32 and len(index) == len(vectors)
+    # cada fila está en exactamente una lista
+    assert sorted(index.order.tolist()) == list(range(len(vectors)))
+
+    recalls = [_recall(index, vectors, queries, 10, nprobe) for nprobe in (1, 4, 8, 32)]
+    assert recalls == sorted(recalls)
+    assert recalls[2] >= 0.9
+    assert recalls[3] == 1.0   # nprobe = nlist equivale a la búsqueda exacta
+
+
+def test_save_and_load_round_trip(tmp_path):
+    vectors = _corpus(n=500)
+    index = IVFIndex.build(vectors, nlist=16, generation="g1")
+    index.extend(_corpus(n=20, seed=5))
+    index.save(tmp_path)
+    assert [p.name for p in tmp_path.iterdir()] == [IVF_FILE]
+
+    loaded = IVFIndex.load(tmp_path)
+    assert np.array_equal(loaded.centroids, index.centroids)
+    assert np.array_equal(loaded.assignments, index.assignments)
+    assert (loaded.generation, loaded.trained_count, len(loaded)) == ("g1", 500, 520)
+    q = _queries(vectors, n=5)
+    for a, b in zip(loaded.candidates(q, 4), index.candidates(q, 4)):
+        assert np.array_equal(a, b)
+
+    IVFIndex.build(vectors, nlist=8).save(tmp_path)
+    assert IVFIndex.load(tmp_path).generation is None
+    assert IVFIndex.load(tmp_path / "nada") is None
+
+
+def test_fewer_vectors_than_lists():
+    vectors = _corpus(n=5)
+    index = IVFIndex.build(vectors, nlist=64)
+    assert index.nlist == 5
+    q = _queries(vectors, n=3)
+    for rows in index.candidates(q, nprobe=ann_index.ANN_NPROBE):
+        assert sorted(rows.tolist()) == list(range(5))
+    assert _recall(index, vectors, q, 3, 64) == 1.0
+
+
+def test_small_stores_use_exact_search(tmp_path, monkeypatch):
+    monkeypatch.setattr(ann_index, "ANN_MIN_ROWS", 100)
+    vectors = _corpus(n=50)
+    IVFIndex.build(vectors, nlist=8).save(tmp_path)
+    store = SimpleNamespace(root=tmp_path, count=len(vectors), vectors=vectors, meta={})
+    assert update_ivf(store) is None
+    assert not (tmp_path / IVF_FILE).exists()
+
+
+def test_update_extends_without_retraining(tmp_path, monkeypatch):
+    monkeypatch.setattr(ann_index, "ANN_MIN_ROWS", 100)
+    vectors = _corpus(n=400)
+    # como VectorStore.vectors, la vista llega hasta count
+    store = SimpleNamespace(root=tmp_path, count=300, vectors=vectors[:300], meta={"generation": "g"})
+    first = update_ivf(store, nlist=8)
+    store.count, store.vectors = 400, vectors
+    second = update_ivf(store, nlist=8)
+    assert np.array_equal(first.centroids, second.centroids)
+    assert len(second) == 400 and second.trained_count == 300
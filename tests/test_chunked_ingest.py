@@ -0,0 +1,89 @@
+import json
+import math
+
+import pytest
+
+from modules.chunked_ingest import iter_chunks, JsonArrayWriter, _coerce
+from modules.dq_engine import DQAccumulator, evaluate, compile_rules, to_frame
+
+SCHEMA = {"properties": {"kwh": {"type": "number"}, "n": {"type": "integer"},
+                         "ok": {"type": "boolean"}, "site": {"type": "string"}}}
+
+
+def test_coerce_keeps_declared_types_and_rejects_non_finite():
+    assert _coerce("12300", "number") == 12300 and isinstance(_coerce("12300", "number"), int)
+    assert _coerce("12.5", "number") == 12.5
+    assert isinstance(_coerce("1e3", "number"), float)
+    assert _coerce("7", "integer") == 7
+    assert _coerce("TRUE", "boolean") is True
+    assert _coerce("x", "integer") == "x"
+    for text in ("nan", "NaN", "inf", "-Infinity"):
+        assert _coerce(text, "number") == text
+
+
+def test_csv_and_ndjson_chunks(tmp_path):
+    csv = tmp_path / "energy.csv"
+    csv.write_text("kwh,n,ok,site\n10,1,true,A\n,2,false,B\nnan,3,true,C\n", encoding="utf-8")
+    chunks = list(iter_chunks(csv, SCHEMA, chunk_rows=2))
+    assert [len(c) for c in chunks] == [2, 1]
+    assert chunks[0] == [{"kwh": 10, "n": 1, "ok": True, "site": "A"}, {"n": 2, "ok": False, "site": "B"}]
+    assert chunks[1][0]["kwh"] == "nan"
+
+    nd = tmp_path / "energy.jsonl"
+    nd.write_text("\n".join(json.dumps({"i": i}) for i in range(5)) + "\n\n", encoding="utf-8")
+    assert [[r["i"] for r in c] for c in iter_chunks(nd, chunk_rows=2)] == [[0, 1], [2, 3], [4]]
+
+
+def test_bad_ndjson_reports_path_and_line(tmp_path):
+    nd = tmp_path / "bad.ndjson"
+    nd.write_text('{"a": 1}\n\n{"a": 2\n', encoding="utf-8")
+    with pytest.raises(ValueError, match=r"bad\.ndjson:3: JSON no válido"):
+        list(iter_chunks(nd))
+    nd.write_text('{"a": 1}\n{"a": NaN}\n', encoding="utf-8")
+    with pytest.raises(ValueError, match=r"bad\.ndjson:2: NaN"):
+        list(iter_chunks(nd))
+    js = tmp_path / "bad.json"
+    js.write_text('[\n  {"a": 1},\n  {"a": }\n]', encoding="utf-8")
+    with pytest.raises(ValueError, match=r"bad\.json:3: JSON no válido"):
+        list(iter_chunks(js))
+
+
+def test_json_array_writer_round_trip(tmp_path):
+    out = tmp_path / "out" / "normalized.json"
+    with JsonArrayWriter(out) as w:
+        w.write([{"a": 1, "s": "ñ"}])
+        w.write([])
+        w.write([{"a": 2.5}])
+    assert json.loads(out.read_text(encoding="utf-8")) == [{"a": 1, "s": "ñ"}, {"a": 2.5}]
+    with JsonArrayWriter(tmp_path / "empty.json") as w:
+        pass
+    assert json.loads((tmp_path / "empty.json").read_text()) == []
+
+
+def test_json_array_writer_refuses_non_finite_and_keeps_previous_file(tmp_path):
+    out = tmp_path / "normalized.json"
+    out.write_text("[]\n")
+    with pytest.raises(ValueError):
+        with JsonArrayWriter(out) as w:
+            w.write([{"kwh": math.nan}])
+    assert out.read_text() == "[]\n"
+    assert not (tmp_path / "normalized.json.tmp").exists()
+
+
+RULES = {"completeness": [{"field": "kwh", "rule": "not_null"}],
+         "validity": [{"field": "kwh", "rule": ">=0"}, {"field": "period_end", "rule": "is_date"}],
+         "consistency": [{"rule": "period_start <= period_end"}],
+         "timeliness": [{"field": "period_end", "rule": "within_month('2024-01')"}]}
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 3, 7, 1000])
+def test_accumulator_matches_a_single_evaluation(chunk_rows, monkeypatch):
+    import modules.dq_engine as dq_engine
+    monkeypatch.setattr(dq_engine, "MAX_FAILING_REPORTED", 5)
+    values = [None, -1, 0, 3.5, "x", "2024-01-31", "2024-02-01", "bad"]
+    records = [{"kwh": values[i % 5], "period_start": "2024-01-01", "period_end": values[5 + i % 3]}
+               for i in range(40)]
+    acc = DQAccumulator(RULES)
+    for start in range(0, len(records), chunk_rows):
+        acc.add(records[start:start + chunk_rows])
+    assert acc.result() == evaluate(to_frame(records), compile_rules(RULES))
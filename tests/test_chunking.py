@@ -0,0 +1,80 @@
+import random
+
+import pytest
+
+from modules.chunking import chunk_text, iter_chunks, split_sentences, ARTICLE_START
+from modules.embedding_pipeline import count_tokens
+
+WORDS = ("la", "empresa", "reporta", "emisiones", "de", "alcance", "3", "según", "ESRS", "E1",
+         "biodiversidad", "consumo", "energético", "kWh", "2024", "materialidad", "doble")
+
+
+def _document(seed):
+    rng = random.Random(seed)
+    parts = []
+    for a in range(rng.randint(1, 4)):
+        parts.append(f"Artículo {a + 1}")
+        for _ in range(rng.randint(1, 12)):
+            n = rng.choice([rng.randint(3, 20), rng.randint(3, 20), rng.randint(150, 400)])
+            parts.append(" ".join(rng.choice(WORDS) for _ in range(n)) + rng.choice(".;!?"))
+    return rng.choice([" ", "\n", "  \n"]).join(parts)
+
+
+@pytest.mark.parametrize("seed", range(15))
+def test_chunks_are_bounded_and_cover_the_text(seed):
+    text = _document(seed)
+    max_tokens, overlap = 120, 30
+    chunks = list(chunk_text(text, max_tokens, overlap))
+    covered = [False] * len(text)
+    for start, end, chunk in chunks:
+        assert text[start:end] == chunk and chunk == chunk.strip()
+        # el límite se cuenta por frases: el texto unido puede variar en algún token
+        assert count_tokens(chunk) <= max_tokens * 1.1
+        for i in range(start, end):
+            covered[i] = True
+    assert all(covered[i] or text[i].isspace() for i in range(len(text)))
+    starts = [s for s, _, _ in chunks]
+    assert starts == sorted(starts)
+
+
+@pytest.mark.parametrize("seed", range(15))
+def test_articles_start_a_new_chunk_without_overlap(seed):
+    text = _document(seed)
+    chunks = list(chunk_text(text, 120, 30))
+    for m in ARTICLE_START.finditer(text):
+        # ningún fragmento cruza el inicio de un artículo, y uno empieza justo ahí
+        assert not any(s < m.start() < e for s, e, _ in chunks)
+        assert any(s == m.start() for s, _, _ in chunks)
+
+
+def test_consecutive_chunks_overlap_inside_an_article():
+    text = " ".join(f"Frase número {i} del texto." for i in range(60))
+    chunks = list(chunk_text(text, 40, 12))
+    assert len(chunks) > 2
+    for (_, prev_end, _), (start, _, _) in zip(chunks, chunks[1:]):
+        assert start < prev_end
+
+
+def test_long_sentence_is_split_by_words():
+    text = " ".join(["palabra"] * 500)
+    chunks = list(chunk_text(text, 50, 10))
+    assert len(chunks) > 1
+    assert all(count_tokens(c) <= 50 for _, _, c in chunks)
+    assert chunks[0][0] == 0 and chunks[-1][1] == len(text)
+
+
+def test_split_sentences_offsets():
+    text = "  Uno. Dos!\nArtículo 2 Tres  "
+    spans = split_sentences(text)
+    assert [text[s:e] for s, e, _ in spans] == ["Uno.", "Dos!", "Artículo 2 Tres"]
+    assert [a for _, _, a in spans] == [False, False, True]
+
+
+def test_iter_chunks_keeps_page_provenance():
+    pages = iter([{"source": "a.pdf", "page": 1, "content": "Hola. Adiós."},
+                  {"source": "a.pdf", "page": 2, "content": ""},
+                  {"source": "b.pdf", "page": 7, "content": "Otra página."}])
+    out = list(iter_chunks(pages, 300, 50))
+    assert [(c["source"], c["page"], c["content"]) for c in out] == \
+        [("a.pdf", 1, "Hola. Adiós."), ("b.pdf", 7, "Otra página.")]
+    assert out[1]["char_start"] == 0 and out[1]["char_end"] == len("Otra página.")
@@ -0,0 +1,146 @@
+import json
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pytest
+import yaml
+
+from modules import columnar_store
+from modules.columnar_store import (ColumnarWriter, read_partition, iter_rows, partitions, partition_dir,
+                                    SCHEMA_FILE, NO_ENTITY)
+
+ROOT = Path(__file__).resolve().parent.parent
+SCHEMA = {
+    "properties": {
+        "site": {"type": "string"}, "kwh": {"type": "number"}, "factor": {"type": "number"},
+        "n": {"type": "integer"}, "big": {"type": "integer"}, "ok": {"type": "boolean"},
+        "tags": {"type": "array"},
+    },
+    "required": ["site", "kwh"],
+}
+COLUMNS = ["site", "kwh", "factor", "n", "big", "ok"]
+
+
+def _records(n):
+    out = []
+    for i in range(n):
+        rec = {"site": f"planta-{i % 3}-ñ", "kwh": 12300 + i, "n": i, "tags": ["x"]}
+        if i % 2:
+            rec["factor"] = 0.25 if i == 5 else i   # enteros y, desde la fila 5, un float
+            rec["ok"] = i % 4 == 1
+        if i % 3 == 0:
+            rec["big"] = 2 ** 63 + i if i == 9 else -i
+        out.append(rec)
+    return out
+
+
+def _write(path, records, chunk, meta=None):
+    with ColumnarWriter(path, SCHEMA, meta) as w:
+        for start in range(0, len(records), chunk):
+            w.write(records[start:start + chunk])
+    return w
+
+
+@pytest.mark.parametrize("chunk", [1, 4, 100])
+def test_round_trip_keeps_json_types(tmp_path, chunk, monkeypatch):
+    monkeypatch.setattr(columnar_store, "WIDEN_BLOCK", 3)
+    records = _records(12)
+    _write(tmp_path / "p", records, chunk)
+    table = read_partition(tmp_path / "p")
+    rows = list(iter_rows(table, COLUMNS))
+    expected = [{k: v for k, v in r.items() if k in COLUMNS} for r in records]
+    # mismas filas y mismo JSON: 12300 sigue siendo 12300, no 12300.0
+    assert [json.dumps(r, sort_keys=True) for r in rows] == \
+        [json.dumps({k: float(v) if k in ("factor", "big") else v for k, v in r.items()}, sort_keys=True)
+         for r in expected]
+
+    sidecar = json.loads((tmp_path / "p" / SCHEMA_FILE).read_text())
+    dtypes = {name: col["dtype"] for name, col in sidecar["columns"].items()}
+    assert dtypes == {"site": "int32", "kwh": "int64", "factor": "float64", "n": "int64",
+                      "big": "float64", "ok": "bool"}
+    assert sidecar["skipped"] == ["tags"] and sidecar["rows"] == 12
+    assert table["kwh"].dtype == np.int64 and "kwh.mask" not in table
+    assert table["factor.mask"].tolist() == [bool(i % 2) for i in range(12)]
+
+
+def test_integer_only_columns_stay_int(tmp_path):
+    records = [{"site": "a", "kwh": 12300}, {"site": "b", "kwh": 0, "n": 7}]
+    _write(tmp_path / "p", records, 1)
+    rows = list(iter_rows(read_partition(tmp_path / "p", ["kwh", "n"]), ["kwh", "n"]))
+    assert rows == [{"kwh": 12300}, {"kwh": 0, "n": 7}]
+    assert all(type(r["kwh"]) is int for r in rows)
+
+
+def test_empty_partition_and_errors(tmp_path):
+    _write(tmp_path / "empty", [], 10)
+    table = read_partition(tmp_path / "empty", ["kwh", "site", "ok"])
+    assert len(table["kwh"]) == 0 and table["kwh"].dtype == np.int64 and len(table["ok.mask"]) == 0
+    assert list(iter_rows(table, ["kwh"])) == []
+    with pytest.raises(KeyError):
+        read_partition(tmp_path / "empty", ["nope"])
+    sidecar = tmp_path / "empty" / SCHEMA_FILE
+    sidecar.write_text(json.dumps(dict(json.loads(sidecar.read_text()), format="otro/9")))
+    with pytest.raises(ValueError, match="no soportado"):
+        read_partition(tmp_path / "empty")
+
+
+def test_failed_write_keeps_previous_partition(tmp_path):
+    _write(tmp_path / "p", [{"site": "a", "kwh": 1}], 10)
+    with pytest.raises(RuntimeError):
+        with ColumnarWriter(tmp_path / "p", SCHEMA) as w:
+            w.write([{"site": "b", "kwh": 2}])
+            raise RuntimeError("corte")
+    assert read_partition(tmp_path / "p", ["kwh"])["kwh"].tolist() == [1]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["p"]
+
+
+def test_entity_partitions_are_siblings_of_the_default_one(tmp_path):
+    root = tmp_path / "columnar"
+    default = partition_dir("energy", "2024-01", root=root)
+    acme = partition_dir("energy", "2024-01", "ACME", root=root)
+    beta = partition_dir("energy", "2024-01", "BETA", root=root)
+    assert default.parent == acme.parent == beta.parent and default.name == f"entity={NO_ENTITY}"
+
+    # por defecto, manifiesto, por defecto otra vez: ninguna escritura borra a las otras
+    _write(default, [{"site": "d", "kwh": 1}], 10)
+    _write(acme, [{"site": "a", "kwh": 2}], 10)
+    _write(beta, [{"site": "b", "kwh": 3}], 10)
+    _write(default, [{"site": "d", "kwh": 4}], 10)
+
+    found = partitions("energy", root=root)
+    assert found == sorted([default, acme, beta])
+    assert partitions("energy", "2024-01", "ACME", root=root) == [acme]
+    assert partitions("energy", "2024-01", NO_ENTITY, root=root) == [default]
+    assert partitions("energy", "2024-02", root=root) == []
+    assert sorted(int(read_partition(p, ["kwh"])["kwh"][0]) for p in found) == [2, 3, 4]
+
+
+def _ingest(workdir, monkeypatch, argv):
+    import mcp_ingest
+    monkeypatch.chdir(workdir)
+    mcp_ingest.main(argv + ["--workers", "1", "--validate-workers", "0"])
+
+
+def test_default_and_manifest_ingests_coexist(tmp_path, monkeypatch):
+    shutil.copytree(ROOT / "contracts", tmp_path / "contracts")
+    shutil.copytree(ROOT / "data" / "samples", tmp_path / "data" / "samples")
+    (tmp_path / "manifest.yaml").write_text(yaml.safe_dump({
+        "normalized": "data/normalized/{entity}/{domain}_{period}.json",
+        "partitions": [{"domain": "energy", "entity": e, "period": "2024-01",
+                        "input": "data/samples/energy_2024-01.json"} for e in ("ACME", "BETA")],
+    }))
+    _ingest(tmp_path, monkeypatch, [])
+    _ingest(tmp_path, monkeypatch, ["--manifest", "manifest.yaml"])
+    _ingest(tmp_path, monkeypatch, [])
+
+    root = tmp_path / "data" / "columnar"
+    energy = partitions("energy", root=root)
+    assert [p.name for p in energy] == ["entity=ACME", "entity=BETA", f"entity={NO_ENTITY}"]
+    source = json.loads((tmp_path / "data" / "samples" / "energy_2024-01.json").read_text())
+    normalized = json.loads((tmp_path / "data" / "normalized" / "energy_2024-01.json").read_text())
+    for part in energy:
+        table = read_partition(part, ["kwh"])
+        assert table["kwh"].tolist() == [r["kwh"] for r in normalized]
+        assert [type(v) for v in table["kwh"].tolist()] == [type(r["kwh"]) for r in normalized]
+    assert len(normalized) <= len(source)
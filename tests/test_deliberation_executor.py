@@ -0,0 +1,127 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from modules import deliberation_executor
+from modules.deliberation_executor import DeliberationExecutor, TokenRateLimiter
+
+
+class FakeClock:
+    """Reloj de prueba: sleep() avanza el tiempo al instante, sin esperar."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+        self.lock = threading.Lock()
+
+    def monotonic(self):
+        with self.lock:
+            return self.now
+
+    def sleep(self, seconds):
+        with self.lock:
+            self.sleeps.append(seconds)
+            self.now += seconds
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(deliberation_executor, "time", SimpleNamespace(monotonic=clock.monotonic, sleep=clock.sleep))
+    # jitter fijo: el factor (0.5 + random()) vale 1
+    monkeypatch.setattr(deliberation_executor.random, "random", lambda: 0.5)
+    return clock
+
+
+def _executor(**kwargs):
+    return DeliberationExecutor(**dict({"max_workers": 1, "tokens_per_minute": 0, "max_retries": 3,
+                                        "timeout_sec": 60, "base_delay": 1.0}, **kwargs))
+
+
+def test_transient_errors_are_retried_with_backoff(clock):
+    attempts = []
+
+    def flaky(item, timeout):
+        attempts.append(timeout)
+        if len(attempts) < 3:
+            raise RateLimited("429")
+        return item * 2
+
+    executor = _executor()
+    assert executor.map(flaky, [21]) == [42]
+    assert executor.stats == {"calls": 3, "retries": 2, "errors": 0, "timeouts": 0}
+    assert clock.sleeps == [1.0, 2.0]
+    # el timeout que recibe cada intento es lo que queda del plazo del registro
+    assert attempts == [60, 59, 57]
+
+
+def test_retries_are_bounded_and_other_errors_are_not_retried(clock):
+    def always_429(item, timeout):
+        raise RateLimited("429")
+
+    def broken(item, timeout):
+        raise ValueError("respuesta corrupta")
+
+    executor = _executor(max_retries=2)
+    assert executor.map(always_429, [1], on_error=lambda i, e: "fallo") == ["fallo"]
+    assert executor.stats["calls"] == 3 and executor.stats["retries"] == 2 and executor.stats["errors"] == 1
+
+    executor = _executor()
+    assert executor.map(broken, [1], on_error=lambda i, e: type(e).__name__) == ["ValueError"]
+    assert executor.stats["calls"] == 1 and executor.stats["retries"] == 0
+    with pytest.raises(ValueError):
+        _executor().map(broken, [1])
+
+
+def test_timeout_marks_only_that_record(clock):
+    def call(item, timeout):
+        if item == 1:
+            clock.sleep(timeout)   # se cuelga hasta que el cliente corta la llamada
+            raise TimeoutError("colgado")
+        return item * 10
+
+    executor = _executor(timeout_sec=30)
+    results = executor.map(call, [0, 1, 2, 3], on_error=lambda i, e: f"timeout:{i}")
+    assert results == [0, "timeout:1", 20, 30]
+    assert executor.stats == {"calls": 4, "retries": 0, "errors": 0, "timeouts": 1}
+
+
+def test_rate_limiter_keeps_within_the_budget(clock):
+    limiter = TokenRateLimiter(600)   # 10 tokens/s, cubo de 600
+    granted = []
+
+    def worker():
+        for _ in range(5):
+            limiter.acquire(100)
+            granted.append(clock.monotonic())
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    granted.sort()
+    # 2000 tokens: 600 de golpe y el resto a 10 tokens/s
+    assert len(granted) == 20 and clock.now >= (2000 - 600) / 10
+    for n, t in enumerate(granted, start=1):
+        assert n * 100 <= 600 + 10 * t + 1e-9
+
+
+def test_executor_throttles_by_token_cost(clock):
+    started = []
+
+    def call(item, timeout):
+        started.append(clock.monotonic())
+        return item
+
+    executor = _executor(tokens_per_minute=6000)   # 100 tokens/s
+    assert executor.map(call, list(range(10)), token_cost=lambda item: 1000) == list(range(10))
+    assert started[:6] == [0.0] * 6
+    assert started[-1] == pytest.approx((10_000 - 6000) / 100)
+    for n, t in enumerate(started, start=1):
+        assert n * 1000 <= 6000 + 100 * t + 1e-6
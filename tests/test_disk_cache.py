@@ -0,0 +1,104 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from modules import disk_cache
+from modules.disk_cache import DiskCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """time.time() de prueba: solo avanza cuando el test lo pide."""
+    now = SimpleNamespace(value=1_000_000.0)
+    monkeypatch.setattr(disk_cache, "time", SimpleNamespace(time=lambda: now.value))
+    return now
+
+
+def test_entries_expire_after_ttl(tmp_path, clock):
+    cache = DiskCache(tmp_path / "c.sqlite", ttl_sec=60)
+    cache.put("a", b"1")
+    clock.value += 30
+    cache.put("b", b"2")
+    clock.value += 31   # "a" tiene 61 s, "b" 31 s
+    assert cache.get_many(["a", "b"]) == [None, b"2"]
+    assert cache.stats["hits"] == 1 and cache.stats["misses"] == 1
+
+    # Leer no renueva la caducidad: cuenta desde que se escribió
+    clock.value += 30
+    assert cache.get("b") is None
+    cache.put("b", b"3")
+    assert cache.get("b") == b"3"
+    cache.close()
+
+
+def test_no_ttl_never_expires(tmp_path, clock):
+    cache = DiskCache(tmp_path / "c.sqlite")
+    cache.put("a", b"1")
+    clock.value += 10 * 365 * 86400
+    assert cache.get("a") == b"1"
+    cache.close()
+
+
+def test_lru_eviction_order_under_the_size_cap(tmp_path, clock):
+    cache = DiskCache(tmp_path / "c.sqlite", max_bytes=1000)
+    for key in "abcd":
+        cache.put(key, bytes(200))
+        clock.value += 1
+    cache.get("a")   # "a" pasa a ser la más reciente: "b" es ahora la menos usada
+    clock.value += 1
+    cache.put("e", bytes(200))   # 1000 bytes: justo en el límite, sin desalojo
+    assert len(cache) == 5 and cache.stats["evictions"] == 0
+    clock.value += 1
+
+    cache.put("f", bytes(200))   # 1200 > 1000 -> se libera hasta el 90 % (900)
+    assert cache.stats["evictions"] == 2
+    assert cache.get_many(list("abcdef")) == [bytes(200), None, None, bytes(200), bytes(200), bytes(200)]
+    assert cache.size_bytes == 800 <= cache.max_bytes
+    cache.close()
+
+
+def test_replacing_a_key_does_not_double_count(tmp_path, clock):
+    cache = DiskCache(tmp_path / "c.sqlite", max_bytes=1000)
+    for _ in range(10):
+        cache.put("a", bytes(300))
+    assert cache.size_bytes == 300 and cache.stats["evictions"] == 0
+    cache.delete("a")
+    assert cache.size_bytes == 0 and len(cache) == 0
+    cache.close()
+
+
+def test_two_handles_share_the_same_file(tmp_path):
+    path = tmp_path / "shared.sqlite"
+    first, second = DiskCache(path), DiskCache(path)
+    assert first._db.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    first.put("a", b"de la primera")
+    assert second.get("a") == b"de la primera"
+    second.put("b", b"de la segunda")
+    assert first.get("b") == b"de la segunda"
+
+    # Escrituras concurrentes desde los dos handles: ninguna se pierde ni falla por bloqueo
+    errors = []
+
+    def write(cache, prefix):
+        try:
+            for i in range(50):
+                cache.put_many([(f"{prefix}{i}-{j}", b"x" * 10) for j in range(4)])
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(c, p)) for c, p in ((first, "p"), (second, "s"))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert len(first) == len(second) == 2 + 2 * 50 * 4
+    first.close()
+    second.close()
+
+    reopened = DiskCache(path)
+    assert reopened.get("s49-3") == b"x" * 10
+    assert reopened.size_bytes == len(b"de la primera") + len(b"de la segunda") + 4000
+    reopened.close()
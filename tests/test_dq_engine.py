@@ -0,0 +1,118 @@
+import re
+import random
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+import yaml
+
+from modules import dq_engine
+
+RULES = yaml.safe_load((Path(__file__).resolve().parent.parent / "contracts" / "dq_rules.yaml").read_text(encoding="utf-8"))
+
+
+# Referencia: la evaluación fila a fila que sustituyó dq_engine (antes mcp_ingest.apply_rule)
+def is_date_iso(s):
+    try:
+        datetime.strptime(s, "%Y-%m-%d")
+        return True
+    except Exception:
+        return False
+
+
+def apply_rule(row, rule):
+    name = rule.get("rule")
+    field = rule.get("field")
+    if name == "not_null":
+        return row.get(field) is not None
+    if name == "is_date":
+        return is_date_iso(str(row.get(field, "")))
+    if name == "is_yyyy_mm":
+        return bool(re.fullmatch(r"\d{4}-\d{2}", str(row.get(field, ""))))
+    if name == ">=0":
+        try:
+            val = row.get(field)
+            if val is None:
+                return False
+            return float(val) >= 0
+        except Exception:
+            return False
+    if name and name.startswith("within_month("):
+        m = re.search(r"within_month\('([^']+)'\)", name)
+        return str(row.get(field, "")).startswith(m.group(1) if m else "")
+    if name and name.startswith("equals("):
+        m = re.search(r"equals\('([^']+)'\)", name)
+        return str(row.get(field, "")) == (m.group(1) if m else "")
+    if name == "period_start <= period_end":
+        try:
+            ps = datetime.strptime(row.get("period_start"), "%Y-%m-%d")
+            pe = datetime.strptime(row.get("period_end"), "%Y-%m-%d")
+            return ps <= pe
+        except Exception:
+            return False
+    if name == "employees_end <= employees_start + 1000":
+        try:
+            return int(row.get("employees_end", 0)) <= int(row.get("employees_start", 0)) + 1000
+        except Exception:
+            return False
+    if name == "closed_with_resolution <= cases_closed":
+        try:
+            return int(row.get("closed_with_resolution", 0)) <= int(row.get("cases_closed", 0))
+        except Exception:
+            return False
+    return True
+
+
+VALUES = [None, 0, 1, -1, 5, 1000, 1500, 3000, 2.5, -0.5, 7.9, True, False,
+          "0", "7", "-3", "2.5", " 4", "1e3", "1_000", "٣", "abc", "", "None", "nan", "inf", "-inf",
+          "2024-01-15", "2024-01-31", "2024-02-01", "2023-12-31", "2024-13-01", "2024-1-5",
+          "2024-01", "2024-02", "2024-01-15T00:00"]
+
+
+def _fields(rules):
+    fields = {r["field"] for rs in rules.values() for r in rs if r.get("field")}
+    for rs in rules.values():
+        for r in rs:
+            m = dq_engine._COMPARISON.match(r.get("rule") or "")
+            if m:
+                fields.update((m.group(1), m.group(3)))
+    return sorted(fields)
+
+
+def _random_records(rng, fields):
+    return [{f: rng.choice(VALUES) for f in fields if rng.random() < 0.85} for _ in range(rng.randint(1, 25))]
+
+
+@pytest.mark.parametrize("domain", sorted(RULES))
+@pytest.mark.parametrize("seed", range(10))
+def test_rule_masks_match_row_by_row_reference(domain, seed):
+    rng = random.Random(f"{domain}-{seed}")
+    compiled = dq_engine.compile_rules(RULES[domain])
+    fields = _fields(RULES[domain])
+    for _ in range(20):
+        records = _random_records(rng, fields)
+        cols = dq_engine.Columns(dq_engine.to_frame(records))
+        for _, rule, fn in compiled:
+            expected = [apply_rule(r, rule) for r in records]
+            assert fn(cols).tolist() == expected, (rule, records)
+
+
+def test_evaluate_reports_pass_rates_and_failing_rows():
+    records = [{"kwh": 10, "period_start": "2024-01-01", "period_end": "2024-01-31"},
+               {"kwh": -1, "period_start": "2024-01-10", "period_end": "2024-01-05"},
+               {"period_start": "2024-01-01", "period_end": "2024-02-01"}]
+    res = dq_engine.evaluate(dq_engine.to_frame(records), dq_engine.compile_rules(RULES["energy"]))
+    by_rule = {r["rule"]["rule"] + ":" + str(r["rule"].get("field")): r for rs in res["by_rule"].values() for r in rs}
+    assert by_rule["not_null:kwh"]["failing_rows"] == [2]
+    assert by_rule[">=0:kwh"]["failing_rows"] == [1, 2]
+    assert by_rule["period_start <= period_end:None"]["failing_rows"] == [1]
+    assert by_rule["within_month('2024-01'):period_end"]["pass_rate"] == pytest.approx(2 / 3)
+    assert res["aggregate"]["dq_pass"] is False
+
+
+def test_unknown_rules_pass_and_empty_input():
+    compiled = dq_engine.compile_rules({"validity": [{"field": "x", "rule": "matches_iban"}]})
+    res = dq_engine.evaluate(dq_engine.to_frame([{"x": 1}, {}]), compiled)
+    assert res["by_rule"]["validity"][0]["pass_rate"] == 1.0
+    empty = dq_engine.evaluate(dq_engine.to_frame([]), dq_engine.compile_rules(RULES["hr"]))
+    assert all(r["failed"] == 0 and r["failing_rows"] == [] for rs in empty["by_rule"].values() for r in rs)
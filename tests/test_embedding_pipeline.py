@@ -0,0 +1,23 @@
+from modules.embedding_pipeline import EmbeddingPipeline
+
+
+class _AllCached:
+    def get_many(self, texts, model):
+        return [[1.0, 0.0] for _ in texts]
+
+    def put_many(self, texts, model, vectors):
+        raise AssertionError("no debería haber fallos de caché")
+
+
+def test_cache_hits_are_flushed_in_bounded_batches():
+    pipe = EmbeddingPipeline(client=None, cache=_AllCached(), max_batch_items=10)
+    sizes = [len(b) for b in pipe.batches(range(95), str)]
+    assert sizes == [10] * 9 + [5]
+
+
+def test_fully_cached_stream_reports_progress_per_batch():
+    pipe = EmbeddingPipeline(client=None, cache=_AllCached(), max_batch_items=10, max_workers=1)
+    progress = []
+    out = list(pipe.embed_stream(range(25), str, on_batch=progress.append))
+    assert [item for item, _ in out] == list(range(25))
+    assert progress == [10, 20, 25]
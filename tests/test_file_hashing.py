@@ -0,0 +1,80 @@
+import os
+import hashlib
+
+import pytest
+
+from modules import file_hashing
+from modules.disk_cache import DiskCache
+
+
+@pytest.fixture
+def hashing(tmp_path, monkeypatch):
+    """file_hashing con memoria, caché en disco y contadores propios del test."""
+    disk = DiskCache(tmp_path / "hashes.sqlite")
+    monkeypatch.setattr(file_hashing, "_memory", {})
+    monkeypatch.setattr(file_hashing, "_disk", disk)
+    monkeypatch.setattr(file_hashing, "stats", {"hashed": 0, "cached": 0, "bytes_hashed": 0})
+    yield file_hashing
+    disk.close()
+
+
+def _sha(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def test_unchanged_file_is_served_from_the_cache(hashing, tmp_path):
+    path = tmp_path / "norma.pdf"
+    path.write_bytes(b"contenido" * 1000)
+    assert hashing.sha256_file(path) == _sha(b"contenido" * 1000)
+    assert hashing.stats["hashed"] == 1 and hashing.stats["cached"] == 0
+
+    assert hashing.sha256_file(path) == _sha(b"contenido" * 1000)
+    assert hashing.stats["hashed"] == 1 and hashing.stats["cached"] == 1
+
+    # Otro proceso (sin memoria) lo encuentra en la caché en disco
+    hashing.clear()
+    assert hashing.sha256_file(path) == _sha(b"contenido" * 1000)
+    assert hashing.stats["hashed"] == 1 and hashing.stats["cached"] == 2
+
+
+def test_same_size_rewrite_with_new_mtime_is_rehashed(hashing, tmp_path):
+    path = tmp_path / "datos.json"
+    path.write_bytes(b"version-1")
+    before = os.stat(path)
+    assert hashing.sha256_file(path) == _sha(b"version-1")
+
+    path.write_bytes(b"version-2")
+    # mismo tamaño; mtime forzado distinto por si el sistema de ficheros tiene poca resolución
+    os.utime(path, ns=(before.st_atime_ns, before.st_mtime_ns + 1_000_000))
+    assert os.stat(path).st_size == before.st_size
+    assert hashing.sha256_file(path) == _sha(b"version-2")
+    assert hashing.stats["hashed"] == 2 and hashing.stats["cached"] == 0
+
+
+def test_replaced_file_with_new_inode_is_rehashed(hashing, tmp_path):
+    path = tmp_path / "datos.json"
+    path.write_bytes(b"aaaa")
+    before = os.stat(path)
+    hashing.sha256_file(path)
+    tmp = tmp_path / "datos.json.tmp"
+    tmp.write_bytes(b"bbbb")
+    os.utime(tmp, ns=(before.st_atime_ns, before.st_mtime_ns))   # mismo tamaño y mtime
+    os.replace(tmp, path)
+    if os.stat(path).st_ino == before.st_ino:
+        pytest.skip("el sistema de ficheros reutilizó el inodo")
+    assert hashing.sha256_file(path) == _sha(b"bbbb")
+
+
+def test_many_files_in_order_and_duplicates_hashed_once(hashing, tmp_path):
+    paths = []
+    for i in range(6):
+        p = tmp_path / f"f{i}.txt"
+        p.write_bytes(f"fichero {i}".encode())
+        paths.append(p)
+    digests = hashing.sha256_files(paths + [paths[0], paths[3]], max_workers=3)
+    assert digests == [_sha(f"fichero {i}".encode()) for i in (0, 1, 2, 3, 4, 5, 0, 3)]
+    assert hashing.stats["hashed"] == 6
+
+    paths[2].write_bytes(b"otro contenido")
+    assert hashing.sha256_files(paths)[2] == _sha(b"otro contenido")
+    assert hashing.stats["hashed"] == 7 and hashing.stats["cached"] == 5
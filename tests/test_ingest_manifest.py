@@ -0,0 +1,134 @@
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+import yaml
+
+from modules.ingest_manifest import load_manifest, expand_glob, rules_for_period, partition_id
+from modules.dq_engine import merge_results, evaluate, compile_rules, to_frame
+
+ROOT = Path(__file__).resolve().parent.parent
+SCHEMAS = {"energy": "contracts/erp_energy.schema.json", "hr": "contracts/hr_people.schema.json"}
+
+
+def _manifest(tmp_path, spec):
+    path = tmp_path / "manifest.yaml"
+    path.write_text(yaml.safe_dump(spec), encoding="utf-8")
+    return path
+
+
+def test_globs_and_defaults(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for entity, period in (("ACME", "2024-01"), ("ACME", "2024-02"), ("BETA", "2024-01")):
+        Path(f"raw/{entity}").mkdir(parents=True, exist_ok=True)
+        Path(f"raw/{entity}/energy_{period}.jsonl").write_text("")
+    parts = load_manifest(_manifest(tmp_path, {
+        "partitions": [{"domain": "hr", "period": "2024-01", "input": "hr.json"}],
+        "sources": [{"domain": "energy", "glob": "raw/{entity}/energy_{period}.jsonl"}],
+    }), SCHEMAS)
+    assert [partition_id(p) for p in parts] == ["hr/2024-01", "energy/ACME/2024-01", "energy/ACME/2024-02",
+                                                "energy/BETA/2024-01"]
+    assert parts[0]["normalized"] == "data/normalized/hr_2024-01.json" and parts[0]["entity"] is None
+    assert parts[1]["normalized"] == "data/normalized/ACME/energy_2024-01.json"
+    assert parts[1]["schema"] == SCHEMAS["energy"]
+    assert expand_glob("energy", "raw/{entity}/nada_{period}.csv") == []
+
+
+def test_duplicate_normalized_paths_are_rejected(tmp_path):
+    spec = {"partitions": [
+        {"domain": "energy", "entity": "A", "period": "2024-01", "input": "a.json", "normalized": "out/x.json"},
+        {"domain": "hr", "entity": "A", "period": "2024-01", "input": "b.json", "normalized": "out//x.json"},
+    ]}
+    with pytest.raises(ValueError, match="mismo normalizado"):
+        load_manifest(_manifest(tmp_path, spec), SCHEMAS)
+
+
+@pytest.mark.parametrize("template, error", [
+    ("data/n/{domain}_{period}.json", r"no incluye \{entity\}"),
+    ("data/n/{entity}/{period}.json", r"no incluye \{domain\}"),
+    ("data/n/{entity}/{domain}_{periodo}.json", "Marcadores desconocidos"),
+])
+def test_templates_must_keep_partitions_apart(tmp_path, template, error):
+    spec = {"normalized": template, "partitions": [
+        {"domain": "energy", "entity": "A", "period": "2024-01", "input": "a.json"},
+        {"domain": "hr", "entity": "B", "period": "2024-01", "input": "b.json"},
+    ]}
+    with pytest.raises(ValueError, match=error):
+        load_manifest(_manifest(tmp_path, spec), SCHEMAS)
+
+
+def test_template_may_omit_what_does_not_vary(tmp_path):
+    spec = {"normalized": "out/{domain}.json", "partitions": [
+        {"domain": "energy", "entity": "A", "period": "2024-01", "input": "a.json"},
+        {"domain": "hr", "entity": "A", "period": "2024-01", "input": "b.json"},
+    ]}
+    assert [p["normalized"] for p in load_manifest(_manifest(tmp_path, spec), SCHEMAS)] == \
+        ["out/energy.json", "out/hr.json"]
+
+
+def test_unknown_domain_and_duplicate_partition(tmp_path):
+    with pytest.raises(ValueError, match="Dominio desconocido"):
+        load_manifest(_manifest(tmp_path, {"partitions": [{"domain": "agua", "input": "a"}]}), SCHEMAS)
+    dup = {"domain": "hr", "entity": "A", "period": "2024-01", "input": "a"}
+    with pytest.raises(ValueError, match="Partición duplicada"):
+        load_manifest(_manifest(tmp_path, {"partitions": [dup, dict(dup, input="b")]}), SCHEMAS)
+
+
+def test_rules_follow_the_partition_period():
+    rules = {"timeliness": [{"field": "period_end", "rule": "within_month('2024-01')"},
+                            {"field": "period", "rule": "equals('2024-01')"}],
+             "validity": [{"field": "kwh", "rule": ">=0"}]}
+    swapped = rules_for_period(rules, "2024-03")
+    assert [r["rule"] for r in swapped["timeliness"]] == ["within_month('2024-03')", "equals('2024-03')"]
+    assert swapped["validity"] == rules["validity"]
+    assert rules_for_period(rules, "2024") is rules
+
+
+def test_merge_results_matches_evaluating_everything():
+    rules = {"validity": [{"field": "kwh", "rule": ">=0"}], "completeness": [{"field": "kwh", "rule": "not_null"}]}
+    compiled = compile_rules(rules)
+    a = [{"kwh": 1}, {"kwh": -1}, {}]
+    b = [{"kwh": -5}, {"kwh": 2}]
+    merged = merge_results([("A", len(a), evaluate(to_frame(a), compiled)),
+                            ("B", len(b), evaluate(to_frame(b), compiled))])
+    whole = evaluate(to_frame(a + b), compiled)
+    for cat in rules:
+        for m, w in zip(merged["by_rule"][cat], whole["by_rule"][cat]):
+            assert (m["pass_rate"], m["failed"]) == (w["pass_rate"], w["failed"])
+    assert merged["by_rule"]["validity"][0]["failing_rows"] == [["A", 1], ["A", 2], ["B", 0]]
+    assert merged["aggregate"] == whole["aggregate"]
+
+
+def _run_ingest(workdir, monkeypatch, workers):
+    import mcp_ingest
+    monkeypatch.chdir(workdir)
+    monkeypatch.setattr(mcp_ingest, "PARALLEL_MIN_BYTES", 0)
+    mcp_ingest.main(["--manifest", "manifest.yaml", "--workers", str(workers), "--validate-workers", "0"])
+    report = json.loads(Path("data/dq_report.json").read_text(encoding="utf-8"))
+    normalized = {str(p): p.read_text(encoding="utf-8") for p in sorted(Path("data/normalized").rglob("*.json"))}
+    shutil.rmtree("data/normalized")
+    shutil.rmtree("data/columnar")
+    return report, normalized
+
+
+def test_parallel_manifest_ingest_matches_serial(tmp_path, monkeypatch):
+    shutil.copytree(ROOT / "contracts", tmp_path / "contracts")
+    for entity in ("ACME", "BETA"):
+        raw = tmp_path / "data" / "raw" / entity
+        raw.mkdir(parents=True)
+        for period in ("2024-01", "2024-02"):
+            rows = [{"company_id": entity, "period_start": f"{period}-01", "period_end": f"{period}-28",
+                     "kwh": k, "source_system": "ERP"} for k in (100, -3, 12300)]
+            (raw / f"energy_{period}.jsonl").write_text("\n".join(json.dumps(r) for r in rows) + "\n")
+    (tmp_path / "manifest.yaml").write_text(yaml.safe_dump({
+        "sources": [{"domain": "energy", "glob": "data/raw/{entity}/energy_{period}.jsonl"}]}))
+
+    serial = _run_ingest(tmp_path, monkeypatch, 1)
+    parallel = _run_ingest(tmp_path, monkeypatch, 2)
+    assert serial == parallel
+    report, normalized = parallel
+    assert len(normalized) == 4
+    energy = report["domains"]["energy"]
+    assert energy["records_total"] == 12 and energy["records_valid"] == 8
+    assert len(energy["partitions"]) == 4
@@ -0,0 +1,74 @@
+import math
+import random
+
+import numpy as np
+import pytest
+
+from modules.lexical_index import (LexicalIndex, tokenize, reciprocal_rank_fusion, BM25_K1, BM25_B)
+
+WORDS = ["biodiversidad", "agua", "emisiones", "E4-5", "artículo 8", "anexo ii", "scope", "kwh", "taxonomía"]
+
+
+def _corpus(n, seed=0):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 12))) for _ in range(n)]
+
+
+def _bm25_reference(texts, query):
+    docs = [tokenize(t) for t in texts]
+    avgdl = sum(map(len, docs)) / len(docs)
+    scores = {}
+    for term in set(tokenize(query)):
+        df = sum(term in d for d in docs)
+        if not df:
+            continue
+        idf = math.log(1.0 + (len(docs) - df + 0.5) / (df + 0.5))
+        for row, d in enumerate(docs):
+            tf = d.count(term)
+            if tf:
+                norm = BM25_K1 * (1.0 - BM25_B + BM25_B * len(d) / avgdl)
+                scores[row] = scores.get(row, 0.0) + idf * tf * (BM25_K1 + 1.0) / (tf + norm)
+    return scores
+
+
+def test_tokenize_keeps_codes_and_references():
+    tokens = tokenize("Ver E4-5 y el Artículo 8 del Anexo II")
+    assert {"e4-5", "e4", "5", "art:8", "annex:ii"} <= set(tokens)
+
+
+@pytest.mark.parametrize("query", ["agua emisiones", "E4-5", "artículo 8 kwh", "nada"])
+def test_bm25_matches_reference(query):
+    texts = _corpus(60)
+    index = LexicalIndex.empty().extend(texts)
+    expected = _bm25_reference(texts, query)
+    got = dict(index.search(query, k=len(texts)))
+    assert got.keys() == expected.keys()
+    for row, score in expected.items():
+        assert got[row] == pytest.approx(score, rel=1e-5)
+
+
+def test_incremental_extend_equals_full_build_and_roundtrips(tmp_path):
+    texts = _corpus(80, seed=1)
+    full = LexicalIndex.empty("g").extend(texts)
+    incremental = LexicalIndex.empty("g").extend(texts[:30]).extend(texts[30:55]).extend(texts[55:])
+    for query in ["agua", "taxonomía scope", "anexo ii"]:
+        assert incremental.search(query, 10) == pytest.approx(full.search(query, 10))
+    full.save(tmp_path)
+    loaded = LexicalIndex.load(tmp_path)
+    assert loaded.generation == "g"
+    assert loaded.search("kwh agua", 10) == pytest.approx(full.search("kwh agua", 10))
+
+
+def test_search_respects_live_mask():
+    texts = ["agua agua", "agua", "emisiones"]
+    index = LexicalIndex.empty().extend(texts)
+    live = np.array([False, True, True])
+    assert [row for row, _ in index.search("agua", 5, live)] == [1]
+
+
+def test_reciprocal_rank_fusion():
+    vector = [(1, 0.9), (2, 0.8), (3, 0.7)]
+    lexical = [(3, 12.0), (1, 5.0)]
+    fused = reciprocal_rank_fusion([vector, lexical], k=3)
+    assert [row for row, _ in fused] == [1, 3, 2]
+    assert fused[0][1] == pytest.approx(1 / 61 + 1 / 62)
@@ -0,0 +1,165 @@
+import threading
+from pathlib import Path
+
+import pytest
+
+from modules.pipeline_dag import run_dag, dependencies, stage_key
+
+
+def _stages():
+    # src.txt -> A -> a.txt -> B (+ b_code.py) -> b.txt -> C -> c.txt ; D independiente
+    return [
+        {"name": "C", "cmd": ["c"], "inputs": ["b.txt"], "outputs": ["c.txt"], "code": []},
+        {"name": "A", "cmd": ["a"], "inputs": ["src.txt"], "outputs": ["a.txt"], "code": []},
+        {"name": "B", "cmd": ["b"], "inputs": ["a.txt"], "outputs": ["b.txt"], "code": ["b_code.py"]},
+        {"name": "D", "cmd": ["d"], "inputs": ["src.txt"], "outputs": ["out/d_*.txt"], "code": []},
+    ]
+
+
+class Runner:
+    """run_fn de prueba: cada etapa escribe sus salidas a partir de sus entradas."""
+
+    def __init__(self, fail=(), uncacheable=()):
+        self.fail = set(fail)
+        self.uncacheable = set(uncacheable)
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, stage):
+        with self.lock:
+            self.calls.append(stage["name"])
+        if stage["name"] in self.fail:
+            return {"name": stage["name"], "ok": False}
+        name = stage["name"]
+        if name == "A":
+            Path("a.txt").write_text(Path("src.txt").read_text().upper())
+        elif name == "B":
+            Path("b.txt").write_text(Path("a.txt").read_text()[:3])
+        elif name == "C":
+            Path("c.txt").write_text(Path("b.txt").read_text() * 2)
+        else:
+            Path("out").mkdir(exist_ok=True)
+            Path("out/d_1.txt").write_text("d")
+        return {"name": name, "ok": True, "cacheable": name not in self.uncacheable}
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    Path("src.txt").write_text("abcdef")
+    Path("b_code.py").write_text("v1")
+    return tmp_path
+
+
+def _status(results):
+    return {r["name"]: r["status"] for r in results}
+
+
+def test_dependencies_follow_declared_artifacts():
+    assert dependencies(_stages()) == {"C": ["B"], "A": [], "B": ["A"], "D": []}
+
+
+def test_second_run_is_fully_cached(workdir):
+    runner = Runner()
+    results = run_dag(_stages(), runner, "state.json")
+    assert [r["name"] for r in results] == ["C", "A", "B", "D"]
+    assert set(_status(results).values()) == {"executed"}
+    assert runner.calls.index("A") < runner.calls.index("B") < runner.calls.index("C")
+
+    runner = Runner()
+    assert set(_status(run_dag(_stages(), runner, "state.json")).values()) == {"cached"}
+    assert runner.calls == []
+
+
+def test_only_changed_stages_rerun(workdir):
+    run_dag(_stages(), Runner(), "state.json")
+
+    # Cambia el código de B pero su salida es la misma: C no se vuelve a ejecutar
+    Path("b_code.py").write_text("v2")
+    runner = Runner()
+    assert _status(run_dag(_stages(), runner, "state.json")) == \
+        {"C": "cached", "A": "cached", "B": "executed", "D": "cached"}
+
+    # Cambia la fuente: A y D se ejecutan; B y C solo si cambia lo que leen
+    Path("src.txt").write_text("abcxyz")
+    assert _status(run_dag(_stages(), Runner(), "state.json")) == \
+        {"C": "cached", "A": "executed", "B": "executed", "D": "executed"}
+    Path("src.txt").write_text("zzz")
+    assert _status(run_dag(_stages(), Runner(), "state.json")) == \
+        {"C": "executed", "A": "executed", "B": "executed", "D": "executed"}
+
+
+def test_missing_or_edited_output_reruns_the_stage(workdir):
+    run_dag(_stages(), Runner(), "state.json")
+    Path("out/d_1.txt").unlink()
+    Path("c.txt").write_text("editado a mano")
+    assert _status(run_dag(_stages(), Runner(), "state.json")) == \
+        {"C": "executed", "A": "cached", "B": "cached", "D": "executed"}
+
+
+def test_failure_blocks_dependents_and_is_retried(workdir):
+    results = run_dag(_stages(), Runner(fail={"A"}), "state.json")
+    assert _status(results) == {"C": "blocked", "A": "executed", "B": "blocked", "D": "executed"}
+    assert not results[1]["ok"]
+    runner = Runner()
+    assert _status(run_dag(_stages(), runner, "state.json")) == \
+        {"C": "executed", "A": "executed", "B": "executed", "D": "cached"}
+
+
+def test_force(workdir):
+    run_dag(_stages(), Runner(), "state.json")
+    assert _status(run_dag(_stages(), Runner(), "state.json", force={"D"}))["D"] == "executed"
+    assert set(_status(run_dag(_stages(), Runner(), "state.json", force=True)).values()) == {"executed"}
+
+
+def test_cycles_are_rejected(workdir):
+    stages = [{"name": "X", "cmd": [], "inputs": ["y"], "outputs": ["x"]},
+              {"name": "Y", "cmd": [], "inputs": ["x"], "outputs": ["y"]}]
+    with pytest.raises(ValueError, match="circulares"):
+        run_dag(stages, Runner(), "state.json")
+
+
+def test_environment_is_part_of_the_key(workdir, monkeypatch):
+    stages = _stages()
+    stages[3]["env"] = ["OPENAI_API_KEY", "GICES_*"]
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    monkeypatch.setenv("GICES_RETRIEVAL_MODE", "hybrid")
+    run_dag(stages, Runner(), "state.json")
+    assert set(_status(run_dag(stages, Runner(), "state.json")).values()) == {"cached"}
+
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    assert _status(run_dag(stages, Runner(), "state.json"))["D"] == "executed"
+    monkeypatch.setenv("GICES_PROMPT_EVIDENCE_TOKENS", "800")
+    assert _status(run_dag(stages, Runner(), "state.json")) == \
+        {"C": "cached", "A": "cached", "B": "cached", "D": "executed"}
+    # Los valores no quedan en claro en la huella guardada
+    assert "sk-test" not in Path("state.json").read_text()
+    assert stage_key(stages[3], {"OPENAI_API_KEY": "a"}) != stage_key(stages[3], {"OPENAI_API_KEY": "b"})
+
+
+def test_uncacheable_results_are_not_recorded(workdir):
+    results = run_dag(_stages(), Runner(uncacheable={"D"}), "state.json")
+    assert all(r["ok"] for r in results)
+    runner = Runner()
+    assert _status(run_dag(_stages(), runner, "state.json")) == \
+        {"C": "cached", "A": "cached", "B": "cached", "D": "executed"}
+    assert set(_status(run_dag(_stages(), Runner(), "state.json")).values()) == {"cached"}
+
+
+def test_columnar_partitions_link_ingest_to_its_readers(workdir):
+    import pipeline_run
+    deps = dependencies(pipeline_run.STAGES)
+    assert "MCP.ingest" in deps["SHACL.validate"] and "MCP.ingest" in deps["RAGA.compute"]
+
+    # Sin normalizados JSON: la arista y la huella salen de la capa columnar
+    stages = [dict(s, inputs=[i for i in s["inputs"] if not i.startswith("data/normalized")],
+                   outputs=[o for o in s["outputs"] if not o.startswith("data/normalized")])
+              for s in pipeline_run.STAGES]
+    assert "MCP.ingest" in dependencies(stages)["RAGA.compute"]
+    raga = next(s for s in stages if s["name"] == "RAGA.compute")
+    part = Path("data/columnar/energy/period=2024-01/entity=_none")
+    part.mkdir(parents=True)
+    (part / "kwh.npy").write_bytes(b"v1")
+    before = stage_key(raga)
+    (part / "kwh.npy").write_bytes(b"v2")
+    assert stage_key(raga) != before
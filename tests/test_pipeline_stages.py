@@ -0,0 +1,106 @@
+import sys
+import textwrap
+import threading
+
+import pytest
+
+from modules import pipeline_stages
+
+
+@pytest.fixture
+def stage(tmp_path, monkeypatch):
+    """Crea un módulo de etapa importable con el código dado."""
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    def make(name, body):
+        (tmp_path / f"{name}.py").write_text(textwrap.dedent(body), encoding="utf-8")
+        sys.modules.pop(name, None)
+        return name
+    yield make
+
+
+def test_output_and_argv_stay_with_the_stage(stage):
+    name = stage("stage_echo", """
+        import sys
+        def main(argv):
+            print("args:", " ".join(argv))
+            print("aviso", file=sys.stderr)
+    """)
+    argv_before = list(sys.argv)
+    res = pipeline_stages.run_stage(name + ".py", ["--no-cache"], timeout=10)
+    assert res["ok"] and res["name"] == name
+    assert res["stdout"] == "args: --no-cache\n" and res["stderr"] == "aviso\n"
+    assert sys.argv == argv_before
+
+
+def test_other_threads_do_not_leak_into_the_capture(stage, capsys):
+    started, release = threading.Event(), threading.Event()
+    name = stage("stage_wait", """
+        def main():
+            print("etapa")
+            import builtins
+            builtins._stage_started.set()
+            builtins._stage_release.wait(5)
+    """)
+    import builtins
+    builtins._stage_started, builtins._stage_release = started, release
+    try:
+        result = {}
+        runner = threading.Thread(target=lambda: result.update(pipeline_stages.run_stage(name, timeout=10)))
+        runner.start()
+        assert started.wait(5)
+        print("otra sesión")
+        release.set()
+        runner.join(10)
+    finally:
+        del builtins._stage_started, builtins._stage_release
+    assert result["ok"] and result["stdout"] == "etapa\n"
+    assert "otra sesión" in capsys.readouterr().out
+
+
+def test_failures_are_reported(stage):
+    exits = stage("stage_exit", "def main():\n    raise SystemExit(2)\n")
+    res = pipeline_stages.run_stage(exits, timeout=10)
+    assert not res["ok"] and res["stderr"] == "2\n"
+    boom = stage("stage_boom", "def main():\n    raise RuntimeError('boom')\n")
+    res = pipeline_stages.run_stage(boom, timeout=10)
+    assert not res["ok"] and "RuntimeError: boom" in res["stderr"]
+    assert pipeline_stages.run_stage(stage("stage_ok", "def main():\n    pass\n"), timeout=10)["ok"]
+
+
+def test_hung_stage_times_out_without_blocking_later_runs(stage):
+    release = threading.Event()
+    name = stage("stage_hang", """
+        import builtins
+        def main():
+            builtins._stage_release.wait(30)
+    """)
+    import builtins
+    builtins._stage_release = release
+    try:
+        res = pipeline_stages.run_stage(name, timeout=0.2)
+        assert not res["ok"] and "Timeout" in res["stderr"]
+        busy = pipeline_stages.run_stage(stage("stage_next", "def main():\n    pass\n"), timeout=0.2)
+        assert not busy["ok"] and "Otra etapa" in busy["stderr"]
+        release.set()
+        assert pipeline_stages.run_stage("stage_next", timeout=10)["ok"]
+    finally:
+        release.set()
+        del builtins._stage_release
+
+
+def test_raga_report_counts_only_its_own_run(tmp_path, monkeypatch):
+    import json
+    import raga_compute
+    from modules import gices_brain
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(gices_brain, "client", None)
+    monkeypatch.setattr(raga_compute, "get_knowledge_base", lambda: [])
+    (tmp_path / "data" / "normalized").mkdir(parents=True)
+    (tmp_path / "data" / "normalized" / "biodiversity_2024.json").write_text(
+        json.dumps([{"ecosystem_area_ha": 10}, {"ecosystem_area_ha": 5}]))
+    for _ in range(2):   # dos ejecuciones en el mismo proceso, como en la App
+        assert pipeline_stages.run_stage("raga_compute.py", [], timeout=30)["ok"]
+        report = json.loads((tmp_path / "raga" / "run_report.json").read_text())
+        assert report["deliberation"]["records"] == 2 and report["deliberation"]["errors"] == 2
+        assert report["cacheable"] is False
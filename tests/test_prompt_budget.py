@@ -0,0 +1,86 @@
+import random
+
+import pytest
+
+from modules.embedding_pipeline import count_tokens
+from modules.prompt_budget import assemble_evidence, format_evidence, near_duplicate, shingles
+
+WORDS = ("la", "empresa", "restaura", "hectáreas", "de", "bosque", "según", "ESRS", "E4", "crédito",
+         "naturaleza", "permanencia", "riesgo", "financiero", "biodiversidad", "2024", "métrica")
+
+
+def _chunk(i, content, score):
+    return {"source": f"doc{i % 3}.pdf", "page": i + 1, "content": content, "score": score}
+
+
+def _chunks(seed, n=12):
+    rng = random.Random(seed)
+    texts = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 120))) for _ in range(n)]
+    scores = sorted((round(rng.random(), 3) for _ in range(n)), reverse=True)
+    return [_chunk(i, t, s) for i, (t, s) in enumerate(zip(texts, scores))]
+
+
+def _cost(chunks):
+    return sum(count_tokens(format_evidence(c)) + 1 for c in chunks)
+
+
+def test_near_duplicates_are_dropped():
+    base = "La empresa restaura 150 hectáreas de bosque tropical con métricas de permanencia a largo plazo."
+    chunks = [
+        _chunk(0, base, 0.9),
+        _chunk(1, "The company restores 150 hectares of tropical forest.", 0.85),
+        _chunk(2, base.upper() + " ", 0.8),                      # misma página, otro formato
+        _chunk(3, base[:60], 0.7),                               # solape: contenido dentro del primero
+        _chunk(4, "Riesgo financiero medio por revocación del crédito de naturaleza.", 0.6),
+    ]
+    chosen, report = assemble_evidence(chunks, None)
+    assert [c["page"] for c in chosen] == [1, 2, 5]
+    assert report["duplicates"] == 2 and report["selected"] == 3 and report["over_budget"] == 0
+    # con umbral 1.0 solo cuentan las copias exactas (en shingles): el recorte a media palabra se queda
+    assert [c["page"] for c in assemble_evidence(chunks, None, threshold=1.0)[0]] == [1, 2, 4, 5]
+    assert near_duplicate(shingles(base), shingles(base[:60]))
+    assert not near_duplicate(shingles(base), set())
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_evidence_never_exceeds_the_budget(seed):
+    chunks = _chunks(seed)
+    budget = random.Random(seed).choice([0, 20, 60, 150, 400])
+    chosen, report = assemble_evidence(chunks, budget)
+    assert _cost(chosen) == report["evidence_tokens"] <= budget
+    assert report["selected"] + report["duplicates"] + report["over_budget"] == len(chunks)
+    # ningún fragmento se trunca: los elegidos son los originales, enteros
+    assert all(c in chunks for c in chosen)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_order_is_kept(seed):
+    chunks = _chunks(seed)
+    chosen, _ = assemble_evidence(chunks, 200)
+    # la entrada viene por relevancia: la salida es una subsecuencia en el mismo orden
+    positions = [chunks.index(c) for c in chosen]
+    assert positions == sorted(positions)
+
+    # a igual score se respeta el orden de llegada; si no, manda la relevancia
+    shuffled = [dict(c, score=0.5) for c in chunks]
+    assert assemble_evidence(shuffled, None, threshold=1.01)[0] == shuffled
+    reversed_chunks = list(reversed(chunks))
+    chosen, _ = assemble_evidence(reversed_chunks, None, threshold=1.01)
+    assert [c["score"] for c in chosen] == sorted((c["score"] for c in chunks), reverse=True)
+
+
+def test_most_relevant_chunk_is_skipped_whole_when_it_does_not_fit():
+    chunks = [_chunk(0, " ".join(["bosque"] * 400), 0.9), _chunk(1, "Dato breve.", 0.5)]
+    chosen, report = assemble_evidence(chunks, 50)
+    assert chosen == [chunks[1]] and report["over_budget"] == 1
+
+
+@pytest.mark.parametrize("budget", [30, 120, 300])
+def test_assembled_prompt_respects_the_budget(budget):
+    from modules.gices_brain import assemble_prompt
+    chunks = _chunks(7)
+    prompt, report = assemble_prompt({"ecosystem_area_ha": 150}, chunks, budget_tokens=budget)
+    assert report["evidence_tokens"] <= budget
+    included = [c for c in chunks if format_evidence(c) in prompt]
+    assert len(included) == report["selected"] and _cost(included) == report["evidence_tokens"]
+    assert report["prompt_tokens_est"] == count_tokens(prompt)
@@ -0,0 +1,62 @@
+import os
+import zipfile
+
+import pytest
+
+from modules import release_packager
+from modules.release_packager import build_package, supports_raw_write
+
+
+@pytest.fixture
+def entries(tmp_path):
+    src = tmp_path / "src"
+    src.mkdir()
+    files = {
+        "kpis.json": '{"kwh": 12300, "scope": "energía"}\n'.encode("utf-8") * 5000,
+        "informe.pdf": b"%PDF-1.4 " + os.urandom(2000),
+        "ruido.bin": os.urandom(200_000),
+        "vacío.txt": b"",
+        "validación.log": "línea con acentos ñ\n".encode("utf-8") * 3000,
+    }
+    out = []
+    for name, data in files.items():
+        (src / name).write_bytes(data)
+        out.append((src / name, f"release/{name}"))
+    return out, files
+
+
+def _read_back(path):
+    with zipfile.ZipFile(path) as zf:
+        assert zf.testzip() is None
+        return {i.filename: (i.compress_type, zf.read(i)) for i in zf.infolist()}
+
+
+def test_raw_write_is_available_on_this_interpreter():
+    # Si una versión nueva de zipfile rompe esto, build_package cae al camino lento: que se note aquí
+    with zipfile.ZipFile(os.devnull, "w") as zf:
+        assert supports_raw_write(zf)
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_package_round_trip(tmp_path, entries, workers):
+    pairs, files = entries
+    summary = build_package(tmp_path / "out.zip", pairs, workers=workers, report_path=tmp_path / "r.json")
+    members = _read_back(tmp_path / "out.zip")
+    assert [r["name"] for r in summary["entries"]] == [arc for _, arc in pairs]
+    for name, data in files.items():
+        assert members[f"release/{name}"][1] == data
+    methods = {r["name"]: r["method"] for r in summary["entries"]}
+    assert methods["release/kpis.json"] == "deflate"
+    assert methods["release/informe.pdf"] == "stored"
+    assert methods["release/ruido.bin"] == "stored"
+    assert members["release/kpis.json"][0] == zipfile.ZIP_DEFLATED
+
+
+def test_fallback_without_raw_write_gives_same_contents(tmp_path, entries, monkeypatch):
+    pairs, files = entries
+    monkeypatch.setattr(release_packager, "supports_raw_write", lambda zf: False)
+    summary = build_package(tmp_path / "slow.zip", pairs, workers=2)
+    members = _read_back(tmp_path / "slow.zip")
+    assert {n: c for n, (_, c) in members.items()} == {f"release/{k}": v for k, v in files.items()}
+    assert {r["name"]: r["method"] for r in summary["entries"]}["release/kpis.json"] == "deflate"
+    assert summary["total_compressed"] < summary["total_size"]
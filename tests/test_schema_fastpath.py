@@ -0,0 +1,112 @@
+import json
+import random
+from pathlib import Path
+
+import pytest
+from jsonschema import Draft202012Validator
+
+from modules import schema_fastpath
+from modules.schema_fastpath import SchemaChecker, check_parallel, make_pool
+
+CONTRACTS = sorted((Path(__file__).resolve().parent.parent / "contracts").glob("*.schema.json"))
+
+VALUES = [None, True, False, 0, 1, -1, 3.0, 2.5, -0.1, 10**20, "", "a", "ACME", "2024-01", "2024-1",
+          "2024-01-31", "ñandú", " ", [], [1], {}, {"x": 1}]
+
+
+def _reference(schema, record):
+    """Lo que hacía mcp_ingest antes del camino rápido."""
+    validator = Draft202012Validator(schema)
+    return [e.message for e in sorted(validator.iter_errors(record), key=lambda e: e.path)]
+
+
+def _random_record(rng, schema):
+    props = list(schema.get("properties", {}))
+    record = {}
+    for name in rng.sample(props, len(props)):   # orden de claves aleatorio
+        if rng.random() < 0.15:
+            continue
+        record[name] = rng.choice(VALUES)
+    if rng.random() < 0.2:
+        record[rng.choice(["extra", "zz", "aa"])] = rng.choice(VALUES)
+    return record
+
+
+def _random_subschema(rng):
+    schema = {}
+    kinds = rng.sample(["string", "number", "integer", "boolean", "null", "array", "object"], rng.randint(1, 2))
+    schema["type"] = kinds[0] if len(kinds) == 1 else kinds
+    for key, value in (("minimum", rng.choice([0, 1, 2.5])), ("maximum", rng.choice([1, 100])),
+                       ("exclusiveMinimum", -1), ("exclusiveMaximum", 50), ("minLength", rng.randint(0, 2)),
+                       ("maxLength", rng.randint(1, 5)), ("pattern", rng.choice(["^[0-9]{4}-[0-9]{2}$", "a", "^$"])),
+                       ("format", "date"), ("description", "x")):
+        if rng.random() < 0.3:
+            schema[key] = value
+    return schema
+
+
+def _random_schema(rng):
+    names = rng.sample(["a", "b", "c", "d", "zz", "extra"], rng.randint(1, 5))
+    schema = {"type": "object", "properties": {n: _random_subschema(rng) for n in names}}
+    if rng.random() < 0.7:
+        schema["required"] = rng.sample(names, rng.randint(0, len(names)))
+    additional = rng.choice([None, True, False, {"type": "string"}])
+    if additional is not None:
+        schema["additionalProperties"] = additional
+    return schema
+
+
+@pytest.mark.parametrize("contract", CONTRACTS, ids=lambda p: p.name)
+def test_contracts_match_jsonschema(contract):
+    schema = json.loads(contract.read_text(encoding="utf-8"))
+    checker = SchemaChecker(schema)
+    assert checker.compiled
+    rng = random.Random(contract.name)
+    for _ in range(500):
+        record = _random_record(rng, schema)
+        expected = _reference(schema, record)
+        assert checker.is_valid(record) == (not expected), record
+        assert checker.errors(record) == expected, record
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_random_schemas_match_jsonschema(seed):
+    rng = random.Random(seed)
+    schema = _random_schema(rng)
+    checker = SchemaChecker(schema)
+    assert checker.compiled
+    for _ in range(100):
+        record = _random_record(rng, schema) if rng.random() < 0.95 else rng.choice(VALUES)
+        expected = _reference(schema, record)
+        assert checker.is_valid(record) == (not expected), (schema, record)
+        assert checker.errors(record) == expected, (schema, record)
+
+
+def test_unsupported_keywords_fall_back_to_jsonschema():
+    schema = {"type": "object", "properties": {"a": {"enum": [1, 2]}}}
+    checker = SchemaChecker(schema)
+    assert not checker.compiled
+    assert checker.errors({"a": 3}) == _reference(schema, {"a": 3})
+    assert checker.errors({"a": 1}) == []
+
+
+def test_check_reports_global_indices():
+    schema = json.loads(CONTRACTS[0].read_text(encoding="utf-8"))
+    rng = random.Random(1)
+    records = [_random_record(rng, schema) for _ in range(50)]
+    valid, errors = SchemaChecker(schema).check(records, start=100)
+    assert [e["index"] for e in errors] == [100 + i for i, r in enumerate(records) if _reference(schema, r)]
+    assert valid == [r for r in records if not _reference(schema, r)]
+
+
+def test_parallel_check_matches_serial(monkeypatch):
+    schema = json.loads(CONTRACTS[0].read_text(encoding="utf-8"))
+    rng = random.Random(2)
+    records = [_random_record(rng, schema) for _ in range(300)]
+    checker = SchemaChecker(schema)
+    monkeypatch.setattr(schema_fastpath, "PARTITION_ROWS", 64)
+    pool = make_pool(2)
+    try:
+        assert check_parallel(checker, records, pool, start=7) == checker.check(records, start=7)
+    finally:
+        pool.shutdown()
@@ -0,0 +1,93 @@
+import json
+import random
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from modules.slo_sketch import TDigest, SLOSketch, rebuild_from_history, MIN_SAMPLES_FOR_QUANTILE
+
+
+def _rank_error(values, estimate, q):
+    """|rango empírico del estimado - q|: el error que acota un t-digest."""
+    values = np.sort(values)
+    return abs(np.searchsorted(values, estimate) / len(values) - q)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_quantiles_are_close_to_exact(seed):
+    rng = np.random.default_rng(seed)
+    values = np.concatenate([rng.lognormal(0, 1, 20_000), rng.uniform(50, 60, 500)])
+    rng.shuffle(values)
+    digest = TDigest()
+    for x in values:
+        digest.add(x)
+    for q in (0.01, 0.25, 0.5, 0.9, 0.95, 0.99):
+        assert _rank_error(values, digest.quantile(q), q) < 0.01
+    assert len(digest.means) <= 2 * digest.compression
+    assert digest.count == len(values)
+    assert digest.min == values.min() and digest.max == values.max()
+
+
+def test_merge_matches_single_digest():
+    rng = random.Random(7)
+    values = [rng.expovariate(1.0) for _ in range(6000)]
+    whole, parts = TDigest(), [TDigest() for _ in range(6)]
+    for i, x in enumerate(values):
+        whole.add(x)
+        parts[i % 6].add(x)
+    merged = TDigest()
+    for p in parts:
+        merged.merge(p)
+    assert merged.count == whole.count
+    assert merged.total == pytest.approx(whole.total)
+    for q in (0.5, 0.95):
+        assert _rank_error(np.array(values), merged.quantile(q), q) < 0.01
+
+
+def test_serialization_round_trip():
+    digest = TDigest()
+    for x in range(1000):
+        digest.add(x / 10)
+    again = TDigest.from_dict(json.loads(json.dumps(digest.to_dict())))
+    assert again.summary() == digest.summary()
+    assert again.quantile(0.5) == digest.quantile(0.5)
+    assert TDigest.from_dict(TDigest().to_dict()).summary() == {"count": 0, "p95_sec": None, "mean_sec": None}
+
+
+def test_few_samples_use_the_maximum():
+    digest = TDigest()
+    for x in range(MIN_SAMPLES_FOR_QUANTILE - 1):
+        digest.add(x)
+    assert digest.summary()["p95_sec"] == MIN_SAMPLES_FOR_QUANTILE - 2
+
+
+def _run(ts, steps):
+    return {"utc": ts.isoformat() + "Z", "steps": steps}
+
+
+def test_sketch_windows_and_cached_steps(tmp_path):
+    now = datetime(2026, 3, 10, 12)
+    sketch = SLOSketch()
+    sketch.add_run(_run(now - timedelta(days=10), [{"name": "RAGA", "duration_sec": 100.0}]), now=now)
+    sketch.add_run(_run(now - timedelta(days=3), [{"name": "RAGA", "duration_sec": 10.0}]), now=now)
+    sketch.add_run(_run(now - timedelta(hours=1), [{"name": "RAGA", "duration_sec": 1.0},
+                                                   {"name": "SHACL", "status": "cached"}]), now=now)
+    agg = sketch.aggregate(now)
+    assert agg["RAGA"]["count"] == 3 and agg["RAGA"]["p95_sec"] == 100.0
+    assert agg["RAGA"]["windows"]["24h"]["count"] == 1
+    assert agg["RAGA"]["windows"]["7d"]["count"] == 2
+    assert agg["RAGA"]["windows"]["30d"]["count"] == 3
+    assert agg["SHACL"]["cached"] == 1 and agg["SHACL"]["count"] == 0
+
+    sketch.save(tmp_path / "sketch.json")
+    assert SLOSketch.load(tmp_path / "sketch.json").aggregate(now) == agg
+    assert SLOSketch.load(tmp_path / "missing.json") is None
+
+
+def test_rebuild_from_history_skips_bad_lines(tmp_path):
+    now = datetime.utcnow()
+    history = tmp_path / "history.jsonl"
+    history.write_text(json.dumps(_run(now, [{"name": "MCP", "duration_sec": 0.5}])) + "\nno es json\n")
+    agg = rebuild_from_history(history).aggregate(now)
+    assert agg["MCP"]["count"] == 1 and agg["MCP"]["windows"]["24h"]["count"] == 1
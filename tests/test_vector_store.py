@@ -0,0 +1,74 @@
+import numpy as np
+
+from modules.vector_store import VectorStore, VectorStoreWriter
+
+
+def _live_rows(root):
+    store = VectorStore(root)
+    live = store.live if store.live is not None else np.ones(store.count, bool)
+    rows = sorted((store.record(i)["source"], store.record(i)["content"]) for i in np.flatnonzero(live))
+    store.close()
+    return rows
+
+
+def _initial(root):
+    with VectorStoreWriter(root, model="m") as w:
+        w.begin_doc("a.pdf", sha256="v1")
+        w.add([1.0, 0.0], "a.pdf", 1, "old a")
+        w.begin_doc("b.pdf", sha256="v1")
+        w.add([0.0, 1.0], "b.pdf", 1, "old b")
+
+
+def test_failed_reindex_keeps_previous_version(tmp_path):
+    _initial(tmp_path)
+    with VectorStoreWriter(tmp_path, append=True) as w:
+        w.begin_doc("a.pdf", sha256="v2")
+        w.add([1.0, 1.0], "a.pdf", 1, "partial new a")
+        w.finish_doc("a.pdf", ok=False)
+    assert _live_rows(tmp_path) == [("a.pdf", "old a"), ("b.pdf", "old b")]
+    store = VectorStore(tmp_path)
+    assert store.live_docs()["a.pdf"]["sha256"] == "v1"
+    store.close()
+
+
+def test_successful_reindex_replaces_previous_version(tmp_path):
+    _initial(tmp_path)
+    with VectorStoreWriter(tmp_path, append=True) as w:
+        w.begin_doc("a.pdf", sha256="v2")
+        w.add([1.0, 1.0], "a.pdf", 1, "new a")
+        w.finish_doc("a.pdf")
+        w.begin_doc("b.pdf", sha256="v2")   # sin finish_doc: close() confirma
+        w.add([0.0, 2.0], "b.pdf", 1, "new b")
+    assert _live_rows(tmp_path) == [("a.pdf", "new a"), ("b.pdf", "new b")]
+
+
+def test_missing_lexical_index_is_not_reloaded(tmp_path, monkeypatch):
+    _initial(tmp_path)
+    store = VectorStore(tmp_path)
+    calls = []
+    monkeypatch.setattr("modules.vector_store.LexicalIndex.load", lambda root: calls.append(root))
+    assert store.search_lexical("old") == []
+    assert store.search_lexical("old") == []
+    assert len(calls) == 1
+    store.close()
+
+
+def test_reload_closes_the_previous_store(tmp_path, monkeypatch):
+    from modules import gices_brain
+    root = tmp_path / "vector_store"
+    monkeypatch.setattr(gices_brain, "VECTOR_STORE_DIR", root)
+    monkeypatch.setattr(gices_brain, "_kb_handle", {"store": None, "stamp": None})
+    _initial(root)
+    old = gices_brain.get_knowledge_base()
+    assert gices_brain.get_knowledge_base() is old and old.record(0)["content"] == "old a"
+    old_version = old.version
+
+    with VectorStoreWriter(root, append=True) as w:
+        w.begin_doc("c.pdf", sha256="v1")
+        w.add([1.0, 1.0], "c.pdf", 1, "new c")
+    new = gices_brain.get_knowledge_base()
+    assert new is not old and new.version == old_version + 1
+    assert old._content is None and len(old.vectors) == 0 and old.search([1.0, 0.0]) == []
+    assert not isinstance(old.vectors, np.memmap)
+    assert len(new) == 3 and new.record(2)["content"] == "new c"
+    new.close()
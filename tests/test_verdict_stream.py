@@ -0,0 +1,122 @@
+import json
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from modules import gices_brain
+from modules.disk_cache import DiskCache
+from modules.verdict_stream import JsonFieldStream, parse_verdict, validate_verdict
+
+
+def _feed_split(text, field, rng):
+    stream = JsonFieldStream(field)
+    out, i = [], 0
+    while i < len(text):
+        n = rng.randint(1, 7)
+        out.append(stream.feed(text[i:i + n]))
+        i += n
+    return "".join(out), stream.done
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_field_stream_matches_json_loads_for_any_split(seed):
+    rng = random.Random(seed)
+    alphabet = 'abc "\\/\n\tñ€ {}:,'
+    narrative = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 60)))
+    payload = {"key_gap": 'x "narrative": y', "narrative": narrative, "compliance_check": "CUMPLE"}
+    text = json.dumps(payload, ensure_ascii=rng.random() < 0.5, indent=rng.choice([None, 2]))
+    got, done = _feed_split(text, "narrative", rng)
+    assert done
+    assert got == narrative
+
+
+def test_field_stream_without_the_field_yields_nothing():
+    got, done = _feed_split('{"other": "narrative"}', "narrative", random.Random(0))
+    assert got == "" and not done
+
+
+def test_validate_verdict_normalizes_and_rejects():
+    verdict, error = validate_verdict({"compliance_check": "no_cumple", "key_gap": "Scope 3"})
+    assert error is None and verdict["compliance_check"] == "NO CUMPLE"
+    assert validate_verdict({"compliance_check": "OK", "key_gap": "x"})[0]["compliance_check"] == "FAIL"
+    assert validate_verdict({"compliance_check": "CUMPLE", "key_gap": " "})[1]
+    assert parse_verdict('{"narrative": "a"')[1].startswith("JSON incompleto")
+
+
+class _FakeCompletions:
+    def __init__(self, content):
+        self.content = content
+        self.calls = 0
+
+    def create(self, **kwargs):
+        self.calls += 1
+        message = SimpleNamespace(content=self.content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)],
+                               usage=SimpleNamespace(prompt_tokens=100, completion_tokens=20))
+
+
+@pytest.fixture
+def fake_llm(tmp_path, monkeypatch):
+    def install(content):
+        completions = _FakeCompletions(content)
+        monkeypatch.setattr(gices_brain, "client", SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+        monkeypatch.setattr(gices_brain, "_response_cache", DiskCache(str(tmp_path / "responses.sqlite")))
+        monkeypatch.setattr(gices_brain, "RESPONSE_CACHE_BYPASS", False)
+        return completions
+    return install
+
+
+def test_invalid_verdicts_are_not_cached(fake_llm):
+    completions = fake_llm(json.dumps({"narrative": "n", "compliance_check": "TAL VEZ", "key_gap": "g"}))
+    first = gices_brain.deliberative_analysis({"v": 1}, [])
+    assert first["compliance_check"] == "FAIL" and "validation_error" in first
+    gices_brain.deliberative_analysis({"v": 1}, [])
+    assert completions.calls == 2
+
+
+def test_cache_hits_are_validated_and_report_no_usage(fake_llm):
+    completions = fake_llm(json.dumps({"narrative": "n", "compliance_check": "cumple", "key_gap": "g"}))
+    first = gices_brain.deliberative_analysis({"v": 2}, [])
+    assert first["compliance_check"] == "CUMPLE" and first["token_usage"]["prompt_tokens"] == 100
+    events = list(gices_brain.deliberative_analysis_stream({"v": 2}, []))
+    assert completions.calls == 1
+    verdict = events[-1][1]
+    assert verdict["compliance_check"] == "CUMPLE"
+    assert verdict["token_usage"]["cached"] and verdict["token_usage"]["prompt_tokens"] == 0
+
+    # Una entrada de caché que ya no valida se trata como fallo y se vuelve a preguntar
+    key = gices_brain.response_key({"v": 2}, [])
+    gices_brain._response_cache.put(key, json.dumps({"compliance_check": "TAL VEZ"}).encode("utf-8"))
+    again = gices_brain.deliberative_analysis({"v": 2}, [])
+    assert completions.calls == 2 and again["compliance_check"] == "CUMPLE"
+
+
+def test_errors_are_counted(fake_llm, monkeypatch):
+    fake_llm(json.dumps({"narrative": "n", "compliance_check": "TAL VEZ", "key_gap": "g"}))
+    before = gices_brain.deliberation_report()["errors"]
+    gices_brain.deliberative_analysis({"v": 3}, [])
+    monkeypatch.setattr(gices_brain, "client", None)
+    assert gices_brain.deliberative_analysis_many([({"v": 4}, []), ({"v": 5}, [])])[0]["narrative"] == "Error API Key"
+    assert gices_brain.deliberation_report()["errors"] - before == 3
+
+
+def test_prompt_is_assembled_once_per_record(fake_llm, monkeypatch):
+    completions = fake_llm(json.dumps({"narrative": "n", "compliance_check": "cumple", "key_gap": "g"}))
+    calls = []
+    assemble = gices_brain.assemble_prompt
+
+    def counting(data_point, chunks, *args, **kwargs):
+        calls.append(data_point["v"])
+        return assemble(data_point, chunks, *args, **kwargs)
+
+    monkeypatch.setattr(gices_brain, "assemble_prompt", counting)
+    chunks = [{"source": "a.pdf", "page": 1, "content": "Texto de la norma."}]
+    items = [({"v": v}, chunks) for v in (10, 11, 12)]
+    gices_brain.deliberative_analysis_many(items)
+    assert sorted(calls) == [10, 11, 12] and completions.calls == 3
+
+    # Segunda pasada, toda en caché: la clave se calcula con el mismo prompt
+    calls.clear()
+    assert all(r["token_usage"]["cached"] for r in gices_brain.deliberative_analysis_many(items))
+    assert sorted(calls) == [10, 11, 12] and completions.calls == 3